@@ -0,0 +1,462 @@
+"""
+Weather Alert Engine
+Evaluates threshold and anomaly rules on each ingested batch
+
+Every location keeps rolling statistics over its last ALERT_WINDOW values
+(sliding-window Welford mean and variance plus a ring buffer of the
+values), stored in the alert_stats table so each ingest only touches the
+locations it contains. All rules are evaluated with NumPy over the whole
+batch before the statistics are advanced, so a value is compared with the
+norm of the values before it. Alerts are written to the alerts table in
+the same transaction as the facts that raised them.
+
+A value raises at most one alert, for the first rule in RULES that fires,
+and a location raises at most one alert per forecast period: CWA
+forecasts are fetched again every hour, and the same cold night should
+not be reported again with every download.
+"""
+
+import argparse
+import sqlite3
+import time
+from typing import List, Set, Tuple
+
+import database
+import heatmap
+
+
+# Values per location in the rolling window
+ALERT_WINDOW = 24
+# Values needed before the change and anomaly rules apply
+MIN_HISTORY = 6
+# Threshold rules use the outer colour bands of the dashboard scale
+HEAT_THRESHOLD = float(heatmap.TEMPERATURE_BIN_EDGES[-1])
+COLD_THRESHOLD = float(heatmap.TEMPERATURE_BIN_EDGES[0])
+# Degrees away from the rolling mean that count as a sudden change
+SUDDEN_CHANGE = 8.0
+# Standard deviations (and at least this many degrees) that count as an anomaly
+ANOMALY_SIGMA = 3.0
+ANOMALY_MIN_DELTA = 3.0
+
+# Last ALERT_WINDOW values of every location, oldest first, from the fact history
+HISTORY_SQL = '''
+    SELECT location_id, value
+    FROM (
+        SELECT location_id, value, ROW_NUMBER() OVER (PARTITION BY location_id ORDER BY id DESC) AS rn
+        FROM (
+            SELECT id, location_id, COALESCE(current_temp, (min_temp + max_temp) / 2.0) AS value
+            FROM weather_facts
+        )
+        WHERE value IS NOT NULL
+    )
+    WHERE rn <= ?
+    ORDER BY location_id, rn DESC
+'''
+
+
+def _extreme_heat(values, mean, std, ready):
+    return values >= HEAT_THRESHOLD, HEAT_THRESHOLD
+
+
+def _extreme_cold(values, mean, std, ready):
+    return values < COLD_THRESHOLD, COLD_THRESHOLD
+
+
+def _sudden_drop(values, mean, std, ready):
+    return ready & (mean - values > SUDDEN_CHANGE), mean
+
+
+def _sudden_rise(values, mean, std, ready):
+    return ready & (values - mean > SUDDEN_CHANGE), mean
+
+
+def _anomaly(values, mean, std, ready):
+    import numpy as np
+
+    delta = np.abs(values - mean)
+    return ready & (delta >= ANOMALY_MIN_DELTA) & (delta > ANOMALY_SIGMA * std), mean
+
+
+# (rule name, severity, check); a check maps batch arrays to (mask, baseline).
+# Ordered by priority: a value that fires several rules is reported for the first
+RULES = [
+    ('extreme_heat', 'warning', _extreme_heat),
+    ('extreme_cold', 'warning', _extreme_cold),
+    ('sudden_drop', 'warning', _sudden_drop),
+    ('sudden_rise', 'warning', _sudden_rise),
+    ('anomaly', 'info', _anomaly),
+]
+RULE_NAMES = [name for name, _, _ in RULES]
+
+
+class RollingStats:
+    """
+    Sliding-window Welford statistics for a set of locations, one row each
+
+    Until a location has ALERT_WINDOW values, each new value is added;
+    after that it replaces the oldest value in the ring buffer and the
+    mean and sum of squares are updated for the swap in O(1).
+    """
+
+    __slots__ = ('count', 'mean', 'm2', 'position', 'window')
+
+    def __init__(self, size: int):
+        import numpy as np
+
+        self.count = np.zeros(size, dtype=np.int64)
+        self.mean = np.zeros(size, dtype=np.float64)
+        self.m2 = np.zeros(size, dtype=np.float64)
+        self.position = np.zeros(size, dtype=np.int64)
+        self.window = np.zeros((size, ALERT_WINDOW), dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.count)
+
+    def std(self, index):
+        """
+        Sample standard deviation for the given rows (0 with fewer than 2 values)
+        """
+        import numpy as np
+
+        count = self.count[index]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            variance = np.where(count > 1, self.m2[index] / (count - 1), 0.0)
+        return np.sqrt(np.maximum(variance, 0.0))
+
+    def update(self, index, values):
+        """
+        Add one value to each of the given rows (rows must be distinct)
+        """
+        import numpy as np
+
+        count, mean, m2 = self.count[index], self.mean[index], self.m2[index]
+        position = self.position[index]
+        full = count >= ALERT_WINDOW
+        oldest = self.window[index, position]
+
+        # Growing window: standard Welford step
+        grown = count + 1
+        delta = values - mean
+        grown_mean = mean + delta / grown
+        grown_m2 = m2 + delta * (values - grown_mean)
+
+        # Full window: swap the oldest value for the new one
+        swapped_mean = mean + (values - oldest) / ALERT_WINDOW
+        swapped_m2 = m2 + (values - oldest) * (values - swapped_mean + oldest - mean)
+
+        self.count[index] = np.where(full, count, grown)
+        self.mean[index] = np.where(full, swapped_mean, grown_mean)
+        self.m2[index] = np.maximum(np.where(full, swapped_m2, grown_m2), 0.0)
+        self.window[index, position] = values
+        self.position[index] = (position + 1) % ALERT_WINDOW
+
+
+def evaluate_rules(values, mean, std, ready) -> List[Tuple]:
+    """
+    Evaluate every rule over a batch
+
+    Args:
+        values: Temperatures being ingested
+        mean, std: Rolling statistics of each value's location before this value
+        ready: Whether each location has MIN_HISTORY values
+
+    Returns:
+        List of (rule index, row positions, baselines) for rules that fired
+    """
+    import numpy as np
+
+    fired = []
+    for rule, (_, _, check) in enumerate(RULES):
+        mask, baseline = check(values, mean, std, ready)
+        rows = np.flatnonzero(mask)
+        if len(rows):
+            fired.append((rule, rows, np.broadcast_to(baseline, values.shape)[rows]))
+    return fired
+
+
+def _occurrence_rank(inverse):
+    """
+    For each row, how many earlier rows of the batch belong to the same location
+    """
+    import numpy as np
+
+    order = np.argsort(inverse, kind='stable')
+    grouped = inverse[order]
+    starts = np.r_[True, grouped[1:] != grouped[:-1]]
+    first = np.maximum.accumulate(np.where(starts, np.arange(len(grouped)), 0))
+    rank = np.empty_like(inverse)
+    rank[order] = np.arange(len(grouped)) - first
+    return rank
+
+
+def run_batch(stats: RollingStats, index, values) -> List[Tuple]:
+    """
+    Evaluate rules for a batch and advance the statistics
+
+    A location that appears several times in the batch is processed in
+    order of appearance, one vectorized round per repeat.
+
+    Args:
+        stats: Statistics with one row per batch location
+        index: Row in stats for each value
+        values: Temperatures in ingest order
+
+    Returns:
+        List of (rule index, batch row positions, baselines)
+    """
+    import numpy as np
+
+    fired = []
+    rank = _occurrence_rank(index)
+    for round_number in range(int(rank.max()) + 1 if len(rank) else 0):
+        rows = np.flatnonzero(rank == round_number)
+        rows_index = index[rows]
+        ready = stats.count[rows_index] >= MIN_HISTORY
+        for rule, positions, baselines in evaluate_rules(
+            values[rows], stats.mean[rows_index], stats.std(rows_index), ready
+        ):
+            fired.append((rule, rows[positions], baselines))
+        stats.update(rows_index, values[rows])
+    return fired
+
+
+def load_stats(cursor: sqlite3.Cursor, location_ids) -> RollingStats:
+    """
+    Load the rolling statistics of the given locations (new locations start empty)
+    """
+    import numpy as np
+
+    stats = RollingStats(len(location_ids))
+    rows_by_id = {int(location_id): row for row, location_id in enumerate(location_ids)}
+    ids = list(rows_by_id)
+    window_bytes = ALERT_WINDOW * 8
+    for start in range(0, len(ids), database.LOOKUP_CHUNK_SIZE):
+        chunk = ids[start:start + database.LOOKUP_CHUNK_SIZE]
+        cursor.execute(
+            f"SELECT location_id, count, mean, m2, position, window FROM alert_stats "
+            f"WHERE location_id IN ({','.join('?' * len(chunk))})",
+            chunk
+        )
+        for location_id, count, mean, m2, position, window in cursor.fetchall():
+            # A window stored with another ALERT_WINDOW starts over
+            if len(window) != window_bytes:
+                continue
+            row = rows_by_id[location_id]
+            stats.count[row] = count
+            stats.mean[row] = mean
+            stats.m2[row] = m2
+            stats.position[row] = position
+            stats.window[row] = np.frombuffer(window, dtype=np.float64)
+    return stats
+
+
+def save_stats(cursor: sqlite3.Cursor, location_ids, stats: RollingStats):
+    """
+    Store the rolling statistics of the given locations
+    """
+    cursor.executemany(
+        'INSERT OR REPLACE INTO alert_stats (location_id, count, mean, m2, position, window) '
+        'VALUES (?, ?, ?, ?, ?, ?)',
+        zip(
+            location_ids.tolist(), stats.count.tolist(), stats.mean.tolist(), stats.m2.tolist(),
+            stats.position.tolist(), (row.tobytes() for row in stats.window),
+        )
+    )
+
+
+def stats_from_history(location_ids, values) -> Tuple[object, RollingStats]:
+    """
+    Build rolling statistics from HISTORY_SQL rows (grouped by location, oldest first)
+
+    Returns:
+        (location ids, RollingStats with one row per location)
+    """
+    import numpy as np
+
+    locations, index = np.unique(np.asarray(location_ids, dtype=np.int64), return_inverse=True)
+    values = np.asarray(values, dtype=np.float64)
+    slot = _occurrence_rank(index)
+
+    stats = RollingStats(len(locations))
+    stats.window[index, slot] = values
+    stats.count = np.bincount(index, minlength=len(locations)).astype(np.int64)
+    stats.mean = np.bincount(index, weights=values, minlength=len(locations)) / np.maximum(stats.count, 1)
+    stats.m2 = np.bincount(index, weights=(values - stats.mean[index]) ** 2, minlength=len(locations))
+    # Values fill the ring from slot 0, so the next slot to overwrite is the oldest one
+    stats.position = stats.count % ALERT_WINDOW
+    return locations, stats
+
+
+def reset_stats(cursor: sqlite3.Cursor) -> int:
+    """
+    Recompute every location's rolling statistics inside the caller's transaction
+
+    For callers that already hold the writer lock (database.init_database()
+    after migrating a legacy table); everyone else uses rebuild_stats().
+
+    Returns:
+        Number of locations with statistics
+    """
+    rows = cursor.execute(HISTORY_SQL, (ALERT_WINDOW,)).fetchall()
+    cursor.execute('DELETE FROM alert_stats')
+    if not rows:
+        return 0
+    location_ids, values = zip(*rows)
+    locations, stats = stats_from_history(location_ids, values)
+    save_stats(cursor, locations, stats)
+    return len(locations)
+
+
+def rebuild_stats() -> int:
+    """
+    Recompute every location's rolling statistics from the fact history
+
+    Needed after loads that skip alert evaluation (backfill.py) or after
+    changing ALERT_WINDOW; alerts are not raised for the history itself.
+
+    Returns:
+        Number of locations with statistics
+    """
+    with database.writer_lock():
+        conn = database.get_db_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            count = reset_stats(cursor)
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"[ERROR] Error rebuilding alert statistics: {e}")
+            return 0
+        finally:
+            conn.close()
+
+    print(f"[OK] Rebuilt alert statistics for {count} locations")
+    return count
+
+
+def first_rules(fired: List[Tuple], size: int) -> Tuple[object, object]:
+    """
+    Reduce run_batch() results to the highest-priority rule per batch row
+
+    Returns:
+        (rule index per row, len(RULES) where none fired; baseline per row)
+    """
+    import numpy as np
+
+    rules = np.full(size, len(RULES), dtype=np.int64)
+    baselines = np.zeros(size, dtype=np.float64)
+    for rule, rows, rule_baselines in fired:
+        first = rule < rules[rows]
+        rules[rows[first]] = rule
+        baselines[rows[first]] = rule_baselines[first]
+    return rules, baselines
+
+
+def alerted_periods(cursor: sqlite3.Cursor, location_ids) -> Set[Tuple[int, int]]:
+    """
+    (location id, forecast_ts) pairs that already have an alert
+    """
+    periods = set()
+    ids = [int(location_id) for location_id in location_ids]
+    for start in range(0, len(ids), database.LOOKUP_CHUNK_SIZE):
+        chunk = ids[start:start + database.LOOKUP_CHUNK_SIZE]
+        cursor.execute(
+            f"SELECT a.location_id, f.forecast_ts FROM alerts a JOIN weather_facts f ON f.id = a.fact_id "
+            f"WHERE a.location_id IN ({','.join('?' * len(chunk))}) AND f.forecast_ts IS NOT NULL",
+            chunk
+        )
+        periods.update(tuple(row) for row in cursor.fetchall())
+    return periods
+
+
+def process_facts(cursor: sqlite3.Cursor, fact_ids, facts: List[tuple]) -> int:
+    """
+    Evaluate alert rules for newly inserted facts (inside the ingest transaction)
+
+    The temperature checked is current_temp, or the mean of min and max
+    when there is no current reading; facts without either are skipped.
+
+    Args:
+        cursor: Cursor in the open write transaction
+        fact_ids: Ids of the inserted facts
+        facts: Rows as passed to database.INSERT_SQL, in the same order
+
+    Returns:
+        Number of alerts written
+    """
+    import numpy as np
+
+    if not facts:
+        return 0
+
+    location_ids, _, min_temp, max_temp, current_temp, forecast_ts, created_ts = zip(*facts)
+    current = np.array(current_temp, dtype=np.float64)
+    middle = (np.array(min_temp, dtype=np.float64) + np.array(max_temp, dtype=np.float64)) / 2
+    values = np.where(np.isnan(current), middle, current)
+    keep = ~np.isnan(values)
+    if not keep.any():
+        return 0
+
+    fact_ids = np.asarray(fact_ids, dtype=np.int64)[keep]
+    values = values[keep]
+    locations, index = np.unique(np.array(location_ids, dtype=np.int64)[keep], return_inverse=True)
+
+    stats = load_stats(cursor, locations)
+    fired = run_batch(stats, index, values)
+    save_stats(cursor, locations, stats)
+
+    rules, baselines = first_rules(fired, len(values))
+    rows = np.flatnonzero(rules < len(RULES))
+    if not len(rows):
+        return 0
+
+    now = int(time.time())
+    timestamps = np.array([now if ts is None else ts for ts in created_ts], dtype=np.int64)[keep]
+    periods = np.array(forecast_ts, dtype=object)[keep]
+    fact_locations = locations[index]
+    alerted = alerted_periods(cursor, np.unique(fact_locations[rows]))
+    alerts = []
+    for row in rows.tolist():
+        location_id = int(fact_locations[row])
+        if periods[row] is not None:
+            if (location_id, periods[row]) in alerted:
+                continue
+            alerted.add((location_id, periods[row]))
+        name, severity, _ = RULES[rules[row]]
+        alerts.append((
+            int(fact_ids[row]), location_id, name, severity, float(values[row]),
+            round(float(baselines[row]), 2), int(timestamps[row]),
+        ))
+    cursor.executemany(
+        'INSERT INTO alerts (fact_id, location_id, rule, severity, value, baseline, created_ts) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?)',
+        alerts
+    )
+    return len(alerts)
+
+
+def main():
+    """
+    Print the most recent alerts, optionally rebuilding the rolling statistics first
+    """
+    parser = argparse.ArgumentParser(description='Weather alerts')
+    parser.add_argument('--db', default=database.DB_NAME, help='SQLite database file')
+    parser.add_argument('--rebuild', action='store_true',
+                        help='recompute rolling statistics from the fact history')
+    args = parser.parse_args()
+
+    database.DB_NAME = args.db
+    database.ensure_database()
+    if args.rebuild:
+        rebuild_stats()
+
+    alerts = database.get_recent_alerts(limit=50)
+    print(f"Recent alerts: {len(alerts)}")
+    for alert in alerts:
+        print(f"  {alert['created_at']}  {alert['severity']:7s} {alert['rule']:12s} "
+              f"{alert['location']}: {alert['value']:.1f}°C (baseline {alert['baseline']})")
+
+
+if __name__ == "__main__":
+    main()
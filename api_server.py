@@ -0,0 +1,357 @@
+"""
+Weather Query Service
+Read-only JSON/HTTP API over the weather database for downstream consumers
+
+Endpoints:
+    GET /latest                         Latest record per location
+    GET /latest?region=...              Latest record per location in one region
+    GET /stats                          Database statistics
+    GET /history?location=...&limit=N   Recent records for one location
+    GET /changes?cursor=N&limit=M       Records ingested after a cursor
+
+Usage:
+    python api_server.py [--host 0.0.0.0] [--port 8080] [--db data.db]
+"""
+
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import database
+from records import to_dicts
+
+
+MAX_HISTORY_LIMIT = 1000
+MAX_CHANGES_LIMIT = 10000
+QUERY_CACHE_SIZE = 256
+# Bodies smaller than this are not worth compressing
+GZIP_MIN_SIZE = 512
+# Request bodies are not used; they are read and discarded in chunks of this size
+DISCARD_CHUNK_SIZE = 65536
+
+STATUS_TEXT = {
+    200: 'OK',
+    304: 'Not Modified',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    500: 'Internal Server Error',
+}
+
+
+class Response:
+    """
+    Pre-serialized response body with its gzip variant and ETag
+    """
+
+    __slots__ = ('status', 'body', 'gzip_body', 'etag')
+
+    def __init__(self, status: int, payload, version: str = ''):
+        self.status = status
+        self.body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self.gzip_body = gzip.compress(self.body, 6) if len(self.body) >= GZIP_MIN_SIZE else None
+        digest = hashlib.blake2b(self.body, digest_size=8).hexdigest()
+        self.etag = f'"{version}-{digest}"' if version else f'"{digest}"'
+
+
+class ResponseCache:
+    """
+    Responses for the current data version
+
+    /latest and /stats are rebuilt eagerly whenever the data version changes;
+    history and per-region responses are built on demand and kept in a
+    small LRU that executor threads share under a lock.
+    """
+
+    def __init__(self):
+        self.version: Optional[str] = None
+        self.fixed: Dict[str, Response] = {}
+        self.queries: "OrderedDict[Tuple, Response]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def rebuild(self, version: str):
+        """
+        Precompute the fixed endpoints for a new data version (blocking)
+        """
+        fixed = {
+            '/latest': Response(200, to_dicts(database.get_latest_weather_records()), version),
+            '/stats': Response(200, database.get_database_stats(), version),
+        }
+        with self.lock:
+            self.fixed = fixed
+            self.queries = OrderedDict()
+            self.version = version
+
+    def get_history(self, location: str, limit: int) -> Response:
+        """
+        Get (and cache) the history response for one location (blocking)
+        """
+        return self._get_cached(
+            ('history', location, limit),
+            lambda: to_dicts(database.get_location_history(location, limit))
+        )
+
+    def get_region(self, region: str) -> Response:
+        """
+        Get (and cache) the latest records of one region (blocking)
+        """
+        return self._get_cached(
+            ('latest', region),
+            lambda: to_dicts(database.get_latest_weather_records(region))
+        )
+
+    def _get_cached(self, key: Tuple, build) -> Response:
+        with self.lock:
+            # Bind to the current generation so a concurrent rebuild cannot mix versions
+            queries, version = self.queries, self.version
+            response = queries.get(key)
+            if response is not None:
+                queries.move_to_end(key)
+                return response
+
+        # Queried outside the lock; concurrent misses for one key may both build it
+        response = Response(200, build(), version)
+        with self.lock:
+            queries[key] = response
+            if len(queries) > QUERY_CACHE_SIZE:
+                queries.popitem(last=False)
+        return response
+
+
+class WeatherAPIServer:
+    """
+    Minimal asyncio HTTP/1.1 server with keep-alive, ETag/304 and gzip
+    """
+
+    def __init__(self, host: str = '0.0.0.0', port: int = 8080, poll_interval: float = 1.0):
+        self.host = host
+        self.port = port
+        self.poll_interval = poll_interval
+        self.cache = ResponseCache()
+        self._refresh_lock = asyncio.Lock()
+
+    async def refresh(self):
+        """
+        Rebuild cached responses if an ingest changed the data version
+        """
+        loop = asyncio.get_running_loop()
+        version = await loop.run_in_executor(None, database.get_data_version)
+        if version == self.cache.version:
+            return
+
+        async with self._refresh_lock:
+            if version != self.cache.version:
+                await loop.run_in_executor(None, self.cache.rebuild, version)
+                print(f"[OK] Response cache rebuilt for data version {version}")
+
+    async def watch_ingest(self):
+        """
+        Poll the cheap data version token and invalidate caches after ingest
+        """
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"[ERROR] Error refreshing response cache: {e}")
+
+    async def route(self, method: str, target: str) -> Response:
+        """
+        Resolve a request target to a (cached) response
+        """
+        if method not in ('GET', 'HEAD'):
+            return Response(405, {'error': 'method not allowed'})
+
+        url = urlsplit(target)
+        if url.path == '/latest' and url.query:
+            region = parse_qs(url.query).get('region', [None])[0]
+            if region:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(None, self.cache.get_region, region)
+
+        response = self.cache.fixed.get(url.path)
+        if response is not None:
+            return response
+
+        if url.path == '/history':
+            query = parse_qs(url.query)
+            location = query.get('location', [None])[0]
+            if not location:
+                return Response(400, {'error': 'location is required'})
+            try:
+                limit = int(query.get('limit', ['100'])[0])
+            except ValueError:
+                return Response(400, {'error': 'limit must be an integer'})
+            limit = max(1, min(limit, MAX_HISTORY_LIMIT))
+
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, self.cache.get_history, location, limit)
+
+        if url.path == '/changes':
+            query = parse_qs(url.query)
+            try:
+                cursor = int(query.get('cursor', ['0'])[0])
+                limit = int(query.get('limit', ['1000'])[0])
+            except ValueError:
+                return Response(400, {'error': 'cursor and limit must be integers'})
+            limit = max(1, min(limit, MAX_CHANGES_LIMIT))
+
+            loop = asyncio.get_running_loop()
+            records, next_cursor = await loop.run_in_executor(
+                None, database.changes_since, cursor, limit
+            )
+            return Response(200, {'records': to_dicts(records), 'cursor': next_cursor})
+
+        return Response(404, {'error': 'not found'})
+
+    @staticmethod
+    async def read_headers(reader: asyncio.StreamReader) -> Dict[str, str]:
+        """
+        Read header lines up to the blank line ending the request head
+        """
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                return headers
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+    @staticmethod
+    async def discard_body(reader: asyncio.StreamReader, headers: Dict[str, str]) -> bool:
+        """
+        Read and drop a request body so the next request on the connection starts in the right place
+
+        Returns:
+            False if the body cannot be framed (chunked), so the connection must close
+
+        Raises:
+            ValueError: For an invalid Content-Length
+        """
+        if 'transfer-encoding' in headers:
+            return False
+        remaining = int(headers.get('content-length', '0'))
+        if remaining < 0:
+            raise ValueError(f"Invalid Content-Length: {remaining}")
+        while remaining:
+            chunk = await reader.readexactly(min(remaining, DISCARD_CHUNK_SIZE))
+            remaining -= len(chunk)
+        return True
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Serve requests on one connection until the client closes it
+        """
+        try:
+            while True:
+                try:
+                    request_line = await reader.readline()
+                    if not request_line:
+                        break
+                    headers = await self.read_headers(reader)
+                    framed = await self.discard_body(reader, headers)
+                except ValueError:
+                    # Line over the stream limit or bad Content-Length: the stream
+                    # position is unknown, so answer and close
+                    writer.write(self.render(Response(400, {'error': 'bad request'}), 'GET', {}, False))
+                    await writer.drain()
+                    break
+
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    response = Response(400, {'error': 'bad request'})
+                    method, version = 'GET', 'HTTP/1.0'
+                else:
+                    try:
+                        response = await self.route(method, target)
+                    except Exception as e:
+                        print(f"[ERROR] Error handling {target}: {e}")
+                        response = Response(500, {'error': 'internal server error'})
+
+                keep_alive = (
+                    framed and version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                )
+                writer.write(self.render(response, method, headers, keep_alive))
+                await writer.drain()
+
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def render(response: Response, method: str, headers: Dict[str, str], keep_alive: bool) -> bytes:
+        """
+        Serialize status line, headers and body for one response
+        """
+        status = response.status
+        body = response.body
+        extra = [f'ETag: {response.etag}', 'Cache-Control: no-cache']
+
+        if status == 200 and response.etag in headers.get('if-none-match', ''):
+            status = 304
+            body = b''
+        elif response.gzip_body is not None and 'gzip' in headers.get('accept-encoding', ''):
+            body = response.gzip_body
+            extra.append('Content-Encoding: gzip')
+
+        if response.gzip_body is not None:
+            extra.append('Vary: Accept-Encoding')
+
+        lines = [
+            f'HTTP/1.1 {status} {STATUS_TEXT[status]}',
+            'Content-Type: application/json; charset=utf-8',
+            f'Content-Length: {len(body) if status != 304 else 0}',
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ] + extra
+        head = ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+        return head if method == 'HEAD' or status == 304 else head + body
+
+    async def serve(self):
+        """
+        Warm the cache, start the ingest watcher and serve forever
+        """
+        await self.refresh()
+        watcher = asyncio.create_task(self.watch_ingest())
+        server = await asyncio.start_server(self.handle_client, self.host, self.port)
+        print(f"[OK] Weather API listening on http://{self.host}:{self.port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            watcher.cancel()
+
+
+def main():
+    """
+    Start the weather query service
+    """
+    parser = argparse.ArgumentParser(description='Read-only weather query service')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--db', default=database.DB_NAME, help='SQLite database file')
+    parser.add_argument('--poll-interval', type=float, default=1.0,
+                        help='seconds between data version checks')
+    args = parser.parse_args()
+
+    database.DB_NAME = args.db
+    database.ensure_database()
+
+    server = WeatherAPIServer(args.host, args.port, args.poll_interval)
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        print("\n[OK] Weather API stopped")
+
+
+if __name__ == "__main__":
+    main()
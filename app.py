@@ -3,14 +3,19 @@ Streamlit Weather Dashboard
 Displays weather data from SQLite database with CWA-style interface
 """
 
+import time
+
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import datetime
 import database
-import fetch_weather
-import main as pipeline
+import heatmap
+import live
+import render
+import replica
+import snapshot
+import verification
+
+# pandas, plotly and the fetch pipeline are imported lazily where they are
+# used so a cold start only pays for what the first render needs
 
 
 # Page configuration
@@ -22,63 +27,6 @@ st.set_page_config(
 )
 
 
-# Taiwan city coordinates (latitude, longitude)
-CITY_COORDINATES = {
-    # 北部
-    '臺北': (25.0330, 121.5654),
-    '臺北市': (25.0330, 121.5654),
-    '新北': (25.0120, 121.4654),
-    '新北市': (25.0120, 121.4654),
-    '基隆': (25.1276, 121.7392),
-    '基隆市': (25.1276, 121.7392),
-    '桃園': (24.9936, 121.3010),
-    '桃園市': (24.9936, 121.3010),
-    '新竹': (24.8138, 120.9675),
-    '新竹市': (24.8138, 120.9675),
-    '新竹縣': (24.8387, 121.0177),
-    '宜蘭': (24.7021, 121.7378),
-    '宜蘭縣': (24.7021, 121.7378),
-    
-    # 中部
-    '苗栗': (24.5602, 120.8214),
-    '苗栗縣': (24.5602, 120.8214),
-    '臺中': (24.1477, 120.6736),
-    '臺中市': (24.1477, 120.6736),
-    '彰化': (24.0518, 120.5161),
-    '彰化縣': (24.0518, 120.5161),
-    '南投': (23.9609, 120.9719),
-    '南投縣': (23.9609, 120.9719),
-    '雲林': (23.7092, 120.4313),
-    '雲林縣': (23.7092, 120.4313),
-    
-    # 南部
-    '嘉義': (23.4800, 120.4491),
-    '嘉義市': (23.4800, 120.4491),
-    '嘉義縣': (23.4518, 120.2554),
-    '臺南': (22.9998, 120.2269),
-    '臺南市': (22.9998, 120.2269),
-    '高雄': (22.6273, 120.3014),
-    '高雄市': (22.6273, 120.3014),
-    '屏東': (22.6820, 120.4950),
-    '屏東縣': (22.6820, 120.4950),
-    
-    # 東部
-    '花蓮': (23.9871, 121.6015),
-    '花蓮縣': (23.9871, 121.6015),
-    '臺東': (22.7972, 121.0713),
-    '臺東縣': (22.7972, 121.0713),
-    
-    # 離島
-    '澎湖': (23.5711, 119.5793),
-    '澎湖縣': (23.5711, 119.5793),
-    '金門': (24.4491, 118.3765),
-    '金門縣': (24.4491, 118.3765),
-    '連江': (26.1605, 119.9512),
-    '連江縣': (26.1605, 119.9512),
-    '馬祖': (26.1605, 119.9512),
-}
-
-
 def get_temperature_color(temp: float) -> str:
     """
     Get color based on temperature value (cold to hot gradient)
@@ -89,36 +37,15 @@ def get_temperature_color(temp: float) -> str:
     Returns:
         Hex color code
     """
-    if temp is None:
-        return '#CCCCCC'
-    
-    # Temperature color scale (blue to red)
-    if temp < 10:
-        return '#0066CC'  # Dark blue (very cold)
-    elif temp < 15:
-        return '#3399FF'  # Blue (cold)
-    elif temp < 20:
-        return '#66CCFF'  # Light blue (cool)
-    elif temp < 25:
-        return '#99FF99'  # Light green (comfortable)
-    elif temp < 28:
-        return '#FFFF66'  # Yellow (warm)
-    elif temp < 32:
-        return '#FFCC33'  # Orange (hot)
-    elif temp < 35:
-        return '#FF6633'  # Dark orange (very hot)
-    else:
-        return '#CC0000'  # Red (extremely hot)
+    # Temperature color scale (blue to red), shared with the heatmap layer
+    return heatmap.temperature_color(temp)
 
 
 def style_temperature_cell(val):
     """
     Style temperature cells with background color
     """
-    if pd.isna(val):
-        return ''
-    color = get_temperature_color(float(val))
-    return f'background-color: {color}; color: white; font-weight: bold;'
+    return render.temperature_cell_style(val)
 
 
 def create_temperature_legend():
@@ -177,160 +104,172 @@ def display_statistics(stats: dict):
             st.metric("🥵 最高溫", "N/A")
 
 
-def display_weather_table(df: pd.DataFrame, region_filter: str = "全部"):
+def display_weather_table(payload: render.RegionPayload):
     """
     Display weather data table with color coding
     """
-    # Filter by region
-    if region_filter != "全部":
-        df = df[df['地區'] == region_filter]
-    
-    if df.empty:
+    # Rows are already filtered by region from the shared snapshot
+    if payload.table.empty:
         st.warning("沒有資料可顯示")
         return
     
     # Create styled dataframe
     st.markdown("### 📋 天氣資料表")
     
-    # Display table with color coding
-    styled_df = df.style.applymap(
-        style_temperature_cell,
-        subset=['最低溫 (°C)', '最高溫 (°C)', '當前溫度 (°C)']
-    )
-    
+    # Display table with precomputed color coding
     st.dataframe(
-        styled_df,
+        payload.styled_table(),
         use_container_width=True,
         height=500
     )
 
 
-def create_temperature_map(df: pd.DataFrame):
+ACCURACY_COLUMNS = {
+    'name': '名稱',
+    'pairs': '樣本數',
+    'min_mae': '最低溫 MAE',
+    'min_bias': '最低溫偏差',
+    'max_mae': '最高溫 MAE',
+    'max_bias': '最高溫偏差',
+}
+
+
+def display_accuracy_panel(report: verification.AccuracyReport, payload: render.RegionPayload):
     """
-    Create a temperature visualization map with Taiwan geography
+    Display forecast accuracy (MAE and bias) by region, lead time and location
     """
-    if df.empty:
+    st.markdown("### 🎯 預報準確度")
+    
+    if not report:
+        st.info("尚無可驗證的預報（需要同一預報時段的多次下載資料）")
         return
     
-    st.markdown("### 🗺️ 台灣溫度分布圖")
+    st.caption(f"以同一地點、同一預報時段最新一次下載的預報為基準，共 {report.pairs} 筆比對")
     
-    # Prepare data for map
-    map_data = []
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("**依地區**")
+        st.dataframe(report.to_frame('region').rename(columns=ACCURACY_COLUMNS),
+                     use_container_width=True, hide_index=True)
+    with col2:
+        st.markdown("**依預報提前時間**")
+        st.dataframe(report.to_frame('lead').rename(columns=ACCURACY_COLUMNS),
+                     use_container_width=True, hide_index=True)
+    
+    by_location = report.to_frame('location')
+    if payload.region != render.ALL_REGIONS:
+        by_location = by_location[by_location['name'].isin(payload.table['地點'])]
+    with st.expander("依地點"):
+        st.dataframe(by_location.rename(columns=ACCURACY_COLUMNS),
+                     use_container_width=True, hide_index=True)
+
+
+ALERT_RULE_LABELS = {
+    'extreme_heat': '極端高溫',
+    'extreme_cold': '極端低溫',
+    'sudden_drop': '驟降',
+    'sudden_rise': '驟升',
+    'anomaly': '異常',
+}
+
+ALERT_SEVERITY_LABELS = {
+    'warning': '警告',
+    'info': '注意',
+}
+
+
+def display_alerts(alerts: list, region: str):
+    """
+    Display alerts raised on ingest for the selected region
+    """
+    st.markdown("### ⚠️ 天氣警示")
     
-    for _, row in df.iterrows():
-        location = row['地點']
-        
-        # Get coordinates for this location
-        coords = None
-        # Try exact match first
-        if location in CITY_COORDINATES:
-            coords = CITY_COORDINATES[location]
-        else:
-            # Try partial match (remove 市/縣 suffix)
-            for key in CITY_COORDINATES:
-                if location.replace('市', '').replace('縣', '') in key or key in location:
-                    coords = CITY_COORDINATES[key]
-                    break
-        
-        if coords is None:
-            continue
-        
-        # Get temperature
-        temp = row['當前溫度 (°C)'] if pd.notna(row['當前溫度 (°C)']) else \
-               (row['最低溫 (°C)'] + row['最高溫 (°C)']) / 2 if pd.notna(row['最低溫 (°C)']) and pd.notna(row['最高溫 (°C)']) else None
-        
-        if temp is not None:
-            map_data.append({
-                'location': location,
-                'lat': coords[0],
-                'lon': coords[1],
-                'temp': temp,
-                'region': row['地區'],
-                'description': row['天氣描述'],
-                'color': get_temperature_color(temp)
-            })
-    
-    if not map_data:
-        st.warning("無法顯示地圖：沒有找到對應的城市座標")
+    if region != render.ALL_REGIONS:
+        alerts = [alert for alert in alerts if alert['region'] == region]
+    if not alerts:
+        st.info("目前沒有警示")
         return
     
-    # Create map figure
-    fig = go.Figure()
-    
-    # Add temperature markers
-    for data in map_data:
-        fig.add_trace(go.Scattergeo(
-            lon=[data['lon']],
-            lat=[data['lat']],
-            text=f"{data['location']}<br>{data['temp']:.1f}°C",
-            mode='markers+text',
-            marker=dict(
-                size=20,
-                color=data['color'],
-                line=dict(width=2, color='white')
-            ),
-            textfont=dict(
-                size=10,
-                color='black',
-                family='Arial Black'
-            ),
-            textposition='top center',
-            name=data['location'],
-            showlegend=False,
-            hovertemplate=f"<b>{data['location']}</b><br>" +
-                         f"地區: {data['region']}<br>" +
-                         f"溫度: {data['temp']:.1f}°C<br>" +
-                         f"天氣: {data['description']}<extra></extra>"
-        ))
-    
-    # Update map layout to focus on Taiwan
-    fig.update_geos(
-        center=dict(lon=120.9, lat=23.7),  # Center on Taiwan
-        projection_scale=25,  # Zoom level
-        visible=True,
-        resolution=50,
-        showcountries=True,
-        countrycolor="lightgray",
-        showcoastlines=True,
-        coastlinecolor="gray",
-        showland=True,
-        landcolor="rgb(243, 243, 243)",
-        showocean=True,
-        oceancolor="rgb(204, 229, 255)",
-        showlakes=False,
-        showrivers=False
+    st.dataframe(
+        [
+            {
+                '時間': alert['created_at'],
+                '地點': alert['location'],
+                '類型': ALERT_RULE_LABELS.get(alert['rule'], alert['rule']),
+                '等級': ALERT_SEVERITY_LABELS.get(alert['severity'], alert['severity']),
+                '溫度 (°C)': alert['value'],
+                '基準 (°C)': alert['baseline'],
+            }
+            for alert in alerts
+        ],
+        use_container_width=True,
+        hide_index=True
     )
+
+
+def create_temperature_map(payload: render.RegionPayload):
+    """
+    Display the temperature map with Taiwan geography
     
-    fig.update_layout(
-        title={
-            'text': "台灣各地溫度分布",
-            'x': 0.5,
-            'xanchor': 'center'
-        },
-        height=700,
-        margin=dict(l=0, r=0, t=50, b=0)
-    )
+    Args:
+        payload: Region payload holding the finished figure
+    """
+    if payload.table.empty:
+        return
+    
+    st.markdown("### 🗺️ 台灣溫度分布圖")
+    
+    if payload.figure is None:
+        st.warning("無法顯示地圖：沒有找到對應的城市座標")
+        return
     
-    st.plotly_chart(fig, use_container_width=True)
+    st.plotly_chart(payload.figure, use_container_width=True)
+
+
+@st.fragment(run_every=live.SESSION_POLL_INTERVAL)
+def live_status(rendered_generation: int):
+    """
+    Poll the shared live watcher and rerun the page only after new data arrived
+
+    Only this small fragment runs every SESSION_POLL_INTERVAL seconds; an
+    idle tick compares two integers in memory. After an ingest the page
+    reruns once and every component is drawn from the per-version caches.
+    """
+    if live.generation() != rendered_generation:
+        st.rerun()
+    
+    updated_at = live.last_update()
+    if updated_at is not None:
+        st.caption(f"🟢 監看中 · 新資料於 {time.strftime('%H:%M:%S', time.localtime(updated_at))}")
+    else:
+        st.caption("🟢 監看中")
 
 
 def main():
     """
     Main Streamlit application
     """
+    # Initialize database (schema DDL runs once per process)
+    database.ensure_database()
+    
     # Header
     st.title("🌤️ 台灣天氣資料儀表板")
     st.markdown("**資料來源：中央氣象署 (CWA)**")
     st.markdown("---")
     
+    # A replica dashboard only reads; writes from here would go to a local
+    # data.db that the page never shows
+    read_only = bool(database.READ_REPLICA_DIR)
+    
     # Sidebar
     with st.sidebar:
         st.header("⚙️ 控制面板")
         
         # Refresh button
-        if st.button("🔄 更新天氣資料", use_container_width=True):
+        if st.button("🔄 更新天氣資料", use_container_width=True, disabled=read_only):
             with st.spinner("正在下載最新天氣資料..."):
                 try:
+                    import main as pipeline
                     pipeline.main()
                     st.success("✓ 資料更新成功！")
                     st.rerun()
@@ -343,35 +282,64 @@ def main():
         st.subheader("🗺️ 地區篩選")
         region_filter = st.selectbox(
             "選擇地區",
-            ["全部", "北部", "中部", "南部", "東部", "離島"]
+            render.REGIONS
         )
         
+        # Interpolated temperature surface
+        show_surface = st.checkbox("顯示溫度分布面", value=True)
+        surface_resolution = st.select_slider(
+            "分布面解析度 (度)",
+            options=[0.1, 0.05, 0.025],
+            value=0.05,
+            disabled=not show_surface
+        )
+        
+        st.markdown("---")
+        
+        # Live mode: new data is shown without reloading the page
+        st.subheader("📡 即時模式")
+        live_mode = st.toggle("自動顯示新資料", value=False)
+        if live_mode:
+            live.start()
+        # Shared snapshot of the latest weather data; every component draws it.
+        # The generation is read first so data arriving in between reruns once more.
+        rendered_generation = live.generation()
+        weather_snapshot = snapshot.get_snapshot()
+        if live_mode:
+            live_status(rendered_generation)
+        
         st.markdown("---")
         
         # Database info
         st.subheader("ℹ️ 資料庫資訊")
-        stats = database.get_database_stats()
+        # Stats are cached per version
+        stats = live.get_database_stats(weather_snapshot.version)
         
         if stats['latest_update']:
             st.info(f"最後更新: {stats['latest_update']}")
         else:
             st.warning("尚無資料")
         
+        if database.READ_REPLICA_DIR:
+            if replica.get_reader(database.READ_REPLICA_DIR).manifest() is None:
+                st.warning(f"唯讀副本：{database.READ_REPLICA_DIR} 尚未發布副本")
+            else:
+                st.caption(f"唯讀副本：{database.READ_REPLICA_DIR}（資料版本 {weather_snapshot.version}）")
+        
         st.markdown("---")
         
         # Clear old data button
-        if st.button("🗑️ 清除舊資料 (7天前)", use_container_width=True):
+        if read_only:
+            st.caption("唯讀副本模式：請在主資料庫主機更新或清除資料")
+        if st.button("🗑️ 清除舊資料 (7天前)", use_container_width=True, disabled=read_only):
             database.clear_old_records(7)
+            # Other processes and dashboard replicas read published copies
+            snapshot.publish_snapshot()
+            replica.publish_configured()
             st.success("✓ 舊資料已清除")
             st.rerun()
     
     # Main content
-    # Initialize database
-    database.init_database()
-    
-    # Get statistics
-    stats = database.get_database_stats()
-    
     # Display statistics
     display_statistics(stats)
     
@@ -382,39 +350,36 @@ def main():
     
     st.markdown("---")
     
-    # Get weather data
-    records = database.get_latest_weather_records()
-    
-    if not records:
-        st.warning("⚠️ 資料庫中沒有天氣資料。請點擊側邊欄的「更新天氣資料」按鈕下載資料。")
+    if not weather_snapshot:
+        if read_only:
+            st.warning("⚠️ 唯讀副本中沒有天氣資料。請在主資料庫主機下載資料並發布副本。")
+        else:
+            st.warning("⚠️ 資料庫中沒有天氣資料。請點擊側邊欄的「更新天氣資料」按鈕下載資料。")
         return
     
-    # Convert to DataFrame
-    df = pd.DataFrame(records)
-    
-    # Rename columns for display
-    df_display = df.rename(columns={
-        'location': '地點',
-        'region': '地區',
-        'min_temp': '最低溫 (°C)',
-        'max_temp': '最高溫 (°C)',
-        'current_temp': '當前溫度 (°C)',
-        'description': '天氣描述',
-        'forecast_time': '預報時間',
-        'created_at': '資料時間'
-    })
-    
-    # Select columns to display
-    display_columns = ['地點', '地區', '最低溫 (°C)', '最高溫 (°C)', '當前溫度 (°C)', '天氣描述']
-    df_display = df_display[display_columns]
+    # Interpolated surface is computed once per data version and resolution
+    surface = heatmap.get_heatmap_layer(weather_snapshot, surface_resolution) if show_surface else None
+    
+    # Table and map for the selected region, built once per data version
+    payload = render.get_region_payload(weather_snapshot, region_filter, surface)
+    
+    # Alerts are evaluated on ingest; the dashboard only reads them
+    display_alerts(live.get_recent_alerts(weather_snapshot.version), region_filter)
+    
+    st.markdown("---")
     
     # Create temperature map
-    create_temperature_map(df_display)
+    create_temperature_map(payload)
     
     st.markdown("---")
     
     # Display table
-    display_weather_table(df_display, region_filter)
+    display_weather_table(payload)
+    
+    st.markdown("---")
+    
+    # Forecast accuracy is updated incrementally once per data version
+    display_accuracy_panel(verification.get_accuracy_report(), payload)
     
     # Footer
     st.markdown("---")
@@ -0,0 +1,288 @@
+"""
+Raw Payload Archive
+Content-addressed, compressed store of raw CWA API responses
+
+Each distinct payload is stored once under its SHA-256 digest; repeated
+identical downloads only add a row to the fetch index. The index lives in
+its own SQLite file next to the blobs so the archive survives database
+rebuilds and can be replayed with backfill.py.
+
+Layout:
+    raw_archive/index.db                  fetch-time index
+    raw_archive/objects/ab/abcdef....xz   compressed payloads
+"""
+
+import argparse
+import hashlib
+import lzma
+import os
+import sqlite3
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import fileutil
+
+try:
+    import zstandard
+except ImportError:  # optional; fall back to lzma from the standard library
+    zstandard = None
+
+
+ARCHIVE_DIR = 'raw_archive'
+RETENTION_DAYS = 90
+ZSTD_LEVEL = 10
+
+CODEC_EXTENSIONS = {'zstd': '.zst', 'lzma': '.xz'}
+
+SCHEMA_STATEMENTS = [
+    '''
+    CREATE TABLE IF NOT EXISTS blobs (
+        digest TEXT PRIMARY KEY,
+        codec TEXT NOT NULL,
+        raw_size INTEGER NOT NULL,
+        stored_size INTEGER NOT NULL
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS fetches (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        fetched_ts INTEGER NOT NULL,
+        digest TEXT NOT NULL REFERENCES blobs (digest)
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_fetches_fetched ON fetches (fetched_ts)',
+    'CREATE INDEX IF NOT EXISTS idx_fetches_digest ON fetches (digest)',
+]
+
+
+def default_codec() -> str:
+    """
+    Best available compression codec
+    """
+    return 'zstd' if zstandard is not None else 'lzma'
+
+
+def compress(raw: bytes, codec: str) -> bytes:
+    """
+    Compress a payload with the given codec
+    """
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    if codec == 'lzma':
+        return lzma.compress(raw)
+    raise ValueError(f"Unknown codec: {codec}")
+
+
+def decompress(blob: bytes, codec: str) -> bytes:
+    """
+    Decompress a stored payload
+    """
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read this archive entry")
+        return zstandard.ZstdDecompressor().decompress(blob)
+    if codec == 'lzma':
+        return lzma.decompress(blob)
+    raise ValueError(f"Unknown codec: {codec}")
+
+
+def _blob_path(archive_dir: str, digest: str, codec: str) -> str:
+    return os.path.join(archive_dir, 'objects', digest[:2], digest + CODEC_EXTENSIONS[codec])
+
+
+def _connect(archive_dir: str) -> sqlite3.Connection:
+    """
+    Open the archive index, creating the archive on first use
+    """
+    os.makedirs(os.path.join(archive_dir, 'objects'), exist_ok=True)
+    conn = sqlite3.connect(os.path.join(archive_dir, 'index.db'), timeout=30.0,
+                           isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    for statement in SCHEMA_STATEMENTS:
+        conn.execute(statement)
+    return conn
+
+
+def store_payload(raw: bytes, fetched_at: Optional[float] = None,
+                  archive_dir: Optional[str] = None) -> str:
+    """
+    Archive one raw payload, deduplicating identical content
+
+    Args:
+        raw: Response body exactly as downloaded
+        fetched_at: Fetch time as a Unix timestamp (default: now)
+        archive_dir: Archive directory (default: ARCHIVE_DIR)
+
+    Returns:
+        SHA-256 hex digest of the payload
+    """
+    archive_dir = archive_dir or ARCHIVE_DIR
+    digest = hashlib.sha256(raw).hexdigest()
+    fetched_ts = int(fetched_at if fetched_at is not None else time.time())
+
+    conn = _connect(archive_dir)
+    try:
+        # Serialize with evict() so a blob cannot be removed while re-referenced
+        conn.execute('BEGIN IMMEDIATE')
+        known = conn.execute('SELECT codec FROM blobs WHERE digest = ?', (digest,)).fetchone()
+        if known is None or not os.path.exists(_blob_path(archive_dir, digest, known['codec'])):
+            codec = default_codec()
+            blob = compress(raw, codec)
+            fileutil.write_atomic(_blob_path(archive_dir, digest, codec), lambda f: f.write(blob))
+            conn.execute(
+                'INSERT OR REPLACE INTO blobs (digest, codec, raw_size, stored_size) VALUES (?, ?, ?, ?)',
+                (digest, codec, len(raw), len(blob))
+            )
+        conn.execute('INSERT INTO fetches (fetched_ts, digest) VALUES (?, ?)', (fetched_ts, digest))
+        conn.execute('COMMIT')
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+
+    return digest
+
+
+def load_payload(digest: str, archive_dir: Optional[str] = None) -> bytes:
+    """
+    Read back one archived payload
+
+    Raises:
+        KeyError: If the digest is not in the archive
+    """
+    archive_dir = archive_dir or ARCHIVE_DIR
+    conn = _connect(archive_dir)
+    try:
+        row = conn.execute('SELECT codec FROM blobs WHERE digest = ?', (digest,)).fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        raise KeyError(digest)
+
+    with open(_blob_path(archive_dir, digest, row['codec']), 'rb') as f:
+        return decompress(f.read(), row['codec'])
+
+
+def list_fetches(since: Optional[float] = None, until: Optional[float] = None,
+                 archive_dir: Optional[str] = None) -> List[Dict]:
+    """
+    List archived fetches in fetch-time order
+
+    Args:
+        since: Inclusive lower bound (Unix timestamp)
+        until: Exclusive upper bound (Unix timestamp)
+
+    Returns:
+        List of dictionaries with id, fetched_ts and digest
+    """
+    conn = _connect(archive_dir or ARCHIVE_DIR)
+    try:
+        rows = conn.execute(
+            '''
+            SELECT id, fetched_ts, digest FROM fetches
+            WHERE fetched_ts >= ? AND fetched_ts < ?
+            ORDER BY fetched_ts, id
+            ''',
+            (int(since) if since is not None else 0,
+             int(until) if until is not None else 2 ** 62)
+        ).fetchall()
+    finally:
+        conn.close()
+    return [dict(row) for row in rows]
+
+
+def evict(retention_days: int = RETENTION_DAYS, archive_dir: Optional[str] = None) -> int:
+    """
+    Drop fetches older than the retention window and any blobs left unreferenced
+
+    Returns:
+        Number of blobs removed
+    """
+    archive_dir = archive_dir or ARCHIVE_DIR
+    cutoff = int(time.time()) - retention_days * 86400
+
+    conn = _connect(archive_dir)
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        conn.execute('DELETE FROM fetches WHERE fetched_ts < ?', (cutoff,))
+        orphans = conn.execute(
+            '''
+            SELECT digest, codec FROM blobs
+            WHERE NOT EXISTS (SELECT 1 FROM fetches WHERE fetches.digest = blobs.digest)
+            '''
+        ).fetchall()
+        for row in orphans:
+            try:
+                os.remove(_blob_path(archive_dir, row['digest'], row['codec']))
+            except FileNotFoundError:
+                pass
+        conn.executemany('DELETE FROM blobs WHERE digest = ?', [(row['digest'],) for row in orphans])
+        conn.execute('COMMIT')
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+
+    return len(orphans)
+
+
+def get_archive_stats(archive_dir: Optional[str] = None) -> Dict:
+    """
+    Summary of archive size and deduplication
+
+    Returns:
+        Dictionary with fetch/blob counts, raw and stored bytes and time range
+    """
+    conn = _connect(archive_dir or ARCHIVE_DIR)
+    try:
+        fetches = conn.execute(
+            '''
+            SELECT COUNT(*) AS fetches, MIN(fetched_ts) AS first, MAX(fetched_ts) AS last,
+                   TOTAL(b.raw_size) AS fetched_bytes
+            FROM fetches f JOIN blobs b ON b.digest = f.digest
+            '''
+        ).fetchone()
+        blobs = conn.execute(
+            'SELECT COUNT(*) AS blobs, TOTAL(raw_size) AS raw, TOTAL(stored_size) AS stored FROM blobs'
+        ).fetchone()
+    finally:
+        conn.close()
+
+    def fmt(ts):
+        return datetime.fromtimestamp(ts, tz=timezone.utc).strftime('%Y-%m-%d %H:%M:%S') if ts else None
+
+    return {
+        'fetches': fetches['fetches'],
+        'unique_payloads': blobs['blobs'],
+        'fetched_bytes': int(fetches['fetched_bytes']),
+        'stored_bytes': int(blobs['stored']),
+        'first_fetch': fmt(fetches['first']),
+        'last_fetch': fmt(fetches['last']),
+    }
+
+
+def main():
+    """
+    Show archive statistics or apply retention from the command line
+    """
+    parser = argparse.ArgumentParser(description='Raw CWA payload archive')
+    parser.add_argument('--dir', default=ARCHIVE_DIR, help='archive directory')
+    parser.add_argument('--evict', type=int, metavar='DAYS', default=None,
+                        help='remove fetches older than DAYS and unreferenced payloads')
+    args = parser.parse_args()
+
+    if args.evict is not None:
+        removed = evict(args.evict, args.dir)
+        print(f"[OK] Evicted {removed} payloads older than {args.evict} days")
+
+    for key, value in get_archive_stats(args.dir).items():
+        print(f"  {key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
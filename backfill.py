@@ -0,0 +1,281 @@
+"""
+Historical Backfill
+Re-ingests archived raw CWA JSON payloads into the database, from plain
+JSON files or from the raw payload archive written by fetch_weather.py
+
+Payload files are parsed in parallel by a process pool and loaded by a
+single writer in large transactions, with secondary indexes rebuilt once
+at the end. Progress is checkpointed so an interrupted run can resume.
+
+Usage:
+    python backfill.py <dir-or-glob> [...] [--db data.db] [--workers N]
+    python backfill.py --archive raw_archive [--db data.db]
+"""
+
+import argparse
+import contextlib
+import glob
+import io
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set, Tuple
+
+import alerts
+import database
+import replica
+import snapshot
+from records import WeatherRecord
+
+
+PAYLOAD_PATTERNS = ('*.json',)
+DEFAULT_BATCH_ROWS = 50000
+# Seconds between progress lines
+REPORT_INTERVAL = 5.0
+
+
+def find_payload_files(sources: List[str]) -> List[str]:
+    """
+    Expand directories and glob patterns into a sorted list of payload files
+
+    Args:
+        sources: Directories (searched recursively) or glob patterns
+
+    Returns:
+        Sorted, de-duplicated list of file paths
+    """
+    files = set()
+    for source in sources:
+        if os.path.isdir(source):
+            for pattern in PAYLOAD_PATTERNS:
+                files.update(glob.glob(os.path.join(source, '**', pattern), recursive=True))
+        else:
+            files.update(path for path in glob.glob(source, recursive=True) if os.path.isfile(path))
+    return sorted(os.path.abspath(path) for path in files)
+
+
+def load_payload(path: str) -> Dict:
+    """
+    Read one raw payload file
+    """
+    with open(path, 'rb') as f:
+        return json.loads(f.read())
+
+
+def payload_fetch_time(path: str) -> str:
+    """
+    Fetch time of a payload file, formatted like SQLite CURRENT_TIMESTAMP (UTC)
+    """
+    mtime = os.path.getmtime(path)
+    return datetime.fromtimestamp(mtime, tz=timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def parse_records(data: Dict, created_at: str) -> List[WeatherRecord]:
+    """
+    Parse one payload into weather records stamped with its fetch time
+    """
+    import fetch_weather
+
+    # parse_weather_data() prints a line per location; keep workers quiet
+    with contextlib.redirect_stdout(io.StringIO()):
+        records = fetch_weather.parse_weather_data(data)
+
+    return [record._replace(created_at=created_at) for record in records]
+
+
+def parse_payload_file(path: str) -> Tuple[str, Optional[List[WeatherRecord]]]:
+    """
+    Parse one payload file into weather records (runs in a worker process)
+
+    Returns:
+        Tuple of (path, records), with records None if the file is unreadable
+    """
+    try:
+        data = load_payload(path)
+    except (OSError, ValueError):
+        return path, None
+    return path, parse_records(data, payload_fetch_time(path))
+
+
+def parse_archived_payload(job: Tuple[str, str, str, int]) -> Tuple[str, Optional[List[WeatherRecord]]]:
+    """
+    Parse one payload from the raw archive (runs in a worker process)
+
+    Args:
+        job: Tuple of (checkpoint key, archive directory, digest, fetch timestamp)
+
+    Returns:
+        Tuple of (checkpoint key, records), with records None if unreadable
+    """
+    import archive
+
+    key, archive_dir, digest, fetched_ts = job
+    try:
+        data = json.loads(archive.load_payload(digest, archive_dir))
+    except (OSError, ValueError, KeyError, RuntimeError):
+        return key, None
+    created_at = datetime.fromtimestamp(fetched_ts, tz=timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    return key, parse_records(data, created_at)
+
+
+def find_archived_payloads(archive_dir: str) -> List[Tuple[str, str, str, int]]:
+    """
+    List archive fetches as parse jobs keyed by fetch id
+    """
+    import archive
+
+    return [
+        (f"archive:{fetch['id']}", archive_dir, fetch['digest'], fetch['fetched_ts'])
+        for fetch in archive.list_fetches(archive_dir=archive_dir)
+    ]
+
+
+def load_checkpoint(path: Optional[str]) -> Set[str]:
+    """
+    Read the set of payload files already loaded by a previous run
+    """
+    if not path or not os.path.exists(path):
+        return set()
+    with open(path, 'r', encoding='utf-8') as f:
+        return set(json.load(f).get('completed', []))
+
+
+def save_checkpoint(path: Optional[str], completed: Set[str]):
+    """
+    Atomically write the set of loaded payload files
+    """
+    if not path:
+        return
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'completed': sorted(completed), 'updated_at': datetime.now().isoformat()}, f)
+    os.replace(tmp_path, path)
+
+
+def backfill(sources: List[str], workers: Optional[int] = None,
+             batch_rows: int = DEFAULT_BATCH_ROWS, checkpoint: Optional[str] = None,
+             defer_indexes: bool = True, archive_dir: Optional[str] = None) -> Dict:
+    """
+    Parse payload files in parallel and bulk-load them into the database
+
+    Args:
+        sources: Directories or glob patterns of raw payload files
+        workers: Parser processes (default: CPU count)
+        batch_rows: Rows per committed transaction
+        checkpoint: Progress file; files listed there are skipped
+        defer_indexes: Rebuild secondary indexes once at the end
+        archive_dir: Also replay every fetch recorded in this raw archive
+
+    Returns:
+        Dictionary with files, failed, rows and elapsed seconds
+    """
+    database.ensure_database()
+
+    completed = load_checkpoint(checkpoint)
+    # (checkpoint key, parser, parser argument)
+    jobs = [(path, parse_payload_file, path) for path in find_payload_files(sources)]
+    if archive_dir:
+        jobs += [(job[0], parse_archived_payload, job) for job in find_archived_payloads(archive_dir)]
+    jobs = [job for job in jobs if job[0] not in completed]
+    print(f"Found {len(jobs)} payloads to load ({len(completed)} already done)")
+
+    stats = {'files': 0, 'failed': 0, 'rows': 0, 'elapsed': 0.0}
+    if not jobs:
+        return stats
+
+    start = time.perf_counter()
+    last_report = start
+    pending_files: List[str] = []
+    pending_rows = 0
+
+    with database.bulk_loader(defer_indexes=defer_indexes) as loader, \
+            ProcessPoolExecutor(max_workers=workers) as pool:
+
+        def flush():
+            nonlocal pending_rows
+            loader.commit()
+            completed.update(pending_files)
+            save_checkpoint(checkpoint, completed)
+            pending_files.clear()
+            pending_rows = 0
+
+        chunksize = max(1, min(64, len(jobs) // ((workers or os.cpu_count() or 1) * 4)))
+        results = itertools.chain.from_iterable(
+            pool.map(parse, [job[2] for job in group], chunksize=chunksize)
+            for parse, group in itertools.groupby(jobs, key=lambda job: job[1])
+        )
+        for path, records in results:
+            if records is None:
+                stats['failed'] += 1
+                print(f"[ERROR] Could not read payload: {path}")
+                continue
+
+            inserted = loader.insert(records)
+            stats['files'] += 1
+            stats['rows'] += inserted
+            pending_files.append(path)
+            pending_rows += inserted
+
+            if pending_rows >= batch_rows:
+                flush()
+
+            now = time.perf_counter()
+            if now - last_report >= REPORT_INTERVAL:
+                elapsed = now - start
+                print(f"  {stats['files']}/{len(jobs)} files, {stats['rows']} rows "
+                      f"({stats['files'] / elapsed:.1f} files/s, {stats['rows'] / elapsed:.0f} rows/s)")
+                last_report = now
+
+        flush()
+
+    stats['elapsed'] = time.perf_counter() - start
+    return stats
+
+
+def main():
+    """
+    Run a backfill from the command line
+    """
+    parser = argparse.ArgumentParser(description='Backfill the database from archived CWA payloads')
+    parser.add_argument('sources', nargs='*', help='payload directories or glob patterns')
+    parser.add_argument('--archive', default=None, metavar='DIR',
+                        help='replay all fetches from a raw payload archive (see archive.py)')
+    parser.add_argument('--db', default=database.DB_NAME, help='SQLite database file')
+    parser.add_argument('--workers', type=int, default=None, help='parser processes (default: CPU count)')
+    parser.add_argument('--batch-rows', type=int, default=DEFAULT_BATCH_ROWS,
+                        help='rows per committed transaction')
+    parser.add_argument('--checkpoint', default=None,
+                        help='progress file for resuming (default: <db>.backfill.json)')
+    parser.add_argument('--keep-indexes', action='store_true',
+                        help='maintain indexes during the load instead of rebuilding at the end')
+    args = parser.parse_args()
+    if not args.sources and not args.archive:
+        parser.error('give payload sources and/or --archive')
+
+    database.DB_NAME = args.db
+    checkpoint = args.checkpoint or f"{args.db}.backfill.json"
+
+    print("=" * 60)
+    print("Weather Data Backfill")
+    print("=" * 60)
+
+    stats = backfill(args.sources, args.workers, args.batch_rows, checkpoint,
+                     defer_indexes=not args.keep_indexes, archive_dir=args.archive)
+
+    elapsed = stats['elapsed'] or 1e-9
+    print(f"\n[OK] Loaded {stats['files']} files ({stats['failed']} failed), {stats['rows']} rows "
+          f"in {stats['elapsed']:.1f}s")
+    print(f"  {stats['files'] / elapsed:.1f} files/s, {stats['rows'] / elapsed:.0f} rows/s")
+
+    if stats['rows']:
+        # Bulk loads skip the alert rules; seed the rolling norms from the loaded history
+        alerts.rebuild_stats()
+        snapshot.publish_snapshot()
+        replica.publish_configured()
+
+
+if __name__ == "__main__":
+    main()
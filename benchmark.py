@@ -0,0 +1,1323 @@
+"""
+Benchmark Script
+Measures performance of the weather pipeline and dashboard data paths
+
+Usage:
+    python benchmark.py <benchmark> [options]
+"""
+
+import argparse
+import glob
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import database
+import records
+from records import WeatherRecord
+
+
+REGIONS = ['北部', '中部', '南部', '東部', '離島']
+DESCRIPTIONS = ['晴', '多雲', '晴時多雲', '多雲時晴', '陰短暫雨', '多雲短暫雨']
+
+
+def make_synthetic_records(count: int, seed: int = 0):
+    """
+    Generate synthetic weather records with one record per location
+
+    Args:
+        count: Number of locations
+        seed: Random seed
+
+    Returns:
+        List of WeatherRecord
+    """
+    rng = random.Random(seed)
+    records = []
+    for i in range(count):
+        min_temp = round(rng.uniform(5, 28), 1)
+        records.append(WeatherRecord(
+            location=f'測站{i:05d}',
+            region=REGIONS[i % len(REGIONS)],
+            min_temp=min_temp,
+            max_temp=round(min_temp + rng.uniform(2, 10), 1),
+            current_temp=round(min_temp + rng.uniform(0, 5), 1),
+            description=rng.choice(DESCRIPTIONS),
+            forecast_time=datetime.now().isoformat(),
+        ))
+    return records
+
+
+def temporary_database_path(prefix: str = 'bench_') -> str:
+    """
+    Reserve a unique path for a temporary database file (not yet created)
+    """
+    fd, path = tempfile.mkstemp(suffix='.db', prefix=prefix)
+    os.close(fd)
+    os.remove(path)
+    return path
+
+
+def use_temporary_database(locations: int, batches: int = 1) -> str:
+    """
+    Point the database module at a fresh temporary database and fill it
+
+    Args:
+        locations: Number of locations per batch
+        batches: Number of ingest batches
+
+    Returns:
+        Path of the temporary database file
+    """
+    path = temporary_database_path()
+    database.DB_NAME = path
+    database.init_database()
+    for batch in range(batches):
+        database.insert_weather_records(make_synthetic_records(locations, seed=batch))
+    return path
+
+
+def remove_temporary_database(path: str):
+    """
+    Delete a temporary database and its sidecar files
+    """
+    for suffix in ('', '.lock', '.snapshot'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    # Versioned snapshot data files
+    for snapshot_path in glob.glob(glob.escape(path) + '.snapshot-*'):
+        os.remove(snapshot_path)
+
+
+def measure(func):
+    """
+    Run func under tracemalloc
+
+    Returns:
+        (result, seconds, peak_bytes, retained_bytes)
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak, retained
+
+
+def bench_snapshot(args):
+    """
+    Compare per-session memory of the DataFrame path against the shared snapshot
+    """
+    import snapshot
+
+    path = use_temporary_database(args.locations)
+    try:
+        def dataframe_path():
+            import pandas as pd
+            df = pd.DataFrame(database.get_latest_weather_records())
+            df = df.rename(columns={
+                'location': '地點', 'region': '地區', 'min_temp': '最低溫 (°C)',
+                'max_temp': '最高溫 (°C)', 'current_temp': '當前溫度 (°C)',
+                'description': '天氣描述',
+            })
+            return df[list(snapshot.DISPLAY_COLUMNS.values())]
+
+        # Warm imports so they are not attributed to either path
+        dataframe_path()
+
+        _, before_s, _, before_mem = measure(
+            lambda: [dataframe_path() for _ in range(args.sessions)]
+        )
+        shared, build_s, _, shared_mem = measure(snapshot.get_snapshot)
+        _, after_s, _, after_mem = measure(
+            lambda: [snapshot.get_snapshot().to_display_frame() for _ in range(args.sessions)]
+        )
+
+        print(f"Locations: {args.locations}, sessions: {args.sessions}")
+        print(f"  Before (DataFrame per session): {before_mem / args.sessions / 1024:.1f} KiB/session, "
+              f"{before_s / args.sessions * 1000:.2f} ms/session")
+        print(f"  Shared snapshot (built once):   {shared_mem / 1024:.1f} KiB, "
+              f"{build_s * 1000:.2f} ms, buffers {shared.nbytes() / 1024:.1f} KiB")
+        print(f"  After (frame from snapshot):    {after_mem / args.sessions / 1024:.1f} KiB/session, "
+              f"{after_s / args.sessions * 1000:.2f} ms/session")
+    finally:
+        remove_temporary_database(path)
+
+
+RENDER_SCRIPT = """
+import time
+from streamlit.testing.v1 import AppTest
+start = time.perf_counter()
+at = AppTest.from_file('app.py', default_timeout=120).run()
+elapsed = time.perf_counter() - start
+if at.exception:
+    raise SystemExit(at.exception[0].message)
+print(elapsed)
+"""
+
+
+def bench_startup(args):
+    """
+    Measure dashboard cold start: module import time and time to first render
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+
+    # Import-time profile of the app module (stderr carries -X importtime output)
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import app'],
+        cwd=here, capture_output=True, text=True,
+    )
+    import_wall = time.perf_counter() - start
+
+    # Lines look like "import time:  self_us | cumulative_us | <indent>name",
+    # with two spaces of indentation per level of nesting
+    total_us = 0
+    direct = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 0 and name.strip() == 'app':
+            total_us = int(cumulative_us)
+        elif depth == 1:
+            direct.append((int(cumulative_us), name.strip()))
+
+    print(f"Import app: {total_us / 1000:.0f} ms "
+          f"({import_wall * 1000:.0f} ms wall including interpreter start)")
+    print("  Slowest imports (cumulative):")
+    for cumulative_us, name in sorted(direct, reverse=True)[:args.top]:
+        print(f"    {cumulative_us / 1000:8.1f} ms  {name}")
+
+    # Time to first render in a fresh process for each run
+    renders = []
+    for _ in range(args.runs):
+        result = subprocess.run(
+            [sys.executable, '-c', RENDER_SCRIPT],
+            cwd=here, capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            print(f"[ERROR] Render failed: {result.stderr.strip()}")
+            return
+        renders.append(float(result.stdout.strip().splitlines()[-1]))
+
+    renders.sort()
+    print(f"First render ({args.runs} cold runs): "
+          f"min {renders[0] * 1000:.0f} ms, median {renders[len(renders) // 2] * 1000:.0f} ms")
+
+
+async def _api_client(host, port, paths, deadline, latencies, headers):
+    """
+    One keep-alive client issuing sequential GET requests until the deadline
+    """
+    import asyncio
+
+    reader, writer = await asyncio.open_connection(host, port)
+    i = 0
+    try:
+        while time.perf_counter() < deadline:
+            path = paths[i % len(paths)]
+            i += 1
+            start = time.perf_counter()
+            writer.write(f'GET {path} HTTP/1.1\r\nHost: {host}\r\n{headers}\r\n'.encode())
+            await writer.drain()
+            await reader.readline()
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b''):
+                    break
+                if line.lower().startswith(b'content-length:'):
+                    length = int(line.split(b':')[1])
+            if length:
+                await reader.readexactly(length)
+            latencies.append(time.perf_counter() - start)
+    finally:
+        writer.close()
+
+
+def bench_api(args):
+    """
+    Load-test the JSON query service: requests/sec and latency percentiles
+    """
+    import asyncio
+    import socket
+
+    path = use_temporary_database(args.locations, batches=3)
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+
+    server = subprocess.Popen(
+        [sys.executable, 'api_server.py', '--host', '127.0.0.1', '--port', str(port), '--db', path],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        for _ in range(100):
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=0.1).close()
+                break
+            except OSError:
+                time.sleep(0.1)
+
+        paths = ['/latest', '/stats', '/history?location=%E6%B8%AC%E7%AB%9900001&limit=50']
+        scenarios = [
+            ('plain', ''),
+            ('gzip', 'Accept-Encoding: gzip\r\n'),
+        ]
+        for label, headers in scenarios:
+            latencies = []
+
+            async def run():
+                deadline = time.perf_counter() + args.duration
+                await asyncio.gather(*(
+                    _api_client('127.0.0.1', port, paths, deadline, latencies, headers)
+                    for _ in range(args.concurrency)
+                ))
+
+            asyncio.run(run())
+            latencies.sort()
+            p50 = latencies[len(latencies) // 2] * 1000
+            p99 = latencies[int(len(latencies) * 0.99)] * 1000
+            print(f"{label:5s}: {len(latencies) / args.duration:8.0f} req/s, "
+                  f"p50 {p50:.2f} ms, p99 {p99:.2f} ms "
+                  f"({args.concurrency} connections, {args.duration:.0f}s)")
+    finally:
+        server.terminate()
+        server.wait()
+        remove_temporary_database(path)
+
+
+def _writer_process(db_path, threads, batches, batch_size, worker):
+    """
+    One writer process: several threads each inserting batches concurrently
+    """
+    import io
+    import contextlib
+    import threading
+
+    database.DB_NAME = db_path
+
+    def write(thread):
+        for batch in range(batches):
+            records = [
+                record._replace(location=f'w{worker}-t{thread}-b{batch}-{i}')
+                for i, record in enumerate(make_synthetic_records(batch_size, seed=batch))
+            ]
+            database.insert_weather_records(records)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        workers = [threading.Thread(target=write, args=(t,)) for t in range(threads)]
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+
+
+def bench_writers(args):
+    """
+    Many simultaneous writer processes and threads; verify no rows are lost
+    """
+    import multiprocessing
+
+    path = use_temporary_database(0)
+    batches, batch_size = 20, 20
+    try:
+        start = time.perf_counter()
+        procs = [
+            multiprocessing.Process(
+                target=_writer_process,
+                args=(path, args.threads, batches, batch_size, worker),
+            )
+            for worker in range(args.processes)
+        ]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+        elapsed = time.perf_counter() - start
+
+        expected = args.processes * args.threads * batches * batch_size
+        conn = database.get_db_connection()
+        stored, distinct = conn.execute(
+            'SELECT COUNT(*), COUNT(DISTINCT location) FROM weather'
+        ).fetchone()
+        conn.close()
+
+        failed = [p.exitcode for p in procs if p.exitcode != 0]
+        print(f"Writers: {args.processes} processes x {args.threads} threads, "
+              f"{batches} batches of {batch_size} rows each")
+        print(f"  {expected} rows in {elapsed:.2f}s: {expected / elapsed:.0f} rows/s, "
+              f"{expected // batch_size / elapsed:.0f} batches/s")
+        print(f"  Stored {stored} rows ({distinct} distinct), lost {expected - distinct}, "
+              f"failed processes {len(failed)}")
+        if stored != expected or distinct != expected or failed:
+            raise SystemExit("[ERROR] Concurrent writers lost or duplicated rows")
+        print("[OK] No lost rows")
+    finally:
+        remove_temporary_database(path)
+
+
+LEGACY_SCHEMA = [
+    '''
+    CREATE TABLE weather (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        location TEXT NOT NULL,
+        region TEXT,
+        min_temp REAL,
+        max_temp REAL,
+        current_temp REAL,
+        description TEXT,
+        forecast_time TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    'CREATE INDEX idx_weather_location_created ON weather (location, created_at)',
+]
+
+LEGACY_LATEST_SQL = '''
+    SELECT w1.*
+    FROM weather w1
+    INNER JOIN (
+        SELECT location, MAX(created_at) as max_created
+        FROM weather
+        GROUP BY location
+    ) w2 ON w1.location = w2.location AND w1.created_at = w2.max_created
+    ORDER BY w1.region, w1.location
+'''
+
+
+def make_hourly_records(locations: int, hours: int, start: datetime, seed: int = 0):
+    """
+    Generate one record per location per hour, yielding one day at a time
+    """
+    from datetime import timedelta
+
+    rng = random.Random(seed)
+    names = [f'臺灣測站{i:05d}鄉鎮' for i in range(locations)]
+    day = []
+    for hour in range(hours):
+        when = start + timedelta(hours=hour)
+        created_at = when.strftime('%Y-%m-%d %H:%M:%S')
+        forecast_time = (when + timedelta(hours=6)).strftime('%Y-%m-%dT%H:%M:%S+08:00')
+        for i, name in enumerate(names):
+            min_temp = round(rng.uniform(5, 28), 1)
+            day.append(WeatherRecord(
+                location=name,
+                region=REGIONS[i % len(REGIONS)],
+                min_temp=min_temp,
+                max_temp=round(min_temp + rng.uniform(2, 10), 1),
+                current_temp=round(min_temp + rng.uniform(0, 5), 1),
+                description=rng.choice(DESCRIPTIONS),
+                forecast_time=forecast_time,
+                created_at=created_at,
+            ))
+        if (hour + 1) % 24 == 0:
+            yield day
+            day = []
+    if day:
+        yield day
+
+
+def _time_query(path: str, sql: str, runs: int) -> float:
+    import sqlite3
+
+    conn = sqlite3.connect(path)
+    best = float('inf')
+    for _ in range(runs):
+        start = time.perf_counter()
+        conn.execute(sql).fetchall()
+        best = min(best, time.perf_counter() - start)
+    conn.close()
+    return best
+
+
+def bench_schema(args):
+    """
+    Compare file size and scan speed of the legacy denormalized table
+    against the normalized dimension tables, on a synthetic year of data
+    """
+    import contextlib
+    import io
+    import sqlite3
+
+    start = datetime(2025, 1, 1)
+    legacy_path = temporary_database_path('bench_legacy_')
+    path = temporary_database_path('bench_normalized_')
+    try:
+        legacy = sqlite3.connect(legacy_path)
+        for statement in LEGACY_SCHEMA:
+            legacy.execute(statement)
+
+        database.DB_NAME = path
+        with contextlib.redirect_stdout(io.StringIO()):
+            database.init_database()
+
+        load_legacy = load_normalized = 0.0
+        rows = 0
+        for day in make_hourly_records(args.locations, args.hours, start):
+            rows += len(day)
+            t = time.perf_counter()
+            legacy.executemany(
+                'INSERT INTO weather (location, region, min_temp, max_temp, current_temp, '
+                'description, forecast_time, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                [r[1:] for r in day]
+            )
+            legacy.commit()
+            load_legacy += time.perf_counter() - t
+
+            t = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                database.insert_weather_records(day)
+            load_normalized += time.perf_counter() - t
+        legacy.close()
+
+        for db_path in (legacy_path, path):
+            conn = sqlite3.connect(db_path)
+            conn.execute('VACUUM')
+            conn.close()
+
+        legacy_size = os.path.getsize(legacy_path)
+        size = os.path.getsize(path)
+        print(f"Synthetic data: {args.locations} locations x {args.hours} hours = {rows} rows")
+        print(f"  Load:  legacy {rows / load_legacy:9.0f} rows/s, normalized {rows / load_normalized:9.0f} rows/s")
+        print(f"  Size:  legacy {legacy_size / 2**20:7.1f} MiB, normalized {size / 2**20:7.1f} MiB "
+              f"({(1 - size / legacy_size) * 100:.0f}% smaller)")
+
+        queries = [
+            ('full scan',
+             'SELECT * FROM weather',
+             'SELECT * FROM weather'),
+            ('fact scan',
+             'SELECT location, min_temp, max_temp, current_temp FROM weather',
+             'SELECT location_id, min_temp, max_temp, current_temp FROM weather_facts'),
+            ('group by location',
+             'SELECT location, AVG(current_temp), MIN(min_temp), MAX(max_temp) FROM weather GROUP BY location',
+             'SELECT location_id, AVG(current_temp), MIN(min_temp), MAX(max_temp) '
+             'FROM weather_facts GROUP BY location_id'),
+            ('latest per location',
+             LEGACY_LATEST_SQL,
+             None),
+        ]
+        for label, legacy_sql, normalized_sql in queries:
+            legacy_s = _time_query(legacy_path, legacy_sql, args.runs)
+            if normalized_sql is None:
+                t = time.perf_counter()
+                for _ in range(args.runs):
+                    database.get_latest_weather_records()
+                normalized_s = (time.perf_counter() - t) / args.runs
+            else:
+                normalized_s = _time_query(path, normalized_sql, args.runs)
+            print(f"  {label:20s} legacy {legacy_s * 1000:9.1f} ms, normalized {normalized_s * 1000:9.1f} ms "
+                  f"({legacy_s / normalized_s:.1f}x)")
+    finally:
+        remove_temporary_database(legacy_path)
+        remove_temporary_database(path)
+
+
+def make_synthetic_locations(count: int, seed: int = 0):
+    """
+    Generate location dicts scattered over the Taiwan bounding box
+    """
+    import geo
+
+    rng = random.Random(seed)
+    min_lat, min_lon, max_lat, max_lon = geo.TAIWAN_BBOX
+    return [
+        {
+            'name': f'測站{i:05d}',
+            'region': REGIONS[i % len(REGIONS)],
+            'latitude': rng.uniform(min_lat, max_lat),
+            'longitude': rng.uniform(min_lon, max_lon),
+        }
+        for i in range(count)
+    ]
+
+
+def bench_spatial(args):
+    """
+    Nearest-location and bounding-box queries: grid index against a linear scan
+    """
+    import geo
+
+    rng = random.Random(1)
+    min_lat, min_lon, max_lat, max_lon = geo.TAIWAN_BBOX
+    queries = [
+        (rng.uniform(min_lat, max_lat), rng.uniform(min_lon, max_lon))
+        for _ in range(args.queries)
+    ]
+
+    for count in (400, 50000):
+        points = make_synthetic_locations(count)
+
+        start = time.perf_counter()
+        index = geo.SpatialIndex(points)
+        build_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for lat, lon in queries:
+            index.nearest(lat, lon, args.k)
+        nearest_s = (time.perf_counter() - start) / len(queries)
+
+        scan_queries = queries[:max(1, len(queries) // 10)]
+        start = time.perf_counter()
+        for lat, lon in scan_queries:
+            sorted(points, key=lambda p: geo.haversine_km(lat, lon, p['latitude'], p['longitude']))[:args.k]
+        scan_s = (time.perf_counter() - start) / len(scan_queries)
+
+        start = time.perf_counter()
+        found = 0
+        for lat, lon in queries:
+            found += len(index.in_bbox(lat - 0.1, lon - 0.1, lat + 0.1, lon + 0.1))
+        bbox_s = (time.perf_counter() - start) / len(queries)
+
+        path = use_temporary_database(0)
+        try:
+            database.upsert_locations(points)
+            geo.invalidate_spatial_index()
+            geo.get_spatial_index()
+            start = time.perf_counter()
+            for lat, lon in queries:
+                geo.nearest_locations(lat, lon, args.k)
+            api_s = (time.perf_counter() - start) / len(queries)
+        finally:
+            remove_temporary_database(path)
+
+        print(f"{count} locations (grid {len(index.cells)} cells of {index.cell_size:.3f} deg, "
+              f"built in {build_s * 1000:.1f} ms)")
+        print(f"  nearest k={args.k}: index {nearest_s * 1e6:8.1f} us, linear scan {scan_s * 1e6:10.1f} us "
+              f"({scan_s / nearest_s:.0f}x)")
+        print(f"  bbox 0.2 deg:  index {bbox_s * 1e6:8.1f} us ({found / len(queries):.1f} hits/query)")
+        print(f"  nearest_locations() via cached index:    {api_s * 1e6:8.1f} us")
+
+
+def bench_heatmap(args):
+    """
+    Interpolated surface: vectorized IDW cost per resolution and cached lookups
+    """
+    import contextlib
+    import io
+    import math
+    import geo
+    import heatmap
+    import snapshot
+
+    stations = make_synthetic_locations(args.locations)
+    values = [random.Random(i).uniform(10, 30) for i in range(len(stations))]
+    lats = [s['latitude'] for s in stations]
+    lons = [s['longitude'] for s in stations]
+    min_lat, min_lon, max_lat, max_lon = geo.TAIWAN_BBOX
+
+    # Baseline: the same IDW written as a per-grid-point Python loop
+    sample = 200
+    start = time.perf_counter()
+    for j in range(sample):
+        glat = min_lat + (max_lat - min_lat) * j / sample
+        glon = min_lon + (max_lon - min_lon) * j / sample
+        num = den = 0.0
+        for lat, lon, value in zip(lats, lons, values):
+            dy = (glat - lat) * geo.KM_PER_DEGREE
+            dx = (glon - lon) * geo.KM_PER_DEGREE * math.cos(math.radians(glat))
+            w = 1.0 / max(dy * dy + dx * dx, 1e-12)
+            num += w * value
+            den += w
+    loop_per_point = (time.perf_counter() - start) / sample
+
+    import numpy as np
+
+    # Warm up NumPy so the first resolution is not charged for it
+    heatmap.interpolate_idw(lats, lons, values, [min_lat], [min_lon])
+
+    print(f"{args.locations} stations")
+    for resolution in (0.1, 0.05, 0.025):
+        grid_lats = np.arange(min_lat, max_lat + resolution / 2, resolution)
+        grid_lons = np.arange(min_lon, max_lon + resolution / 2, resolution)
+        points = len(grid_lats) * len(grid_lons)
+        start = time.perf_counter()
+        heatmap.interpolate_idw(lats, lons, values, grid_lats, grid_lons)
+        elapsed = time.perf_counter() - start
+        print(f"  {resolution:5.3f} deg grid ({points:6d} points): numpy {elapsed * 1000:8.1f} ms, "
+              f"python loop ~{loop_per_point * points * 1000:9.0f} ms")
+
+    path = use_temporary_database(0)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            database.upsert_locations(stations)
+            database.insert_weather_records(make_synthetic_records(args.locations))
+        geo.invalidate_spatial_index()
+        weather_snapshot = snapshot.get_snapshot()
+
+        start = time.perf_counter()
+        layer = heatmap.get_heatmap_layer(weather_snapshot, 0.05)
+        first = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(args.sessions):
+            heatmap.get_heatmap_layer(snapshot.get_snapshot(), 0.05)
+        cached = (time.perf_counter() - start) / args.sessions
+        print(f"  Dashboard layer at 0.05 deg ({len(layer)} cells): first build {first * 1000:.1f} ms, "
+              f"cached rerun {cached * 1000:.3f} ms")
+    finally:
+        remove_temporary_database(path)
+
+
+def _legacy_record_to_row(record):
+    return (
+        record.get('location'),
+        record.get('region'),
+        record.get('min_temp'),
+        record.get('max_temp'),
+        record.get('current_temp'),
+        record.get('description'),
+        record.get('forecast_time'),
+        record.get('created_at')
+    )
+
+
+def bench_records(args):
+    """
+    Compare per-record memory and throughput of record dictionaries against WeatherRecord
+    """
+    import sqlite3
+    import pandas as pd
+
+    count = args.count
+    names = [f'測站{i:05d}' for i in range(args.locations)]
+    forecast_time = datetime(2025, 1, 1).isoformat()
+
+    def make(factory):
+        rng = random.Random(0)
+        return [
+            factory(names[i % len(names)], REGIONS[i % len(REGIONS)], rng.uniform(5, 28),
+                    rng.uniform(15, 35), rng.uniform(10, 30), DESCRIPTIONS[i % len(DESCRIPTIONS)])
+            for i in range(count)
+        ]
+
+    def as_dict(location, region, min_temp, max_temp, current_temp, description):
+        return {
+            'location': location, 'region': region, 'min_temp': min_temp,
+            'max_temp': max_temp, 'current_temp': current_temp,
+            'description': description, 'forecast_time': forecast_time,
+        }
+
+    def as_record(location, region, min_temp, max_temp, current_temp, description):
+        return WeatherRecord(location=location, region=region, min_temp=min_temp,
+                             max_temp=max_temp, current_temp=current_temp,
+                             description=description, forecast_time=forecast_time)
+
+    pd.DataFrame([{'a': 1}])  # warm pandas
+    print(f"Records: {count}")
+
+    # Parse side: building records (temperatures/strings are shared, so memory is the container)
+    dicts, dict_s, _, dict_mem = measure(lambda: make(as_dict))
+    recs, rec_s, _, rec_mem = measure(lambda: make(as_record))
+    print(f"  Build:        dict {dict_mem / count:6.0f} B/record {count / dict_s:10.0f} rec/s | "
+          f"WeatherRecord {rec_mem / count:6.0f} B/record {count / rec_s:10.0f} rec/s")
+
+    # Insert side: record -> parameter tuple
+    t = time.perf_counter()
+    for record in dicts:
+        _legacy_record_to_row(record)
+    dict_s = time.perf_counter() - t
+    t = time.perf_counter()
+    for record in recs:
+        database._record_to_row(record)
+    rec_s = time.perf_counter() - t
+    print(f"  To row:       dict {count / dict_s:10.0f} rec/s | WeatherRecord {count / rec_s:10.0f} rec/s")
+
+    # Query side: sqlite rows -> records
+    conn = sqlite3.connect(':memory:')
+    conn.execute(f"CREATE TABLE weather ({', '.join(records.FIELDS)})")
+    conn.executemany('INSERT INTO weather VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                     ((i,) + record[1:] for i, record in enumerate(recs)))
+    select = f'SELECT {records.SELECT_COLUMNS} FROM weather'
+
+    def rows_to_dicts():
+        conn.row_factory = sqlite3.Row
+        return [{field: row[field] for field in records.FIELDS} for row in conn.execute(select)]
+
+    def rows_to_records():
+        conn.row_factory = None
+        return records.from_rows(conn.execute(select).fetchall())
+
+    _, dict_s, _, dict_mem = measure(rows_to_dicts)
+    _, rec_s, _, rec_mem = measure(rows_to_records)
+    conn.close()
+    print(f"  Query map:    dict {dict_mem / count:6.0f} B/record {count / dict_s:10.0f} rec/s | "
+          f"WeatherRecord {rec_mem / count:6.0f} B/record {count / rec_s:10.0f} rec/s")
+
+    # pandas: records -> DataFrame -> records
+    t = time.perf_counter()
+    pd.DataFrame(dicts)
+    dict_s = time.perf_counter() - t
+    t = time.perf_counter()
+    frame = records.to_frame(recs)
+    rec_s = time.perf_counter() - t
+    t = time.perf_counter()
+    back = records.from_frame(frame)
+    back_s = time.perf_counter() - t
+    assert back[0] == recs[0]
+    print(f"  To DataFrame: dict {dict_s * 1000:8.0f} ms | WeatherRecord {rec_s * 1000:8.0f} ms "
+          f"(back to records {back_s * 1000:.0f} ms)")
+
+
+def make_forecast_records(locations: int, hour: int, start: datetime, seed: int = 0):
+    """
+    Generate one ingest cycle: each location forecasts the next two 12-hour periods
+    """
+    from datetime import timedelta, timezone
+
+    rng = random.Random(seed * 1000003 + hour)
+    when = start + timedelta(hours=hour)
+    created_at = when.strftime('%Y-%m-%d %H:%M:%S')
+    taipei = timezone(timedelta(hours=8))
+    records = []
+    for i in range(locations):
+        for period in range(2):
+            valid_period = hour // 12 + 1 + period
+            valid = start + timedelta(hours=12 * valid_period)
+            base = random.Random(i * 100003 + valid_period).uniform(17.5, 22.5)
+            lead = (valid - when).total_seconds() / 3600
+            records.append(WeatherRecord(
+                location=f'測站{i:05d}',
+                region=REGIONS[i % len(REGIONS)],
+                min_temp=round(base - 3 + rng.gauss(0.3, lead / 24), 1),
+                max_temp=round(base + 3 + rng.gauss(-0.3, lead / 24), 1),
+                description=rng.choice(DESCRIPTIONS),
+                forecast_time=valid.replace(tzinfo=taipei).isoformat(),
+                created_at=created_at,
+            ))
+    return records
+
+
+def bench_verification(args):
+    """
+    Compare ad hoc pandas verification over the weather view against the
+    incremental verification engine
+    """
+    import contextlib
+    import io
+    import sqlite3
+    import pandas as pd
+    import verification
+
+    start = datetime(2025, 1, 1)
+    path = use_temporary_database(0)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            with database.bulk_loader() as loader:
+                for hour in range(args.hours):
+                    loader.insert(make_forecast_records(args.locations, hour, start))
+        rows = database.get_table_state()[0]  # fresh table: ids are contiguous
+        print(f"Forecast rows: {rows} ({args.locations} locations x {args.hours} hourly ingests x 2 periods)")
+
+        def pandas_path():
+            conn = sqlite3.connect(path)
+            df = pd.read_sql_query(
+                'SELECT location, region, min_temp, max_temp, forecast_time, created_at FROM weather', conn
+            )
+            conn.close()
+            df['created'] = pd.to_datetime(df['created_at'], utc=True)
+            df['valid'] = pd.to_datetime(df['forecast_time'], utc=True)
+            df = df.sort_values(['location', 'valid', 'created'])
+            last = df.groupby(['location', 'valid']).transform('last')
+            df = df[df['created'] < last['created']].copy()
+            df['min_err'] = df['min_temp'] - last.loc[df.index, 'min_temp']
+            df['max_err'] = df['max_temp'] - last.loc[df.index, 'max_temp']
+            df['lead'] = ((df['valid'] - df['created']).dt.total_seconds() // 3600 // 6 * 6)
+            return [
+                df.groupby(key)[['min_err', 'max_err']].agg(lambda e: (e.abs().mean(), e.mean()))
+                for key in ('location', 'region', 'lead')
+            ]
+
+        t = time.perf_counter()
+        pandas_path()
+        pandas_s = time.perf_counter() - t
+
+        t = time.perf_counter()
+        report = verification.get_accuracy_report()
+        full_s = time.perf_counter() - t
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            database.insert_weather_records(make_forecast_records(args.locations, args.hours, start))
+        t = time.perf_counter()
+        report = verification.get_accuracy_report()
+        incremental_s = time.perf_counter() - t
+
+        t = time.perf_counter()
+        for _ in range(args.sessions):
+            verification.get_accuracy_report()
+        cached_s = (time.perf_counter() - t) / args.sessions
+
+        print(f"  Verified pairs: {report.pairs}")
+        print(f"  Ad hoc pandas:             {pandas_s * 1000:9.1f} ms")
+        print(f"  Engine, full build:        {full_s * 1000:9.1f} ms")
+        print(f"  Engine, after one ingest:  {incremental_s * 1000:9.1f} ms")
+        print(f"  Engine, cached rerun:      {cached_s * 1000:9.3f} ms")
+    finally:
+        remove_temporary_database(path)
+
+
+def bench_regions(args):
+    """
+    Measure region-switch latency: filter and rebuild per switch against cached region payloads
+    """
+    import contextlib
+    import io
+    import geo
+    import heatmap
+    import render
+    import snapshot
+
+    path = use_temporary_database(0)
+    try:
+        stations = make_synthetic_locations(args.locations)
+        with contextlib.redirect_stdout(io.StringIO()):
+            database.upsert_locations(stations)
+            database.insert_weather_records(make_synthetic_records(args.locations))
+        geo.invalidate_spatial_index()
+        weather_snapshot = snapshot.get_snapshot()
+        surface = heatmap.get_heatmap_layer(weather_snapshot, 0.05)
+        regions = render.REGIONS
+        print(f"Locations: {args.locations}, switches: {args.runs} x {len(regions)} regions")
+
+        def rebuild(region):
+            df = weather_snapshot.to_display_frame()
+            if region != render.ALL_REGIONS:
+                df = df[df['地區'] == region]
+            df.style.apply(lambda column: [render.temperature_cell_style(v) for v in column],
+                           subset=render.TEMPERATURE_COLUMNS)._compute()
+            return render.build_map_figure(df, surface)
+
+        rebuild(render.ALL_REGIONS)  # warm imports
+        t = time.perf_counter()
+        for _ in range(args.runs):
+            for region in regions:
+                rebuild(region)
+        before = (time.perf_counter() - t) / (args.runs * len(regions))
+
+        t = time.perf_counter()
+        for region in regions:
+            render.get_region_payload(weather_snapshot, region, surface)
+        first = (time.perf_counter() - t) / len(regions)
+
+        t = time.perf_counter()
+        for _ in range(args.runs):
+            for region in regions:
+                render.get_region_payload(snapshot.get_snapshot(), region, surface)
+        switch = (time.perf_counter() - t) / (args.runs * len(regions))
+
+        # What st.plotly_chart does with the cached map on every rerun
+        import plotly.io
+        import plotly.tools
+
+        def render_map(figure):
+            figure = plotly.tools.return_figure_from_figure_or_data(figure, validate_figure=True)
+            return plotly.io.to_json(figure, validate=False)
+
+        figure = render.get_region_payload(weather_snapshot, render.ALL_REGIONS, surface).figure
+        rendered = {}
+        for name, cached in (('dict', figure.to_dict()), ('figure', figure)):
+            render_map(cached)
+            t = time.perf_counter()
+            for _ in range(args.runs):
+                render_map(cached)
+            rendered[name] = (time.perf_counter() - t) / args.runs
+
+        print(f"  Before (filter + style + figure per switch): {before * 1000:8.2f} ms/switch")
+        print(f"  Payload first visit (filter + build):        {first * 1000:8.2f} ms/region")
+        print(f"  Payload region switch (cache lookup):        {switch * 1000:8.3f} ms/switch")
+        print(f"  Map render from cached dict:                 {rendered['dict'] * 1000:8.2f} ms/rerun")
+        print(f"  Map render from cached figure:               {rendered['figure'] * 1000:8.2f} ms/rerun")
+    finally:
+        remove_temporary_database(path)
+
+
+def fill_hourly_facts(locations: int, hours: int, start_ts: int = 1767225600):
+    """
+    Fill weather_facts with one row per location per hour directly in SQL
+
+    Much faster than going through records, for tables with tens of millions of rows.
+    """
+    conn = database.get_db_connection()
+    conn.executemany(
+        'INSERT INTO locations (name, region) VALUES (?, ?)',
+        [(f'測站{i:05d}', REGIONS[i % len(REGIONS)]) for i in range(locations)],
+    )
+    for name in database.FACT_INDEXES:
+        conn.execute(f'DROP INDEX IF EXISTS {name}')
+    conn.execute('''
+        INSERT INTO weather_facts (location_id, description_id, min_temp, max_temp, current_temp, forecast_ts, created_ts)
+        WITH RECURSIVE hour(n) AS (SELECT 0 UNION ALL SELECT n + 1 FROM hour WHERE n < ? - 1),
+        base AS (
+            SELECT l.id AS location_id, ? + h.n * 3600 AS ts, 5 + (ABS(RANDOM()) % 230) / 10.0 AS low
+            FROM hour h CROSS JOIN locations l
+        )
+        SELECT location_id, NULL, low, low + 2 + (ABS(RANDOM()) % 80) / 10.0,
+               CASE WHEN ABS(RANDOM()) % 50 = 0 THEN NULL ELSE low + (ABS(RANDOM()) % 50) / 10.0 END,
+               ts + 21600, ts
+        FROM base
+    ''', (hours, start_ts))
+    for statement in database.FACT_INDEXES.values():
+        conn.execute(statement)
+    conn.commit()
+    conn.close()
+
+
+def bench_analytics(args):
+    """
+    Compare SQLite and the DuckDB copy for aggregate and window queries over long histories
+    """
+    import contextlib
+    import io
+
+    if not database.DUCKDB_AVAILABLE:
+        print("[ERROR] DuckDB is not installed (pip install duckdb)")
+        return
+
+    path = temporary_database_path()
+    database.DB_NAME = path
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            database.init_database()
+        start = time.perf_counter()
+        fill_hourly_facts(args.locations, args.hours)
+        rows = args.locations * args.hours
+        print(f"Facts: {rows:,} ({args.locations} locations x {args.hours} hours), "
+              f"generated in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        with database.analytics_cursor():
+            pass
+        print(f"  DuckDB copy built in {time.perf_counter() - start:.1f}s (once per process)")
+
+        since_ts = 1767225600 + (args.hours - 24 * 30) * 3600
+        queries = [
+            ('stats (min/max/count scan)', 'stats',
+             lambda engine: database.get_database_stats(engine=engine)),
+            ('region daily means', 'region_means',
+             lambda engine: database.get_region_means(engine=engine)),
+            ('region percentiles (30 days)', 'percentiles',
+             lambda engine: database.get_temperature_percentiles(since_ts=since_ts, engine=engine)),
+            ('24h rolling mean, all locations (30 days)', 'rolling',
+             lambda engine: database.get_rolling_means(since_ts=since_ts, engine=engine)),
+            ('24h rolling mean, one location', 'location_rolling',
+             lambda engine: database.get_rolling_means(location='測站00001', engine=engine)),
+        ]
+        print(f"  {'Query':44s} {'SQLite':>10s} {'DuckDB':>10s} {'speedup':>8s}  auto")
+        for label, kind, query in queries:
+            timings = {}
+            for engine in database.ANALYTICS_ENGINES:
+                best = float('inf')
+                for _ in range(args.runs):
+                    start = time.perf_counter()
+                    query(engine)
+                    best = min(best, time.perf_counter() - start)
+                timings[engine] = best
+            print(f"  {label:44s} {timings['sqlite'] * 1000:8.0f}ms {timings['duckdb'] * 1000:8.0f}ms "
+                  f"{timings['sqlite'] / timings['duckdb']:7.1f}x  {database.choose_analytics_engine(kind)}")
+    finally:
+        remove_temporary_database(path)
+
+
+SNAPSHOT_LOAD_SCRIPT = """
+import sys, time
+import numpy, pandas
+import database, snapshot
+
+def memory():
+    fields = {}
+    with open('/proc/self/status') as f:
+        for line in f:
+            name, _, value = line.partition(':')
+            if name in ('RssAnon', 'RssFile'):
+                fields[name] = int(value.split()[0])
+    return fields
+
+database.DB_NAME = sys.argv[1]
+before = memory()
+start = time.perf_counter()
+if sys.argv[2] == 'sqlite':
+    state = database.get_table_state()
+    loaded = snapshot.WeatherSnapshot(state, database.get_latest_weather_records())
+else:
+    loaded = snapshot.read_snapshot_file()
+frame = loaded.to_display_frame()
+elapsed = time.perf_counter() - start
+after = memory()
+print(elapsed, after['RssAnon'] - before['RssAnon'], after['RssFile'] - before['RssFile'], len(frame))
+"""
+
+
+def bench_mmap(args):
+    """
+    Compare loading the latest snapshot per process: SQLite query vs the mapped snapshot file
+    """
+    import contextlib
+    import io
+    import snapshot
+
+    if not os.path.exists('/proc/self/status'):
+        print("[ERROR] This benchmark reads memory usage from /proc (Linux only)")
+        return
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    # A day of hourly ingests so the SQLite path has history to skip
+    with contextlib.redirect_stdout(io.StringIO()):
+        path = use_temporary_database(args.locations, batches=24)
+        snapshot.publish_snapshot()
+    try:
+        data_file = os.path.join(os.path.dirname(path), snapshot.read_pointer()['file'])
+        print(f"Locations: {args.locations}, 24 ingests, {args.runs} fresh processes per path "
+              f"(file {os.path.getsize(data_file) / 1024:.1f} KiB)")
+        for label, mode in (('SQLite query + build', 'sqlite'), ('Mapped snapshot file', 'mmap')):
+            results = []
+            for _ in range(args.runs):
+                result = subprocess.run(
+                    [sys.executable, '-c', SNAPSHOT_LOAD_SCRIPT, path, mode],
+                    cwd=here, capture_output=True, text=True,
+                )
+                if result.returncode != 0:
+                    print(f"[ERROR] {label} failed: {result.stderr.strip()}")
+                    return
+                results.append(tuple(float(v) for v in result.stdout.split()))
+            results.sort()
+            elapsed, private_kib, shared_kib, rows = results[len(results) // 2]
+            print(f"  {label:22s} {elapsed * 1000:9.2f} ms, private {private_kib / 1024:7.2f} MiB, "
+                  f"file-backed {shared_kib / 1024:6.2f} MiB ({rows:.0f} rows)")
+    finally:
+        remove_temporary_database(path)
+
+
+def live_status_tick():
+    """
+    Script run by bench_live: the body of app.live_status on an idle tick
+    """
+    import time
+    import streamlit as st
+    import live
+
+    if live.generation() != 0:
+        st.rerun()
+    updated_at = live.last_update()
+    if updated_at is not None:
+        st.caption(f"🟢 監看中 · 新資料於 {time.strftime('%H:%M:%S', time.localtime(updated_at))}")
+    else:
+        st.caption("🟢 監看中")
+
+
+def bench_live(args):
+    """
+    Estimate server CPU per hour for open dashboards: timed full reruns vs the live watcher
+    """
+    import contextlib
+    import io
+    import logging
+    import geo
+    import live
+    from streamlit.testing.v1 import AppTest
+
+    logging.getLogger('streamlit').setLevel(logging.ERROR)
+    path = use_temporary_database(0)
+    try:
+        stations = make_synthetic_locations(args.locations)
+        with contextlib.redirect_stdout(io.StringIO()):
+            database.upsert_locations(stations)
+            database.insert_weather_records(make_synthetic_records(args.locations))
+        geo.invalidate_spatial_index()
+        interval = live.SESSION_POLL_INTERVAL
+        ticks = 3600 / interval
+        print(f"Locations: {args.locations}, sessions: {args.sessions}, "
+              f"poll every {interval:.0f}s, one ingest per hour")
+
+        app = AppTest.from_file(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py'),
+                                default_timeout=120)
+        with contextlib.redirect_stdout(io.StringIO()):
+            app.run()  # warm imports and per-version caches
+            start = time.process_time()
+            for _ in range(args.runs):
+                app.run()
+        rerun = (time.process_time() - start) / args.runs
+
+        # An idle tick runs only the live_status fragment: one script run
+        # through the same script runner, without the rest of the page
+        status = AppTest.from_function(live_status_tick, default_timeout=30)
+        status.run()
+        start = time.process_time()
+        for _ in range(args.runs * 20):
+            status.run()
+        tick = (time.process_time() - start) / (args.runs * 20)
+
+        watcher = live.LiveWatcher()
+        watcher.check()
+        start = time.process_time()
+        for _ in range(args.queries):
+            watcher.check()
+        idle_check = (time.process_time() - start) / args.queries
+
+        # After each ingest the watcher warms the caches once, then every
+        # session reruns the page once from those caches
+        ingest_check = ingest_rerun = 0.0
+        for seed in range(1, args.runs + 1):
+            with contextlib.redirect_stdout(io.StringIO()):
+                database.insert_weather_records(make_synthetic_records(args.locations, seed=seed))
+                start = time.process_time()
+                watcher.check()
+                ingest_check += time.process_time() - start
+                start = time.process_time()
+                app.run()
+                ingest_rerun += time.process_time() - start
+        ingest_check /= args.runs
+        ingest_rerun /= args.runs
+
+        polling = args.sessions * ticks * rerun
+        live_total = (3600 / live.POLL_INTERVAL * idle_check + ingest_check
+                      + args.sessions * (ticks * tick + ingest_rerun))
+
+        print(f"  Full script rerun (cached payloads):   {rerun * 1000:9.2f} ms")
+        print(f"  Live status fragment tick (idle):      {tick * 1000:9.2f} ms")
+        print(f"  Watcher idle check (file metadata):    {idle_check * 1e6:9.2f} us")
+        print(f"  Watcher ingest check (version + warm): {ingest_check * 1000:9.2f} ms")
+        print(f"  Rerun after an ingest (warm caches):   {ingest_rerun * 1000:9.2f} ms")
+        print(f"  CPU per hour, rerun every {interval:.0f}s:        {polling:9.2f} s")
+        print(f"  CPU per hour, live mode:               {live_total:9.2f} s "
+              f"({live_total / args.sessions * 1000:.1f} ms/viewer)")
+    finally:
+        remove_temporary_database(path)
+
+
+def bench_alerts(args):
+    """
+    Measure alert evaluation on ingest against re-scanning the history after each batch
+    """
+    import contextlib
+    import io
+    import numpy as np
+    import alerts
+
+    path = temporary_database_path()
+    database.DB_NAME = path
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            database.init_database()
+        start = time.perf_counter()
+        fill_hourly_facts(args.locations, args.hours)
+        print(f"History: {args.locations * args.hours:,} facts ({args.locations} locations x {args.hours} hours), "
+              f"generated in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            alerts.rebuild_stats()
+        print(f"  Rolling statistics seeded from history in {time.perf_counter() - start:.1f}s (once)")
+
+        def ingest(records, evaluate_alerts):
+            rows = [database._record_to_row(record) for record in records]
+            conn = database.get_db_connection()
+            cursor = conn.cursor()
+            start = time.perf_counter()
+            cursor.execute('BEGIN IMMEDIATE')
+            database._insert_rows(cursor, rows, evaluate_alerts=evaluate_alerts)
+            conn.commit()
+            elapsed = time.perf_counter() - start
+            conn.close()
+            return elapsed
+
+        plain, alerted = float('inf'), float('inf')
+        for run in range(args.runs):
+            plain = min(plain, ingest(make_synthetic_records(args.locations, seed=2 * run + 1), False))
+            alerted = min(alerted, ingest(make_synthetic_records(args.locations, seed=2 * run + 2), True))
+
+        # Phases of the alert pass for one batch, rolled back afterwards
+        conn = database.get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        location_ids = np.array([row[0] for row in cursor.execute('SELECT id FROM locations')], dtype=np.int64)
+        values = np.random.default_rng(0).uniform(5, 36, len(location_ids))
+        index = np.arange(len(location_ids))
+
+        start = time.perf_counter()
+        stats = alerts.load_stats(cursor, location_ids)
+        load = time.perf_counter() - start
+        start = time.perf_counter()
+        fired = alerts.run_batch(stats, index, values)
+        evaluate = time.perf_counter() - start
+        start = time.perf_counter()
+        alerts.save_stats(cursor, location_ids, stats)
+        save = time.perf_counter() - start
+        conn.rollback()
+
+        # Baseline: recompute every location's window from the history after the ingest
+        start = time.perf_counter()
+        history = cursor.execute(alerts.HISTORY_SQL, (alerts.ALERT_WINDOW,)).fetchall()
+        history_ids, history_values = zip(*history)
+        _, rescanned = alerts.stats_from_history(history_ids, history_values)
+        alerts.evaluate_rules(values, rescanned.mean, rescanned.std(index),
+                              rescanned.count >= alerts.MIN_HISTORY)
+        rescan = time.perf_counter() - start
+        conn.close()
+
+        raised = sum(len(rows) for _, rows, _ in fired)
+        print(f"  Batch of {args.locations} facts, {len(alerts.RULES)} rules, window {alerts.ALERT_WINDOW} "
+              f"({raised} alerts in the sample batch)")
+        print(f"  Ingest without alerts:                 {plain * 1000:9.1f} ms")
+        print(f"  Ingest with alerts:                    {alerted * 1000:9.1f} ms "
+              f"(+{(alerted - plain) * 1000:.1f} ms)")
+        print(f"    load rolling statistics:             {load * 1000:9.1f} ms")
+        print(f"    evaluate rules + Welford update:     {evaluate * 1000:9.1f} ms")
+        print(f"    save rolling statistics:             {save * 1000:9.1f} ms")
+        print(f"  Re-scan history + evaluate (baseline): {rescan * 1000:9.1f} ms "
+              f"({rescan / max(alerted - plain, 1e-9):.0f}x the incremental alert pass)")
+    finally:
+        remove_temporary_database(path)
+
+
+BENCHMARKS = {
+    'alerts': bench_alerts,
+    'analytics': bench_analytics,
+    'api': bench_api,
+    'heatmap': bench_heatmap,
+    'live': bench_live,
+    'mmap': bench_mmap,
+    'records': bench_records,
+    'regions': bench_regions,
+    'schema': bench_schema,
+    'snapshot': bench_snapshot,
+    'spatial': bench_spatial,
+    'startup': bench_startup,
+    'verification': bench_verification,
+    'writers': bench_writers,
+}
+
+
+def main():
+    """
+    Parse arguments and run the selected benchmark
+    """
+    parser = argparse.ArgumentParser(description='Weather pipeline benchmarks')
+    parser.add_argument('benchmark', choices=sorted(BENCHMARKS))
+    parser.add_argument('--locations', type=int, default=400, help='number of locations')
+    parser.add_argument('--hours', type=int, default=24 * 365, help='hours of synthetic history')
+    parser.add_argument('--sessions', type=int, default=50, help='number of simulated sessions')
+    parser.add_argument('--queries', type=int, default=1000, help='number of queries')
+    parser.add_argument('--k', type=int, default=5, help='neighbours per nearest query')
+    parser.add_argument('--runs', type=int, default=5, help='number of repeated runs')
+    parser.add_argument('--concurrency', type=int, default=32, help='number of concurrent clients')
+    parser.add_argument('--processes', type=int, default=8, help='number of writer processes')
+    parser.add_argument('--threads', type=int, default=4, help='writer threads per process')
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds per load-test phase')
+    parser.add_argument('--count', type=int, default=1000000, help='number of records')
+    parser.add_argument('--top', type=int, default=10, help='number of entries to list')
+    args = parser.parse_args()
+
+    BENCHMARKS[args.benchmark](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,14 +3,146 @@ Database Module
 Handles SQLite database operations for weather data storage
 """
 
+import importlib.util
 import sqlite3
-from typing import List, Dict, Optional
-from datetime import datetime
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+from datetime import datetime, timezone
 import os
+import time
+
+from records import SELECT_COLUMNS, WeatherRecord, as_record, from_rows
+
+# DuckDB is optional (analytics queries then run on SQLite) and imported
+# only when the analytics copy is built, so importing this module stays cheap
+DUCKDB_AVAILABLE = importlib.util.find_spec('duckdb') is not None
 
 
 DB_NAME = "data.db"
 
+# Published read replica directory (see replica.py); when set, queries read
+# the newest replica instead of DB_NAME and writes still go to DB_NAME
+READ_REPLICA_DIR = os.environ.get('WEATHER_REPLICA_DIR') or None
+
+# Seconds a connection waits on a locked database before raising
+BUSY_TIMEOUT = 30.0
+
+# Forecast times are shown in CWA's own zone, so the view returns its values unchanged
+FORECAST_UTC_OFFSET = '+08:00'
+FORECAST_UTC_MODIFIER = '+8 hours'
+
+# Bound parameters per dimension lookup query (older SQLite builds allow at most 999)
+LOOKUP_CHUNK_SIZE = 500
+
+INSERT_SQL = '''
+    INSERT INTO weather_facts (location_id, description_id, min_temp, max_temp, current_temp, forecast_ts, created_ts)
+    VALUES (?, ?, ?, ?, ?, ?, COALESCE(?, CAST(strftime('%s', 'now') AS INTEGER)))
+'''
+
+# Secondary indexes on weather_facts, dropped during bulk loads
+FACT_INDEXES = {
+    'idx_weather_facts_location_created': '''
+    CREATE INDEX IF NOT EXISTS idx_weather_facts_location_created
+        ON weather_facts (location_id, created_ts)
+    ''',
+    'idx_weather_facts_created': '''
+    CREATE INDEX IF NOT EXISTS idx_weather_facts_created
+        ON weather_facts (created_ts)
+    ''',
+}
+
+SCHEMA_STATEMENTS = [
+    '''
+    CREATE TABLE IF NOT EXISTS locations (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE,
+        region TEXT,
+        latitude REAL,
+        longitude REAL
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS descriptions (
+        id INTEGER PRIMARY KEY,
+        text TEXT NOT NULL UNIQUE
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS weather_facts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        location_id INTEGER NOT NULL REFERENCES locations(id),
+        description_id INTEGER REFERENCES descriptions(id),
+        min_temp REAL,
+        max_temp REAL,
+        current_temp REAL,
+        forecast_ts INTEGER,
+        created_ts INTEGER NOT NULL
+    )
+    ''',
+    *FACT_INDEXES.values(),
+    # Counters kept next to the data, e.g. rows ever deleted from weather_facts
+    '''
+    CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value INTEGER NOT NULL
+    )
+    ''',
+    "INSERT OR IGNORE INTO meta (key, value) VALUES ('deleted_facts', 0)",
+    # Same columns as the original denormalized weather table (recreated so
+    # existing databases pick up changes to it)
+    'DROP VIEW IF EXISTS weather',
+    f'''
+    CREATE VIEW weather AS
+    SELECT
+        f.id AS id,
+        l.name AS location,
+        l.region AS region,
+        f.min_temp AS min_temp,
+        f.max_temp AS max_temp,
+        f.current_temp AS current_temp,
+        d.text AS description,
+        strftime('%Y-%m-%dT%H:%M:%S', f.forecast_ts, 'unixepoch', '{FORECAST_UTC_MODIFIER}')
+            || '{FORECAST_UTC_OFFSET}' AS forecast_time,
+        datetime(f.created_ts, 'unixepoch') AS created_at
+    FROM weather_facts f
+    JOIN locations l ON l.id = f.location_id
+    LEFT JOIN descriptions d ON d.id = f.description_id
+    ''',
+    # Alerts raised on ingest and the rolling statistics they are judged against (see alerts.py)
+    '''
+    CREATE TABLE IF NOT EXISTS alerts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        fact_id INTEGER NOT NULL,
+        location_id INTEGER NOT NULL REFERENCES locations(id),
+        rule TEXT NOT NULL,
+        severity TEXT NOT NULL,
+        value REAL,
+        baseline REAL,
+        created_ts INTEGER NOT NULL
+    )
+    ''',
+    '''
+    CREATE INDEX IF NOT EXISTS idx_alerts_created
+        ON alerts (created_ts)
+    ''',
+    # Per-location lookups for alert de-duplication
+    '''
+    CREATE INDEX IF NOT EXISTS idx_alerts_location
+        ON alerts (location_id)
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS alert_stats (
+        location_id INTEGER PRIMARY KEY,
+        count INTEGER NOT NULL,
+        mean REAL NOT NULL,
+        m2 REAL NOT NULL,
+        position INTEGER NOT NULL,
+        window BLOB NOT NULL
+    )
+    ''',
+]
+
 
 def get_db_connection():
     """
@@ -19,127 +151,581 @@ def get_db_connection():
     Returns:
         sqlite3.Connection object
     """
-    conn = sqlite3.connect(DB_NAME)
+    conn = sqlite3.connect(DB_NAME, timeout=BUSY_TIMEOUT)
     conn.row_factory = sqlite3.Row  # Enable column access by name
     return conn
 
 
+def get_read_connection():
+    """
+    Create a connection for read-only queries
+
+    With READ_REPLICA_DIR set this opens the newest published replica
+    (immutable, read-only); each new connection picks up a newer replica
+    as soon as it is published. Until the first replica is published it
+    is an empty in-memory database with the schema, so readers see no
+    data instead of whatever DB_NAME happens to be on this machine.
+    Otherwise it is a normal connection.
+
+    Returns:
+        sqlite3.Connection object
+    """
+    if READ_REPLICA_DIR:
+        import replica
+
+        conn = replica.get_reader(READ_REPLICA_DIR).connect()
+        if conn is None:
+            conn = sqlite3.connect(':memory:')
+            for statement in SCHEMA_STATEMENTS:
+                conn.execute(statement)
+        conn.row_factory = sqlite3.Row
+        return conn
+    return get_db_connection()
+
+
 def init_database():
     """
     Initialize the database and create tables if they don't exist
+
+    Weather data is stored normalized: location and description strings
+    live in integer-keyed dimension tables, timestamps are integer epoch
+    seconds, and the ``weather`` view presents the original row shape.
+    A database with the old denormalized ``weather`` table is migrated.
+    """
+    with writer_lock():
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        
+        cursor.execute("SELECT type FROM sqlite_master WHERE name = 'weather'")
+        row = cursor.fetchone()
+        legacy = row is not None and row['type'] == 'table'
+        if legacy:
+            cursor.execute('ALTER TABLE weather RENAME TO weather_legacy')
+        
+        for statement in SCHEMA_STATEMENTS:
+            cursor.execute(statement)
+        
+        if legacy:
+            import alerts
+
+            migrated = _migrate_legacy_table(conn)
+            print(f"[OK] Migrated {migrated} records to normalized schema")
+            # Migrated history skipped the alert rules; seed their rolling norms from it
+            # (rebuild_stats() would wait on the writer lock held here)
+            alerts.reset_stats(cursor)
+        
+        _backfill_coordinates(cursor)
+        
+        conn.commit()
+        conn.close()
+    
+    print(f"[OK] Database initialized: {DB_NAME}")
+
+
+def _migrate_legacy_table(conn: sqlite3.Connection) -> int:
+    """
+    Copy rows from the old denormalized table into the normalized schema
+
+    Record ids are preserved so change-feed cursors stay valid. Runs inside
+    the caller's transaction.
+
+    Timestamps are converted as on ingest (see to_epoch()): naive
+    forecast_time values were written by datetime.now() and are read as
+    the local time of the machine running the migration; naive created_at
+    values came from SQLite's CURRENT_TIMESTAMP and are read as UTC. Rows
+    whose timestamps do not parse are not converted: they stay in
+    weather_legacy with an [ERROR] line, so nothing is dropped.
     """
-    conn = get_db_connection()
     cursor = conn.cursor()
     
-    # Create weather table
     cursor.execute('''
-        CREATE TABLE IF NOT EXISTS weather (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            location TEXT NOT NULL,
-            region TEXT,
-            min_temp REAL,
-            max_temp REAL,
-            current_temp REAL,
-            description TEXT,
-            forecast_time TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
+        SELECT id, location, region, min_temp, max_temp, current_temp, description, forecast_time, created_at
+        FROM weather_legacy
+        ORDER BY id
     ''')
+    rows = cursor.fetchall()
     
-    conn.commit()
-    conn.close()
+    facts = []
+    kept_ids = []
+    for row in rows:
+        forecast_ts = to_epoch(row['forecast_time'])
+        created_ts = to_epoch(row['created_at'], assume_utc=True)
+        if _unparsed(row['forecast_time'], forecast_ts) or created_ts is None:
+            kept_ids.append(row['id'])
+            continue
+        facts.append((row, forecast_ts, created_ts))
     
-    print(f"[OK] Database initialized: {DB_NAME}")
+    locations, descriptions = _resolve_dimensions(cursor, [tuple(row)[1:] for row, _, _ in facts])
+    cursor.executemany(
+        'INSERT INTO weather_facts (id, location_id, description_id, min_temp, max_temp, '
+        'current_temp, forecast_ts, created_ts) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+        [
+            (
+                row['id'],
+                locations[row['location']],
+                descriptions.get(row['description']),
+                row['min_temp'],
+                row['max_temp'],
+                row['current_temp'],
+                forecast_ts,
+                created_ts,
+            )
+            for row, forecast_ts, created_ts in facts
+        ]
+    )
+    
+    # Keep AUTOINCREMENT from reusing ids of rows deleted before migration
+    cursor.execute('''
+        UPDATE sqlite_sequence
+        SET seq = MAX(seq, COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'weather_legacy'), 0))
+        WHERE name = 'weather_facts'
+    ''')
+    # weather_facts has no sequence row yet when no record was copied
+    cursor.execute('''
+        INSERT INTO sqlite_sequence (name, seq)
+        SELECT 'weather_facts', seq FROM sqlite_sequence
+        WHERE name = 'weather_legacy'
+          AND NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'weather_facts')
+    ''')
+    if kept_ids:
+        # Keep only the rows that could not be converted, for manual repair
+        cursor.execute('DELETE FROM weather_legacy WHERE id IN (SELECT id FROM weather_facts)')
+        print(f"[ERROR] {len(kept_ids)} legacy records have unparsable timestamps; "
+              f"left in table weather_legacy (ids {kept_ids[:10]}{'...' if len(kept_ids) > 10 else ''})")
+    else:
+        cursor.execute('DROP TABLE weather_legacy')
+    return len(facts)
+
+
+def _backfill_coordinates(cursor: sqlite3.Cursor):
+    """
+    Fill in coordinates for locations that have none, from geo.CITY_COORDINATES
+    """
+    import geo
+
+    cursor.execute('SELECT name FROM locations WHERE latitude IS NULL OR longitude IS NULL')
+    updates = []
+    for (name,) in cursor.fetchall():
+        coords = geo.lookup_coordinates(name)
+        if coords is not None:
+            updates.append(coords + (name,))
+    cursor.executemany('UPDATE locations SET latitude = ?, longitude = ? WHERE name = ?', updates)
+
+
+def to_epoch(value, assume_utc: bool = False) -> Optional[int]:
+    """
+    Convert a timestamp to integer epoch seconds
+
+    Values with a UTC offset (CWA sends +08:00) are exact. Naive values
+    carry no zone, so one is assumed: local time of the running machine by
+    default, which is what datetime.now().isoformat() wrote, or UTC with
+    assume_utc for SQLite CURRENT_TIMESTAMP values.
+
+    Args:
+        value: ISO 8601 string, datetime, or number of seconds
+        assume_utc: Treat naive values as UTC instead of local time
+
+    Returns:
+        Epoch seconds, or None if the value is missing or not a timestamp
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    if not isinstance(value, datetime):
+        try:
+            value = datetime.fromisoformat(str(value))
+        except ValueError:
+            return None
+    if assume_utc and value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+
+def _unparsed(value, epoch: Optional[int]) -> bool:
+    """
+    Whether a timestamp was given but to_epoch() could not read it
+    """
+    return epoch is None and value is not None and value != ''
+
+
+_initialized_db = None
+
+
+def ensure_database():
+    """
+    Initialize the database once per process
+
+    Long-running callers (the dashboard, services) use this instead of
+    init_database() so the schema DDL only runs on the first call. Readers
+    of published replicas leave the schema to the writer.
+    """
+    global _initialized_db
+
+    if READ_REPLICA_DIR:
+        return
+    if _initialized_db != DB_NAME:
+        init_database()
+        _initialized_db = DB_NAME
+
+
+@contextmanager
+def writer_lock():
+    """
+    Hold the cross-process single-writer lock for the current database
+
+    Every writer (dashboard refresh, cron pipeline, test data script) takes
+    an advisory lock on a sidecar ``<db>.lock`` file, so writes queue up here
+    instead of contending for SQLite's own lock and failing with
+    "database is locked".
+    """
+    with open(f"{DB_NAME}.lock", 'a+b') as lock_file:
+        if os.name == 'nt':
+            import msvcrt
+            lock_file.seek(0)
+            while True:
+                try:
+                    # LK_LOCK retries for ~10 seconds before raising
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        else:
+            import fcntl
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+
+        try:
+            yield
+        finally:
+            if os.name == 'nt':
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+class _PendingWrite:
+    """
+    A batch of records waiting in the in-process write queue
+    """
+
+    __slots__ = ('rows', 'inserted', 'done')
+
+    def __init__(self, rows: List[tuple]):
+        self.rows = rows
+        self.inserted = 0
+        self.done = False
+
+
+_write_queue: List[_PendingWrite] = []
+_write_queue_lock = threading.Lock()
+_writer_mutex = threading.Lock()
+
+
+def _record_to_row(record: WeatherRecord) -> tuple:
+    # Field order of WeatherRecord without the id
+    return as_record(record)[1:]
+
+
+def _resolve_dimensions(cursor: sqlite3.Cursor, rows: List[tuple]) -> Tuple[Dict[str, int], Dict[str, int]]:
+    """
+    Upsert the locations and descriptions used by rows and map them to ids
+
+    Returns:
+        Tuple of (location name -> id, description text -> id)
+    """
+    import geo
+
+    regions = {}
+    for row in rows:
+        if row[0] is not None and (row[1] is not None or row[0] not in regions):
+            regions[row[0]] = row[1]
+
+    # Seed coordinates only for locations seen for the first time
+    existing = _lookup_ids(cursor, 'locations', 'name', list(regions))
+    cursor.executemany('''
+        INSERT INTO locations (name, region, latitude, longitude) VALUES (?, ?, ?, ?)
+        ON CONFLICT (name) DO UPDATE SET region = COALESCE(excluded.region, region)
+        WHERE region IS NOT excluded.region
+    ''', [
+        (name, region) + ((None, None) if name in existing else (geo.lookup_coordinates(name) or (None, None)))
+        for name, region in regions.items()
+    ])
+
+    texts = {row[5] for row in rows if row[5] is not None}
+    cursor.executemany(
+        'INSERT OR IGNORE INTO descriptions (text) VALUES (?)',
+        [(text,) for text in texts]
+    )
+
+    locations = _lookup_ids(cursor, 'locations', 'name', list(regions))
+    descriptions = _lookup_ids(cursor, 'descriptions', 'text', list(texts))
+    return locations, descriptions
+
+
+def _lookup_ids(cursor: sqlite3.Cursor, table: str, column: str, values: List[str]) -> Dict[str, int]:
+    """
+    Map dimension values to their ids, querying in chunks of bound parameters
+    """
+    ids = {}
+    for start in range(0, len(values), LOOKUP_CHUNK_SIZE):
+        chunk = values[start:start + LOOKUP_CHUNK_SIZE]
+        placeholders = ', '.join('?' * len(chunk))
+        cursor.execute(f'SELECT {column}, id FROM {table} WHERE {column} IN ({placeholders})', chunk)
+        ids.update(cursor.fetchall())
+    return ids
+
+
+def _insert_rows(cursor: sqlite3.Cursor, rows: List[tuple], evaluate_alerts: bool = True) -> int:
+    """
+    Insert record rows into the fact table (inside an open transaction)
+
+    Args:
+        cursor: Cursor in the open write transaction
+        rows: Record rows from _record_to_row
+        evaluate_alerts: Run the alert rules on the new facts in the same transaction
+
+    Returns:
+        Number of rows inserted
+    """
+    locations, descriptions = _resolve_dimensions(cursor, rows)
+
+    facts = []
+    for row in rows:
+        if row[0] is None:
+            print("[ERROR] Error inserting record: location is required")
+            continue
+        forecast_ts = to_epoch(row[6])
+        created_ts = to_epoch(row[7], assume_utc=True)
+        # Stored as epoch seconds, so a value that does not parse would be lost
+        if _unparsed(row[6], forecast_ts) or _unparsed(row[7], created_ts):
+            print(f"[ERROR] Error inserting record for {row[0]}: invalid timestamp "
+                  f"(forecast_time={row[6]!r}, created_at={row[7]!r})")
+            continue
+        facts.append((
+            locations[row[0]],
+            descriptions.get(row[5]),
+            row[2],
+            row[3],
+            row[4],
+            forecast_ts,
+            created_ts,
+        ))
+
+    cursor.executemany(INSERT_SQL, facts)
+
+    if evaluate_alerts and facts:
+        import alerts
+
+        # One statement under the writer lock, so the new ids are contiguous
+        last_id = cursor.execute('SELECT last_insert_rowid()').fetchone()[0]
+        cursor.execute('SAVEPOINT alerts')
+        try:
+            alerts.process_facts(cursor, range(last_id - len(facts) + 1, last_id + 1), facts)
+        except (ValueError, TypeError) as e:
+            # Values the rules cannot read (e.g. non-numeric temperatures) must
+            # not cost the records themselves; the batch is stored without alerts
+            cursor.execute('ROLLBACK TO alerts')
+            print(f"[ERROR] Error evaluating alerts: {e}")
+        cursor.execute('RELEASE alerts')
+    return len(facts)
 
 
-def insert_weather_record(record: Dict) -> bool:
+def _insert_rows_one_by_one(cursor: sqlite3.Cursor, rows: List[tuple]) -> int:
+    """
+    Insert rows each in its own savepoint, skipping the ones that fail
+
+    Returns:
+        Number of rows inserted
+    """
+    success_count = 0
+    for row in rows:
+        cursor.execute('SAVEPOINT record')
+        try:
+            success_count += _insert_rows(cursor, [row])
+        except sqlite3.Error as e:
+            cursor.execute('ROLLBACK TO record')
+            print(f"[ERROR] Error inserting record for {row[0]}: {e}")
+        cursor.execute('RELEASE record')
+    return success_count
+
+
+def _write_pending(batches: List[_PendingWrite]):
+    """
+    Write queued batches in a single transaction under the writer lock
+    """
+    with writer_lock():
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+
+            for batch in batches:
+                cursor.execute('SAVEPOINT batch')
+                try:
+                    batch.inserted = _insert_rows(cursor, batch.rows)
+                except sqlite3.Error as e:
+                    # Roll back only this batch so other callers still commit,
+                    # then retry its rows one by one to keep the good ones
+                    cursor.execute('ROLLBACK TO batch')
+                    print(f"[ERROR] Database error: {e}; retrying records one by one")
+                    batch.inserted = _insert_rows_one_by_one(cursor, batch.rows)
+                cursor.execute('RELEASE batch')
+
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            for batch in batches:
+                batch.inserted = 0
+            print(f"[ERROR] Database error: {e}")
+        finally:
+            conn.close()
+
+
+def _submit_write(rows: List[tuple]) -> int:
+    """
+    Queue rows for writing and wait until they are committed
+
+    Threads that arrive while another write is in progress queue up behind
+    it; the next thread to get the writer drains the whole queue, so
+    concurrent callers are coalesced into one transaction.
+
+    Returns:
+        Number of rows inserted
+    """
+    pending = _PendingWrite(rows)
+    with _write_queue_lock:
+        _write_queue.append(pending)
+
+    with _writer_mutex:
+        if not pending.done:
+            with _write_queue_lock:
+                batches = _write_queue[:]
+                _write_queue.clear()
+            try:
+                _write_pending(batches)
+            finally:
+                for batch in batches:
+                    batch.done = True
+
+    return pending.inserted
+
+
+def insert_weather_record(record: WeatherRecord) -> bool:
     """
     Insert a single weather record into the database
     
     Args:
-        record: Dictionary containing weather data
+        record: WeatherRecord (legacy dictionaries are also accepted)
         
     Returns:
         True if successful, False otherwise
     """
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO weather (location, region, min_temp, max_temp, current_temp, description, forecast_time)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            record.get('location'),
-            record.get('region'),
-            record.get('min_temp'),
-            record.get('max_temp'),
-            record.get('current_temp'),
-            record.get('description'),
-            record.get('forecast_time')
-        ))
-        
-        conn.commit()
-        conn.close()
-        return True
-        
-    except sqlite3.Error as e:
-        print(f"[ERROR] Database error: {e}")
-        return False
+    return _submit_write([_record_to_row(record)]) == 1
 
 
-def insert_weather_records(records: List[Dict]) -> int:
+def insert_weather_records(records: List[WeatherRecord]) -> int:
     """
     Insert multiple weather records into the database
     
+    Records go through the single-writer queue, so concurrent callers in
+    this process share one transaction and other processes wait on the
+    writer lock.
+    
     Args:
-        records: List of weather record dictionaries
+        records: List of WeatherRecord (legacy dictionaries are also accepted)
         
     Returns:
         Number of records successfully inserted
     """
-    success_count = 0
-    
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    for record in records:
-        try:
-            cursor.execute('''
-                INSERT INTO weather (location, region, min_temp, max_temp, current_temp, description, forecast_time)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                record.get('location'),
-                record.get('region'),
-                record.get('min_temp'),
-                record.get('max_temp'),
-                record.get('current_temp'),
-                record.get('description'),
-                record.get('forecast_time')
-            ))
-            success_count += 1
-        except sqlite3.Error as e:
-            print(f"[ERROR] Error inserting record for {record.get('location')}: {e}")
-    
-    conn.commit()
-    conn.close()
+    success_count = _submit_write([_record_to_row(record) for record in records])
     
     print(f"[OK] Inserted {success_count}/{len(records)} records into database")
     return success_count
 
 
-def get_all_weather_records() -> List[Dict]:
+class BulkLoader:
+    """
+    Writer for large historical loads, obtained from bulk_loader()
+
+    Rows are inserted into one open transaction; call commit() at
+    checkpoints to make them durable.
+    """
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.cursor = conn.cursor()
+        self.cursor.execute('BEGIN')
+
+    def insert(self, records: List[WeatherRecord]) -> int:
+        """
+        Insert records into the current transaction
+
+        Returns:
+            Number of records inserted
+        """
+        # Historical loads are not alerted on; live rules only follow ingest
+        return _insert_rows(self.cursor, [_record_to_row(record) for record in records], evaluate_alerts=False)
+
+    def commit(self):
+        """
+        Commit the current transaction and start the next one
+        """
+        self.conn.commit()
+        self.cursor.execute('BEGIN')
+
+
+@contextmanager
+def bulk_loader(defer_indexes: bool = True):
+    """
+    Hold the writer lock for a bulk load, optionally rebuilding indexes at the end
+
+    Dropping the secondary fact indexes while loading avoids maintaining
+    them row by row; they are recreated in one pass when the load ends,
+    including when it fails part-way.
+
+    Args:
+        defer_indexes: Drop secondary indexes for the duration of the load
+
+    Yields:
+        BulkLoader
+    """
+    with writer_lock():
+        conn = get_db_connection()
+        try:
+            if defer_indexes:
+                for name in FACT_INDEXES:
+                    conn.execute(f'DROP INDEX IF EXISTS {name}')
+                conn.commit()
+
+            loader = BulkLoader(conn)
+            try:
+                yield loader
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+        finally:
+            if defer_indexes:
+                for statement in FACT_INDEXES.values():
+                    conn.execute(statement)
+                conn.commit()
+            conn.close()
+
+
+def get_all_weather_records() -> List[WeatherRecord]:
     """
     Retrieve all weather records from the database
     
     Returns:
-        List of weather records as dictionaries
+        List of WeatherRecord
     """
-    conn = get_db_connection()
+    conn = get_read_connection()
     cursor = conn.cursor()
     
-    cursor.execute('''
-        SELECT id, location, region, min_temp, max_temp, current_temp, description, forecast_time, created_at
+    cursor.execute(f'''
+        SELECT {SELECT_COLUMNS}
         FROM weather
         ORDER BY created_at DESC
     ''')
@@ -147,64 +733,338 @@ def get_all_weather_records() -> List[Dict]:
     rows = cursor.fetchall()
     conn.close()
     
-    # Convert rows to dictionaries
-    records = []
-    for row in rows:
-        records.append({
-            'id': row['id'],
-            'location': row['location'],
-            'region': row['region'],
-            'min_temp': row['min_temp'],
-            'max_temp': row['max_temp'],
-            'current_temp': row['current_temp'],
-            'description': row['description'],
-            'forecast_time': row['forecast_time'],
-            'created_at': row['created_at']
-        })
-    
-    return records
+    return from_rows(rows)
 
 
-def get_latest_weather_records() -> List[Dict]:
+def get_latest_weather_records(region: Optional[str] = None) -> List[WeatherRecord]:
     """
     Retrieve the most recent weather records (one per location)
     
+    Args:
+        region: Only locations in this region (default: all)
+    
     Returns:
-        List of latest weather records as dictionaries
+        List of latest WeatherRecord
     """
-    conn = get_db_connection()
+    conn = get_read_connection()
     cursor = conn.cursor()
     
-    cursor.execute('''
-        SELECT w1.*
-        FROM weather w1
-        INNER JOIN (
-            SELECT location, MAX(created_at) as max_created
-            FROM weather
-            GROUP BY location
-        ) w2 ON w1.location = w2.location AND w1.created_at = w2.max_created
-        ORDER BY w1.region, w1.location
-    ''')
+    # One index probe per location for its newest fact (ties go to the higher id)
+    cursor.execute(f'''
+        SELECT {SELECT_COLUMNS}
+        FROM weather
+        WHERE id IN (
+            SELECT (
+                SELECT f.id
+                FROM weather_facts f
+                WHERE f.location_id = l.id
+                ORDER BY f.created_ts DESC, f.id DESC
+                LIMIT 1
+            )
+            FROM locations l
+            WHERE ? IS NULL OR l.region = ?
+        )
+        ORDER BY region, location
+    ''', (region, region))
     
     rows = cursor.fetchall()
     conn.close()
     
-    # Convert rows to dictionaries
-    records = []
-    for row in rows:
-        records.append({
-            'id': row['id'],
-            'location': row['location'],
-            'region': row['region'],
-            'min_temp': row['min_temp'],
-            'max_temp': row['max_temp'],
-            'current_temp': row['current_temp'],
-            'description': row['description'],
-            'forecast_time': row['forecast_time'],
-            'created_at': row['created_at']
-        })
-    
-    return records
+    return from_rows(rows)
+
+
+def get_location_history(location: str, limit: int = 100) -> List[WeatherRecord]:
+    """
+    Retrieve the most recent weather records for one location
+
+    Args:
+        location: Location name
+        limit: Maximum number of records to return (newest first)
+
+    Returns:
+        List of WeatherRecord
+    """
+    conn = get_read_connection()
+    cursor = conn.cursor()
+
+    cursor.execute(f'''
+        SELECT {SELECT_COLUMNS}
+        FROM weather
+        WHERE location = ?
+        ORDER BY created_at DESC, id DESC
+        LIMIT ?
+    ''', (location, limit))
+
+    rows = cursor.fetchall()
+    conn.close()
+
+    return from_rows(rows)
+
+
+def get_recent_alerts(limit: int = 100, since_ts: int = 0) -> List[Dict]:
+    """
+    Retrieve the most recent alerts raised on ingest (see alerts.py)
+
+    Args:
+        limit: Maximum number of alerts to return (newest first)
+        since_ts: Only alerts created at or after this epoch second
+
+    Returns:
+        List of alert dictionaries
+    """
+    conn = get_read_connection()
+    cursor = conn.cursor()
+
+    cursor.execute('''
+        SELECT a.id, l.name AS location, l.region, a.rule, a.severity, a.value, a.baseline,
+               datetime(a.created_ts, 'unixepoch') AS created_at
+        FROM alerts a
+        JOIN locations l ON l.id = a.location_id
+        WHERE a.created_ts >= ?
+        ORDER BY a.created_ts DESC, a.id DESC
+        LIMIT ?
+    ''', (since_ts, limit))
+
+    alerts = [dict(row) for row in cursor.fetchall()]
+    conn.close()
+
+    return alerts
+
+
+def upsert_locations(locations: List[Dict]) -> int:
+    """
+    Insert or update locations with their region and coordinates
+
+    Args:
+        locations: Dicts with 'name', 'region', 'latitude' and 'longitude'
+
+    Returns:
+        Number of locations written
+    """
+    with writer_lock():
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.executemany('''
+            INSERT INTO locations (name, region, latitude, longitude) VALUES (?, ?, ?, ?)
+            ON CONFLICT (name) DO UPDATE SET
+                region = COALESCE(excluded.region, region),
+                latitude = excluded.latitude,
+                longitude = excluded.longitude
+        ''', [
+            (loc['name'], loc.get('region'), loc.get('latitude'), loc.get('longitude'))
+            for loc in locations
+        ])
+        conn.commit()
+        conn.close()
+
+    return len(locations)
+
+
+def get_locations() -> List[Dict]:
+    """
+    Retrieve the locations dimension
+
+    Returns:
+        List of dicts with id, name, region, latitude and longitude
+    """
+    conn = get_read_connection()
+    cursor = conn.cursor()
+
+    cursor.execute('SELECT id, name, region, latitude, longitude FROM locations ORDER BY id')
+    rows = cursor.fetchall()
+    conn.close()
+
+    return [dict(row) for row in rows]
+
+
+def get_locations_version() -> Tuple[int, int, float, float]:
+    """
+    Get a token that changes when locations are added or moved
+
+    Returns:
+        Tuple of (count, max_id, latitude sum, longitude sum)
+    """
+    conn = get_read_connection()
+    cursor = conn.cursor()
+
+    cursor.execute('''
+        SELECT COUNT(*), COALESCE(MAX(id), 0), TOTAL(latitude), TOTAL(longitude)
+        FROM locations
+    ''')
+    row = tuple(cursor.fetchone())
+    conn.close()
+
+    return row
+
+
+def changes_since(cursor: int = 0, limit: int = 1000) -> Tuple[List[WeatherRecord], int]:
+    """
+    Retrieve weather records ingested after a cursor, oldest first
+
+    The cursor is the row id, which AUTOINCREMENT keeps strictly increasing.
+    All writes go through the single writer, so ids become visible in order
+    and a consumer never skips rows committed later with a smaller id.
+    Deleted rows (clear_old_records) are not reported.
+
+    Args:
+        cursor: Last id already consumed (0 for the beginning of the table)
+        limit: Maximum number of records to return
+
+    Returns:
+        Tuple of (records, next_cursor); next_cursor equals cursor when
+        there are no new records
+    """
+    conn = get_read_connection()
+
+    rows = conn.execute(f'''
+        SELECT {SELECT_COLUMNS}
+        FROM weather
+        WHERE id > ?
+        ORDER BY id
+        LIMIT ?
+    ''', (cursor, limit)).fetchall()
+    conn.close()
+
+    records = from_rows(rows)
+    next_cursor = records[-1].id if records else cursor
+    return records, next_cursor
+
+
+def get_forecast_facts(after_id: int = 0, up_to_id: Optional[int] = None) -> List[tuple]:
+    """
+    Retrieve the numeric forecast columns of facts in an id range, oldest first
+
+    Args:
+        after_id: Only facts with a higher id
+        up_to_id: Only facts with an id up to this one (default: no limit)
+
+    Returns:
+        List of (id, location_id, forecast_ts, created_ts, min_temp, max_temp) tuples
+    """
+    conn = get_read_connection()
+    conn.row_factory = None
+
+    rows = conn.execute('''
+        SELECT id, location_id, forecast_ts, created_ts, min_temp, max_temp
+        FROM weather_facts
+        WHERE id > ? AND id <= ?
+        ORDER BY id
+    ''', (after_id, up_to_id if up_to_id is not None else 2 ** 62)).fetchall()
+    conn.close()
+
+    return rows
+
+
+def get_latest_cursor() -> int:
+    """
+    Get the cursor for the newest ingested record, to start following the tail
+
+    Returns:
+        Highest record id (0 for an empty table)
+    """
+    conn = get_read_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT COALESCE(MAX(id), 0) as max_id FROM weather_facts")
+    max_id = cursor.fetchone()['max_id']
+    conn.close()
+
+    return max_id
+
+
+def follow_changes(cursor: Optional[int] = None, limit: int = 1000,
+                   poll_interval: float = 1.0) -> Iterator[Tuple[List[WeatherRecord], int]]:
+    """
+    Follow the change feed, yielding each new batch of records as it appears
+
+    Args:
+        cursor: Cursor to start after (None to start at the current tail)
+        limit: Maximum number of records per yielded batch
+        poll_interval: Seconds to wait between polls when caught up
+
+    Yields:
+        Tuples of (records, next_cursor)
+    """
+    if cursor is None:
+        cursor = get_latest_cursor()
+
+    while True:
+        records, cursor = changes_since(cursor, limit)
+        if records:
+            yield records, cursor
+        if len(records) < limit:
+            time.sleep(poll_interval)
+
+
+def get_table_state() -> Tuple[int, int]:
+    """
+    Get the highest record id and the delete counter of the weather table
+
+    Ids are never reused (AUTOINCREMENT), so inserts always advance the
+    highest id, and every delete bumps the counter in the meta table. Both
+    are index lookups, so the pair identifies the current contents without
+    scanning the table.
+
+    Returns:
+        Tuple of (max_id, deleted)
+    """
+    conn = get_read_connection()
+    cursor = conn.cursor()
+
+    cursor.execute('''
+        SELECT COALESCE(MAX(id), 0) AS max_id,
+               COALESCE((SELECT value FROM meta WHERE key = 'deleted_facts'), 0) AS deleted
+        FROM weather_facts
+    ''')
+    row = cursor.fetchone()
+    conn.close()
+
+    return row['max_id'], row['deleted']
+
+
+def format_data_version(state: Tuple[int, int]) -> str:
+    """
+    Format a table state from get_table_state() as a data version token
+    """
+    return f"{state[0]}:{state[1]}"
+
+
+def get_data_version() -> str:
+    """
+    Get a cheap token that changes whenever the weather table changes
+
+    Returns:
+        Data version token string
+    """
+    return format_data_version(get_table_state())
+
+
+def get_change_token() -> Tuple[int, ...]:
+    """
+    Get a token that changes whenever the database files are written
+
+    Only file metadata is read (no connection, no query), so it is cheap
+    enough to poll every second. A changed token does not guarantee changed
+    data; confirm with get_data_version().
+
+    Returns:
+        Tuple of (mtime_ns, size) for the database file and its WAL, or for
+        the replica manifest when reading replicas
+    """
+    if READ_REPLICA_DIR:
+        import replica
+
+        paths = (replica.manifest_path(READ_REPLICA_DIR),)
+    else:
+        paths = (DB_NAME, DB_NAME + '-wal')
+    token = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            token.extend((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            token.extend((0, 0))
+    return tuple(token)
 
 
 def clear_old_records(days: int = 7):
@@ -214,45 +1074,58 @@ def clear_old_records(days: int = 7):
     Args:
         days: Number of days to keep (default: 7)
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        DELETE FROM weather
-        WHERE created_at < datetime('now', '-' || ? || ' days')
-    ''', (days,))
-    
-    deleted_count = cursor.rowcount
-    conn.commit()
-    conn.close()
+    with writer_lock():
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            DELETE FROM weather_facts
+            WHERE created_ts < CAST(strftime('%s', 'now') AS INTEGER) - ? * 86400
+        ''', (days,))
+        
+        deleted_count = cursor.rowcount
+        # Deletes do not move the highest id; the counter changes the data version
+        cursor.execute("UPDATE meta SET value = value + ? WHERE key = 'deleted_facts'", (deleted_count,))
+        cursor.execute('''
+            DELETE FROM alerts
+            WHERE created_ts < CAST(strftime('%s', 'now') AS INTEGER) - ? * 86400
+        ''', (days,))
+        conn.commit()
+        conn.close()
     
     print(f"[OK] Deleted {deleted_count} old records (older than {days} days)")
 
 
-def get_database_stats() -> Dict:
+def get_database_stats(engine: Optional[str] = None) -> Dict:
     """
     Get database statistics
     
+    Args:
+        engine: 'duckdb' to answer from the DuckDB copy; SQLite by default
+    
     Returns:
         Dictionary with database statistics
     """
-    conn = get_db_connection()
+    if choose_analytics_engine('stats', engine) == 'duckdb':
+        return _duckdb_database_stats()
+    
+    conn = get_read_connection()
     cursor = conn.cursor()
     
     # Total records
-    cursor.execute('SELECT COUNT(*) as count FROM weather')
+    cursor.execute('SELECT COUNT(*) as count FROM weather_facts')
     total_records = cursor.fetchone()['count']
     
     # Unique locations
-    cursor.execute('SELECT COUNT(DISTINCT location) as count FROM weather')
+    cursor.execute('SELECT COUNT(DISTINCT location_id) as count FROM weather_facts')
     unique_locations = cursor.fetchone()['count']
     
     # Latest update time
-    cursor.execute('SELECT MAX(created_at) as latest FROM weather')
+    cursor.execute("SELECT datetime(MAX(created_ts), 'unixepoch') as latest FROM weather_facts")
     latest_update = cursor.fetchone()['latest']
     
     # Temperature range
-    cursor.execute('SELECT MIN(min_temp) as min, MAX(max_temp) as max FROM weather WHERE min_temp IS NOT NULL AND max_temp IS NOT NULL')
+    cursor.execute('SELECT MIN(min_temp) as min, MAX(max_temp) as max FROM weather_facts WHERE min_temp IS NOT NULL AND max_temp IS NOT NULL')
     temp_row = cursor.fetchone()
     min_temp = temp_row['min']
     max_temp = temp_row['max']
@@ -268,6 +1141,431 @@ def get_database_stats() -> Dict:
     }
 
 
+# Analytics queries: engine preferred per query type when DuckDB is installed
+ANALYTICS_ENGINES = ('sqlite', 'duckdb')
+ANALYTICS_PREFERRED_ENGINE = {
+    # Dashboards and services read stats once per data version; building a
+    # full in-memory copy for that is not worth it, so DuckDB only on request
+    'stats': 'sqlite',
+    'region_means': 'duckdb',
+    'percentiles': 'duckdb',
+    'rolling': 'duckdb',
+    # One location's history is an indexed range scan in SQLite
+    'location_rolling': 'sqlite',
+}
+# Below this many facts SQLite is fast enough that the DuckDB copy is not worth building
+ANALYTICS_MIN_ROWS = 200000
+# Rows fetched from SQLite per chunk when filling the DuckDB copy
+ANALYTICS_LOAD_CHUNK = 500000
+TEMPERATURE_COLUMNS = ('min_temp', 'max_temp', 'current_temp')
+
+
+def choose_analytics_engine(query: str, engine: Optional[str] = None) -> str:
+    """
+    Pick the engine for an analytics query type
+
+    Heavy scans, group-bys and windows go to an in-memory DuckDB copy of the
+    facts when DuckDB is installed and the table is large; everything else
+    stays on SQLite, which remains the transactional store. The first such
+    query in a process starts building the copy in the background and is
+    answered by SQLite meanwhile.
+
+    Args:
+        query: Query type, a key of ANALYTICS_PREFERRED_ENGINE
+        engine: Force 'sqlite' or 'duckdb'; None chooses automatically
+
+    Returns:
+        'sqlite' or 'duckdb'
+    """
+    if engine is not None:
+        if engine not in ANALYTICS_ENGINES:
+            raise ValueError(f"Unknown analytics engine: {engine}")
+        if engine == 'duckdb' and not DUCKDB_AVAILABLE:
+            raise RuntimeError("DuckDB is not installed (pip install duckdb)")
+        return engine
+
+    if ANALYTICS_PREFERRED_ENGINE[query] != 'duckdb' or not DUCKDB_AVAILABLE:
+        return 'sqlite'
+    if _analytics_copy is not None:
+        return 'duckdb'
+    # The highest id bounds the row count and is read from the primary key
+    conn = get_read_connection()
+    max_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM weather_facts').fetchone()[0]
+    conn.close()
+    if max_id >= ANALYTICS_MIN_ROWS:
+        # Answer from SQLite until the copy is ready instead of blocking on it
+        warm_analytics_copy()
+    return 'sqlite'
+
+
+class _AnalyticsCopy:
+    """
+    In-memory DuckDB copy of weather_facts and locations
+
+    The copy is brought up to date before each query: rows appended since
+    the last sync are copied over, and anything else (deletes) triggers a
+    full reload, detected by the delete counter as for the snapshot.
+    Tables and column names match the SQLite schema (the columns analytics
+    queries use), so the same SQL runs on both engines.
+    """
+
+    def __init__(self):
+        import duckdb
+
+        self.conn = duckdb.connect(':memory:')
+        self.conn.execute('''
+            CREATE TABLE weather_facts (
+                id BIGINT, location_id INTEGER, min_temp DOUBLE, max_temp DOUBLE,
+                current_temp DOUBLE, created_ts BIGINT
+            )
+        ''')
+        self.conn.execute('CREATE TABLE locations (id INTEGER, name VARCHAR, region VARCHAR)')
+        self.cursor = 0
+        self.deleted = 0
+        self.locations_version = None
+        self.token = None
+        self.lock = threading.Lock()
+
+    def sync(self):
+        """
+        Copy new facts (and changed locations) from SQLite
+
+        The database state is read under the lock, so a thread that read an
+        older state cannot reload over a newer copy. Each sync commits as
+        one DuckDB transaction; queries on other cursors see the copy from
+        before or after it, never an emptied or half-loaded table.
+        """
+        # Unchanged database files mean nothing to copy, without counting rows
+        if get_change_token() == self.token:
+            return
+        with self.lock:
+            token = get_change_token()
+            if token == self.token:
+                return
+            max_id, deleted = get_table_state()
+            locations_version = get_locations_version()
+            if deleted < self.deleted or (deleted == self.deleted and max_id < self.cursor):
+                # Older than the copy; nothing to do
+                return
+
+            self.conn.execute('BEGIN TRANSACTION')
+            try:
+                cursor = self.cursor
+                if deleted != self.deleted:
+                    self.conn.execute('DELETE FROM weather_facts')
+                    cursor = 0
+                if max_id != cursor:
+                    self._load_facts(cursor, max_id)
+
+                if locations_version != self.locations_version:
+                    conn = get_read_connection()
+                    rows = conn.execute('SELECT id, name, region FROM locations').fetchall()
+                    conn.close()
+                    self.conn.execute('DELETE FROM locations')
+                    if rows:
+                        self.conn.executemany('INSERT INTO locations VALUES (?, ?, ?)', [tuple(r) for r in rows])
+                self.conn.execute('COMMIT')
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+            self.cursor, self.deleted = max_id, deleted
+            self.locations_version = locations_version
+            self.token = token
+
+    def _load_facts(self, after_id: int, up_to_id: int):
+        import numpy as np
+        import pandas as pd
+
+        conn = get_read_connection()
+        conn.row_factory = None
+        cursor = conn.execute('''
+            SELECT id, location_id, min_temp, max_temp, current_temp, created_ts
+            FROM weather_facts WHERE id > ? AND id <= ? ORDER BY id
+        ''', (after_id, up_to_id))
+        names = [d[0] for d in cursor.description]
+        while True:
+            rows = cursor.fetchmany(ANALYTICS_LOAD_CHUNK)
+            if not rows:
+                break
+            # One float64 matrix per chunk (NULL becomes NaN, which DuckDB
+            # reads back as NULL); integer columns are cast on insert
+            values = np.array(rows, dtype=np.float64)
+            chunk = pd.DataFrame({name: values[:, i] for i, name in enumerate(names)}, copy=False)
+            self.conn.register('chunk', chunk)
+            self.conn.execute('INSERT INTO weather_facts SELECT * FROM chunk')
+            self.conn.unregister('chunk')
+        conn.close()
+
+
+_analytics_copy: Optional[_AnalyticsCopy] = None
+_analytics_copy_lock = threading.Lock()
+_analytics_copy_thread: Optional[threading.Thread] = None
+
+
+def _build_analytics_copy() -> _AnalyticsCopy:
+    """
+    Get the process-wide DuckDB copy, building it on first use
+    """
+    global _analytics_copy
+
+    if not DUCKDB_AVAILABLE:
+        raise RuntimeError("DuckDB is not installed (pip install duckdb)")
+    with _analytics_copy_lock:
+        if _analytics_copy is None:
+            copy = _AnalyticsCopy()
+            copy.sync()
+            _analytics_copy = copy
+        return _analytics_copy
+
+
+def warm_analytics_copy():
+    """
+    Start building the DuckDB copy in a background thread (idempotent)
+    """
+    global _analytics_copy_thread
+
+    def build():
+        try:
+            _build_analytics_copy()
+        except Exception as e:
+            print(f"[ERROR] Error building analytics copy: {e}")
+
+    with _analytics_copy_lock:
+        if _analytics_copy is not None or _analytics_copy_thread is not None:
+            return
+        _analytics_copy_thread = threading.Thread(target=build, name='analytics-copy', daemon=True)
+        _analytics_copy_thread.start()
+
+
+@contextmanager
+def analytics_cursor() -> Iterator:
+    """
+    DuckDB cursor over an up-to-date in-memory copy of the facts
+
+    The copy is built on first use in each process (blocking); later calls
+    only copy rows appended since.
+    """
+    copy = _build_analytics_copy()
+    copy.sync()
+    cursor = copy.conn.cursor()
+    try:
+        yield cursor
+    finally:
+        cursor.close()
+
+
+def _run_analytics(query: str, engine: Optional[str], sql: str, params: tuple = ()) -> List[tuple]:
+    """
+    Run SQL that is valid in both dialects on the engine chosen for the query type
+    """
+    if choose_analytics_engine(query, engine) == 'duckdb':
+        with analytics_cursor() as cursor:
+            return cursor.execute(sql, params).fetchall()
+
+    conn = get_read_connection()
+    conn.row_factory = None
+    rows = conn.execute(sql, params).fetchall()
+    conn.close()
+    return rows
+
+
+def _format_ts(ts, fmt: str = '%Y-%m-%d %H:%M:%S') -> Optional[str]:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).strftime(fmt) if ts is not None else None
+
+
+def _check_temperature_column(column: str):
+    if column not in TEMPERATURE_COLUMNS:
+        raise ValueError(f"Unknown temperature column: {column}")
+
+
+def _duckdb_database_stats() -> Dict:
+    with analytics_cursor() as cursor:
+        total_records, unique_locations, latest_ts, min_temp, max_temp = cursor.execute('''
+            SELECT
+                COUNT(*),
+                COUNT(DISTINCT location_id),
+                MAX(created_ts),
+                MIN(min_temp) FILTER (WHERE min_temp IS NOT NULL AND max_temp IS NOT NULL),
+                MAX(max_temp) FILTER (WHERE min_temp IS NOT NULL AND max_temp IS NOT NULL)
+            FROM weather_facts
+        ''').fetchone()
+
+    return {
+        'total_records': total_records,
+        'unique_locations': unique_locations,
+        'latest_update': _format_ts(latest_ts),
+        'min_temp': min_temp,
+        'max_temp': max_temp
+    }
+
+
+def get_region_means(since_ts: int = 0, period_seconds: int = 86400,
+                     engine: Optional[str] = None) -> List[Dict]:
+    """
+    Get mean temperatures per region and time period (UTC days by default)
+
+    Args:
+        since_ts: Only facts created at or after this Unix timestamp
+        period_seconds: Length of each period in seconds
+        engine: 'sqlite', 'duckdb', or None to choose automatically
+
+    Returns:
+        List of dictionaries ordered by region and period
+    """
+    rows = _run_analytics('region_means', engine, '''
+        SELECT
+            l.region,
+            f.created_ts - f.created_ts % ? AS period_ts,
+            COUNT(*),
+            AVG(f.min_temp),
+            AVG(f.max_temp),
+            AVG(f.current_temp)
+        FROM weather_facts f
+        JOIN locations l ON l.id = f.location_id
+        WHERE f.created_ts >= ?
+        GROUP BY 1, 2
+        ORDER BY 1, 2
+    ''', (period_seconds, since_ts))
+
+    return [
+        {
+            'region': region,
+            'period': _format_ts(period_ts),
+            'records': records,
+            'mean_min_temp': mean_min,
+            'mean_max_temp': mean_max,
+            'mean_current_temp': mean_current,
+        }
+        for region, period_ts, records, mean_min, mean_max, mean_current in rows
+    ]
+
+
+def get_temperature_percentiles(column: str = 'current_temp', percentiles: Tuple[float, ...] = (0.1, 0.5, 0.9),
+                                since_ts: int = 0, engine: Optional[str] = None) -> List[Dict]:
+    """
+    Get temperature percentiles per region
+
+    Percentiles are discrete, as SQL's percentile_disc: the smallest value
+    with at least a fraction p of the values at or below it, i.e. sorted
+    position ceil(p * n) (1-based, at least 1). Both engines compute the
+    position with the same floating-point expression as DuckDB's
+    quantile_disc, so they return the same values.
+
+    Args:
+        column: 'min_temp', 'max_temp' or 'current_temp'
+        percentiles: Fractions between 0 and 1
+        since_ts: Only facts created at or after this Unix timestamp
+        engine: 'sqlite', 'duckdb', or None to choose automatically
+
+    Returns:
+        List of dictionaries with region, count and one 'p<percent>' key per percentile
+    """
+    _check_temperature_column(column)
+    percentiles = tuple(float(p) for p in percentiles)
+    if not percentiles or not all(0.0 <= p <= 1.0 for p in percentiles):
+        raise ValueError("Percentiles must be between 0 and 1")
+
+    if choose_analytics_engine('percentiles', engine) == 'duckdb':
+        with analytics_cursor() as cursor:
+            rows = cursor.execute(f'''
+                SELECT l.region, COUNT(f.{column}), quantile_disc(f.{column}, ?::DOUBLE[])
+                FROM weather_facts f
+                JOIN locations l ON l.id = f.location_id
+                WHERE f.created_ts >= ? AND f.{column} IS NOT NULL
+                GROUP BY 1
+                ORDER BY 1
+            ''', (list(percentiles), since_ts)).fetchall()
+    else:
+        # SQLite has no percentile aggregate; rank within each region instead.
+        # n - floor(n - n * p) is ceil(n * p) written as DuckDB evaluates it
+        picks = ', '.join(
+            f'MIN(CASE WHEN rn = MAX(1, n - CAST(n - n * {p!r} AS INTEGER)) THEN value END)'
+            for p in percentiles
+        )
+        conn = get_read_connection()
+        conn.row_factory = None
+        rows = conn.execute(f'''
+            SELECT region, MAX(n), {picks}
+            FROM (
+                SELECT
+                    l.region AS region,
+                    f.{column} AS value,
+                    ROW_NUMBER() OVER (PARTITION BY l.region ORDER BY f.{column}) AS rn,
+                    COUNT(*) OVER (PARTITION BY l.region) AS n
+                FROM weather_facts f
+                JOIN locations l ON l.id = f.location_id
+                WHERE f.created_ts >= ? AND f.{column} IS NOT NULL
+            )
+            GROUP BY region
+            ORDER BY region
+        ''', (since_ts,)).fetchall()
+        conn.close()
+        rows = [(row[0], row[1], list(row[2:])) for row in rows]
+
+    return [
+        dict({'region': region, 'count': count},
+             **{f'p{p * 100:g}': value for p, value in zip(percentiles, values)})
+        for region, count, values in rows
+    ]
+
+
+def get_rolling_means(window: int = 24, column: str = 'current_temp', location: Optional[str] = None,
+                      since_ts: int = 0, engine: Optional[str] = None) -> List[Dict]:
+    """
+    Get rolling means over each location's last `window` records
+
+    Args:
+        window: Number of records in the window
+        column: 'min_temp', 'max_temp' or 'current_temp'
+        location: One location's full series; None for the latest value of every location
+        since_ts: Only facts created at or after this Unix timestamp
+        engine: 'sqlite', 'duckdb', or None to choose automatically
+
+    Returns:
+        List of dictionaries ordered by location and time
+    """
+    _check_temperature_column(column)
+    window = int(window)
+    if window < 1:
+        raise ValueError("Window must be at least 1 record")
+
+    if location is None:
+        query, location_filter, newest_filter, params = 'rolling', '', 'WHERE newest = 1', (since_ts,)
+    else:
+        query, location_filter, newest_filter, params = 'location_rolling', 'l.name = ? AND ', '', (location, since_ts)
+    rows = _run_analytics(query, engine, f'''
+        SELECT location, created_ts, value, rolling_mean
+        FROM (
+            SELECT
+                l.name AS location,
+                f.created_ts AS created_ts,
+                f.{column} AS value,
+                AVG(f.{column}) OVER (
+                    PARTITION BY f.location_id ORDER BY f.created_ts, f.id
+                    ROWS BETWEEN {window - 1} PRECEDING AND CURRENT ROW
+                ) AS rolling_mean,
+                ROW_NUMBER() OVER (
+                    PARTITION BY f.location_id ORDER BY f.created_ts DESC, f.id DESC
+                ) AS newest
+            FROM weather_facts f
+            JOIN locations l ON l.id = f.location_id
+            WHERE {location_filter}f.created_ts >= ?
+        ) AS ranked
+        {newest_filter}
+        ORDER BY location, created_ts
+    ''', params)
+
+    return [
+        {
+            'location': name,
+            'created_at': _format_ts(created_ts),
+            'value': value,
+            'rolling_mean': rolling_mean,
+        }
+        for name, created_ts, value, rolling_mean in rows
+    ]
+
+
 def main():
     """
     Main function to test database operations
@@ -307,7 +1605,7 @@ def main():
     if records:
         print("\nSample record:")
         record = records[0]
-        for key, value in record.items():
+        for key, value in record._asdict().items():
             print(f"  {key}: {value}")
 
 
@@ -8,6 +8,9 @@ import json
 from datetime import datetime
 from typing import List, Dict, Optional
 
+import archive
+from records import WeatherRecord
+
 
 # CWA API Configuration
 API_URL = "https://opendata.cwa.gov.tw/fileapi/v1/opendataapi/F-A0010-001"
@@ -45,10 +48,13 @@ def get_region(location: str) -> str:
     return '其他'
 
 
-def fetch_weather_data() -> Optional[Dict]:
+def fetch_weather_data(archive_raw: bool = True) -> Optional[Dict]:
     """
     Fetch weather data from CWA API
     
+    Args:
+        archive_raw: Keep the raw response in the payload archive
+        
     Returns:
         JSON data from API or None if request fails
     """
@@ -65,6 +71,10 @@ def fetch_weather_data() -> Optional[Dict]:
         
         data = response.json()
         print(f"[OK] Successfully fetched weather data")
+        
+        if archive_raw:
+            archive_payload(response.content)
+        
         return data
         
     except requests.exceptions.RequestException as e:
@@ -75,7 +85,21 @@ def fetch_weather_data() -> Optional[Dict]:
         return None
 
 
-def parse_weather_data(data: Dict) -> List[Dict]:
+def archive_payload(raw: bytes):
+    """
+    Store a raw response in the payload archive and apply retention
+    
+    Archive failures are reported but never fail the fetch.
+    """
+    try:
+        digest = archive.store_payload(raw)
+        archive.evict()
+        print(f"[OK] Archived raw payload {digest[:12]}")
+    except Exception as e:
+        print(f"[ERROR] Error archiving raw payload: {e}")
+
+
+def parse_weather_data(data: Dict) -> List[WeatherRecord]:
     """
     Parse weather data and extract relevant information
     
@@ -83,7 +107,7 @@ def parse_weather_data(data: Dict) -> List[Dict]:
         data: Raw JSON data from API
         
     Returns:
-        List of weather records with location, temperature, and description
+        List of WeatherRecord with location, temperature, and description
     """
     weather_records = []
     
@@ -161,15 +185,15 @@ def parse_weather_data(data: Dict) -> List[Dict]:
                 current_temp = None
             
             # Create weather record
-            record = {
-                'location': location_name,
-                'region': region,
-                'min_temp': min_temp,
-                'max_temp': max_temp,
-                'current_temp': current_temp,
-                'description': description or '未提供',
-                'forecast_time': forecast_time or datetime.now().isoformat()
-            }
+            record = WeatherRecord(
+                location=location_name,
+                region=region,
+                min_temp=min_temp,
+                max_temp=max_temp,
+                current_temp=current_temp,
+                description=description or '未提供',
+                forecast_time=forecast_time or datetime.now().isoformat()
+            )
             
             weather_records.append(record)
             print(f"  [OK] {location_name} ({region}): {min_temp}°C - {max_temp}°C")
@@ -204,10 +228,10 @@ def main():
             print(f"Sample Records:")
             print(f"{'='*60}")
             for record in records[:5]:
-                print(f"Location: {record['location']}")
-                print(f"Region: {record['region']}")
-                print(f"Temperature: {record['min_temp']}°C - {record['max_temp']}°C")
-                print(f"Description: {record['description']}")
+                print(f"Location: {record.location}")
+                print(f"Region: {record.region}")
+                print(f"Temperature: {record.min_temp}°C - {record.max_temp}°C")
+                print(f"Description: {record.description}")
                 print(f"-" * 60)
         else:
             print("No records parsed")
@@ -0,0 +1,81 @@
+"""
+File Publishing Helpers
+Atomic, crash-safe file writes and pruning of versioned files
+
+Snapshots, replicas and archived payloads are published by writing a new
+file next to the target and renaming it into place. The data is fsynced
+before the rename, so after a crash a name points either at the old file
+or at the complete new one, never at a truncated file.
+"""
+
+import os
+import tempfile
+import time
+from typing import Callable, List, Tuple
+
+
+# Rename retries while a reader briefly holds the target open (Windows)
+REPLACE_ATTEMPTS = 20
+REPLACE_RETRY_DELAY = 0.05
+
+
+def write_atomic(path: str, write: Callable):
+    """
+    Write a file through a temporary file in the same directory and rename it into place
+
+    Args:
+        path: Target file
+        write: Called with the open binary temporary file
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix='.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        _replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _replace(tmp_path: str, path: str):
+    """
+    os.replace(), retried while a reader briefly holds the target open (Windows)
+    """
+    for attempt in range(REPLACE_ATTEMPTS):
+        try:
+            os.replace(tmp_path, path)
+            return
+        except PermissionError:
+            if attempt == REPLACE_ATTEMPTS - 1:
+                raise
+            time.sleep(REPLACE_RETRY_DELAY)
+
+
+def prune_versions(directory: str, names: List[str], current: str, keep: int) -> List[Tuple[str, OSError]]:
+    """
+    Delete all but the newest `keep` versioned files (never the current one)
+
+    Args:
+        directory: Directory holding the files
+        names: Candidate file names in that directory
+        current: Name of the file now in use
+        keep: Files kept, counting the current one
+
+    Returns:
+        (name, error) for each file that could not be removed, e.g. one a
+        reader still maps on Windows; a later prune tries again
+    """
+    names = [name for name in names if name != current]
+    names.sort(key=lambda name: os.path.getmtime(os.path.join(directory, name)), reverse=True)
+    failed = []
+    for name in names[keep - 1:]:
+        try:
+            os.remove(os.path.join(directory, name))
+        except OSError as e:
+            failed.append((name, e))
+    return failed
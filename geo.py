@@ -0,0 +1,321 @@
+"""
+Geography Module
+Location coordinates and spatial queries over the locations dimension
+"""
+
+import heapq
+import math
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import database
+
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+# (min_lat, min_lon, max_lat, max_lon) covering Taiwan and the outlying islands
+TAIWAN_BBOX = (21.8, 118.2, 26.4, 122.1)
+
+# Aim for about this many points per grid cell
+POINTS_PER_CELL = 4
+
+# Seconds between checks of the locations version (a scan of the table)
+VERSION_CHECK_INTERVAL = 1.0
+
+
+# Taiwan city coordinates (latitude, longitude)
+# Seeds the locations dimension; short and suffixed names map to the same point
+CITY_COORDINATES = {
+    # 北部
+    '臺北': (25.0330, 121.5654),
+    '臺北市': (25.0330, 121.5654),
+    '新北': (25.0120, 121.4654),
+    '新北市': (25.0120, 121.4654),
+    '基隆': (25.1276, 121.7392),
+    '基隆市': (25.1276, 121.7392),
+    '桃園': (24.9936, 121.3010),
+    '桃園市': (24.9936, 121.3010),
+    '新竹': (24.8138, 120.9675),
+    '新竹市': (24.8138, 120.9675),
+    '新竹縣': (24.8387, 121.0177),
+    '宜蘭': (24.7021, 121.7378),
+    '宜蘭縣': (24.7021, 121.7378),
+    
+    # 中部
+    '苗栗': (24.5602, 120.8214),
+    '苗栗縣': (24.5602, 120.8214),
+    '臺中': (24.1477, 120.6736),
+    '臺中市': (24.1477, 120.6736),
+    '彰化': (24.0518, 120.5161),
+    '彰化縣': (24.0518, 120.5161),
+    '南投': (23.9609, 120.9719),
+    '南投縣': (23.9609, 120.9719),
+    '雲林': (23.7092, 120.4313),
+    '雲林縣': (23.7092, 120.4313),
+    
+    # 南部
+    '嘉義': (23.4800, 120.4491),
+    '嘉義市': (23.4800, 120.4491),
+    '嘉義縣': (23.4518, 120.2554),
+    '臺南': (22.9998, 120.2269),
+    '臺南市': (22.9998, 120.2269),
+    '高雄': (22.6273, 120.3014),
+    '高雄市': (22.6273, 120.3014),
+    '屏東': (22.6820, 120.4950),
+    '屏東縣': (22.6820, 120.4950),
+    
+    # 東部
+    '花蓮': (23.9871, 121.6015),
+    '花蓮縣': (23.9871, 121.6015),
+    '臺東': (22.7972, 121.0713),
+    '臺東縣': (22.7972, 121.0713),
+    
+    # 離島
+    '澎湖': (23.5711, 119.5793),
+    '澎湖縣': (23.5711, 119.5793),
+    '金門': (24.4491, 118.3765),
+    '金門縣': (24.4491, 118.3765),
+    '連江': (26.1605, 119.9512),
+    '連江縣': (26.1605, 119.9512),
+    '馬祖': (26.1605, 119.9512),
+}
+
+
+def lookup_coordinates(location: str) -> Optional[Tuple[float, float]]:
+    """
+    Find coordinates for a location name in CITY_COORDINATES
+
+    Args:
+        location: Location name (e.g. 臺北市, 臺北)
+
+    Returns:
+        (latitude, longitude) or None if unknown
+    """
+    if location in CITY_COORDINATES:
+        return CITY_COORDINATES[location]
+
+    # Try partial match (remove 市/縣 suffix)
+    stem = location.replace('市', '').replace('縣', '')
+    if not stem:
+        # A bare suffix (or empty name) would be a substring of every key
+        return None
+    for key, coords in CITY_COORDINATES.items():
+        if stem in key or key in location:
+            return coords
+    return None
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """
+    Great-circle distance between two points in kilometres
+    """
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class SpatialIndex:
+    """
+    Uniform grid bucketing over latitude/longitude points
+
+    Points are hashed into square cells sized for a few points each. Nearest
+    neighbour queries scan rings of cells outward from the query cell and
+    stop once no unvisited ring can hold a closer point.
+    """
+
+    def __init__(self, points: List[Dict], cell_size: Optional[float] = None):
+        """
+        Args:
+            points: Location dicts with 'latitude' and 'longitude' keys
+            cell_size: Cell edge in degrees (default: sized from point density)
+        """
+        self.points = [p for p in points if p.get('latitude') is not None and p.get('longitude') is not None]
+        self.cells: Dict[Tuple[int, int], List[int]] = {}
+
+        if not self.points:
+            self.cell_size = cell_size or 1.0
+            self.max_ring = 0
+            self.min_cos = 1.0
+            return
+
+        lats = [p['latitude'] for p in self.points]
+        lons = [p['longitude'] for p in self.points]
+        if cell_size is None:
+            area = max(max(lats) - min(lats), 0.01) * max(max(lons) - min(lons), 0.01)
+            cell_size = math.sqrt(area * POINTS_PER_CELL / len(self.points))
+        self.cell_size = cell_size
+
+        for i, (lat, lon) in enumerate(zip(lats, lons)):
+            self.cells.setdefault(self._cell(lat, lon), []).append(i)
+
+        rows = [cell[0] for cell in self.cells]
+        cols = [cell[1] for cell in self.cells]
+        self.bounds = (min(rows), min(cols), max(rows), max(cols))
+        self.max_ring = max(self.bounds[2] - self.bounds[0], self.bounds[3] - self.bounds[1])
+        # Longitude degrees shrink with latitude; use the worst case as a lower bound
+        self.min_cos = math.cos(math.radians(min(89.0, max(abs(min(lats)), abs(max(lats))))))
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return (math.floor(lat / self.cell_size), math.floor(lon / self.cell_size))
+
+    def _ring(self, row: int, col: int, radius: int):
+        """
+        Yield the point indices in cells at Chebyshev distance radius
+        """
+        if radius == 0:
+            yield from self.cells.get((row, col), ())
+            return
+        for dc in range(-radius, radius + 1):
+            yield from self.cells.get((row - radius, col + dc), ())
+            yield from self.cells.get((row + radius, col + dc), ())
+        for dr in range(-radius + 1, radius):
+            yield from self.cells.get((row + dr, col - radius), ())
+            yield from self.cells.get((row + dr, col + radius), ())
+
+    def nearest(self, lat: float, lon: float, k: int = 5) -> List[Tuple[float, Dict]]:
+        """
+        Find the k points closest to (lat, lon)
+
+        Returns:
+            List of (distance_km, point) sorted by distance
+        """
+        if not self.points or k <= 0:
+            return []
+
+        row, col = self._cell(lat, lon)
+        # Rings needed to reach the grid from a query outside it, plus its extent
+        far = max(self.bounds[0] - row, row - self.bounds[2], self.bounds[1] - col, col - self.bounds[3], 0)
+        min_cos = min(self.min_cos, math.cos(math.radians(min(89.0, abs(lat)))))
+
+        best: List[Tuple[float, int]] = []  # max-heap of (-distance, index)
+        for radius in range(far + self.max_ring + 1):
+            for i in self._ring(row, col, radius):
+                point = self.points[i]
+                distance = haversine_km(lat, lon, point['latitude'], point['longitude'])
+                if len(best) < k:
+                    heapq.heappush(best, (-distance, i))
+                elif distance < -best[0][0]:
+                    heapq.heapreplace(best, (-distance, i))
+
+            # Anything beyond this ring is at least radius cells away
+            if len(best) == k:
+                bound_km = radius * self.cell_size * KM_PER_DEGREE * min_cos
+                if bound_km >= -best[0][0]:
+                    break
+
+        return [(-d, self.points[i]) for d, i in sorted(best, reverse=True)]
+
+    def in_bbox(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> List[Dict]:
+        """
+        Find all points inside a latitude/longitude bounding box (inclusive)
+        """
+        if not self.points:
+            return []
+
+        row0, col0 = self._cell(min_lat, min_lon)
+        row1, col1 = self._cell(max_lat, max_lon)
+        row0, col0 = max(row0, self.bounds[0]), max(col0, self.bounds[1])
+        row1, col1 = min(row1, self.bounds[2]), min(col1, self.bounds[3])
+
+        results = []
+        for row in range(row0, row1 + 1):
+            for col in range(col0, col1 + 1):
+                for i in self.cells.get((row, col), ()):
+                    point = self.points[i]
+                    if min_lat <= point['latitude'] <= max_lat and min_lon <= point['longitude'] <= max_lon:
+                        results.append(point)
+        return results
+
+
+_index: Optional[SpatialIndex] = None
+_index_version = None
+_index_checked_at = 0.0
+_index_lock = threading.Lock()
+
+
+def get_spatial_index() -> SpatialIndex:
+    """
+    Get the process-wide spatial index over the locations dimension
+
+    The locations version is checked at most every VERSION_CHECK_INTERVAL
+    seconds and the index is rebuilt when locations are added or moved.
+    """
+    global _index, _index_version, _index_checked_at
+
+    if _index is not None and time.monotonic() - _index_checked_at < VERSION_CHECK_INTERVAL:
+        return _index
+
+    with _index_lock:
+        version = database.get_locations_version()
+        if _index is None or _index_version != version:
+            _index = SpatialIndex(database.get_locations())
+            _index_version = version
+        _index_checked_at = time.monotonic()
+        return _index
+
+
+def get_locations_version() -> Tuple[int, int, float, float]:
+    """
+    Locations version the current spatial index was built from
+
+    Checked at the same interval as get_spatial_index(), so callers can key
+    caches of coordinate-derived data on it without an extra query.
+    """
+    get_spatial_index()
+    return _index_version
+
+
+def invalidate_spatial_index():
+    """
+    Force the next spatial query to rebuild the index
+    """
+    global _index
+    with _index_lock:
+        _index = None
+
+
+def nearest_locations(lat: float, lon: float, k: int = 5) -> List[Dict]:
+    """
+    Find the k locations closest to a coordinate
+
+    Args:
+        lat: Latitude
+        lon: Longitude
+        k: Number of locations to return
+
+    Returns:
+        Location dicts (name, region, latitude, longitude) with distance_km,
+        closest first
+    """
+    return [
+        dict(point, distance_km=round(distance, 3))
+        for distance, point in get_spatial_index().nearest(lat, lon, k)
+    ]
+
+
+def locations_in_bbox(min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> List[Dict]:
+    """
+    Find all locations inside a bounding box
+
+    Returns:
+        Location dicts (name, region, latitude, longitude)
+    """
+    return get_spatial_index().in_bbox(min_lat, min_lon, max_lat, max_lon)
+
+
+def get_coordinates_map() -> Dict[str, Tuple[float, float]]:
+    """
+    Map location names to (latitude, longitude) for all located locations
+    """
+    return {
+        point['name']: (point['latitude'], point['longitude'])
+        for point in get_spatial_index().points
+    }
@@ -0,0 +1,216 @@
+"""
+Temperature Heatmap Module
+Interpolated temperature surface over Taiwan for the dashboard map
+"""
+
+import math
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import geo
+
+
+# Temperature colour bins shared with the dashboard markers and table:
+# a value below TEMPERATURE_BIN_EDGES[i] gets TEMPERATURE_BIN_COLORS[i]
+TEMPERATURE_BIN_EDGES = [10, 15, 20, 25, 28, 32, 35]
+TEMPERATURE_BIN_COLORS = [
+    '#0066CC',  # Dark blue (very cold)
+    '#3399FF',  # Blue (cold)
+    '#66CCFF',  # Light blue (cool)
+    '#99FF99',  # Light green (comfortable)
+    '#FFFF66',  # Yellow (warm)
+    '#FFCC33',  # Orange (hot)
+    '#FF6633',  # Dark orange (very hot)
+    '#CC0000',  # Red (extremely hot)
+]
+MISSING_COLOR = '#CCCCCC'
+
+# Grid cells farther than this from every station are left empty (sea)
+MAX_DISTANCE_KM = 35.0
+IDW_POWER = 2.0
+# Grid points per batch, bounding the (points x stations) distance matrix
+CHUNK_SIZE = 4096
+CACHE_SIZE = 8
+
+
+def temperature_color(temp: Optional[float]) -> str:
+    """
+    Get the bin colour for a temperature value
+    """
+    if temp is None or temp != temp:
+        return MISSING_COLOR
+    return TEMPERATURE_BIN_COLORS[bisect_right(TEMPERATURE_BIN_EDGES, temp)]
+
+
+def interpolate_idw(station_lats, station_lons, values, grid_lats, grid_lons,
+                    power: float = IDW_POWER, max_distance_km: Optional[float] = MAX_DISTANCE_KM):
+    """
+    Inverse-distance-weighted interpolation onto a regular lat/lon grid
+
+    Distances use an equirectangular projection, which is accurate at the
+    scale of Taiwan. Grid points are processed in batches of CHUNK_SIZE so
+    memory stays bounded as the station count grows.
+
+    Args:
+        station_lats, station_lons, values: 1-D arrays of station data
+        grid_lats, grid_lons: 1-D grid axes
+        power: IDW distance exponent
+        max_distance_km: Blank out grid points farther than this from any station
+
+    Returns:
+        float32 array of shape (len(grid_lats), len(grid_lons)), NaN where blank
+    """
+    import numpy as np
+
+    station_lats = np.asarray(station_lats, dtype=np.float64)
+    station_lons = np.asarray(station_lons, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    grid_lats = np.asarray(grid_lats, dtype=np.float64)
+    grid_lons = np.asarray(grid_lons, dtype=np.float64)
+
+    shape = (len(grid_lats), len(grid_lons))
+    result = np.full(shape[0] * shape[1], np.nan, dtype=np.float32)
+    if len(values) == 0:
+        return result.reshape(shape)
+
+    x_scale = geo.KM_PER_DEGREE * math.cos(math.radians(float(grid_lats.mean())))
+    station_y = station_lats * geo.KM_PER_DEGREE
+    station_x = station_lons * x_scale
+    points_y = np.repeat(grid_lats * geo.KM_PER_DEGREE, shape[1])
+    points_x = np.tile(grid_lons * x_scale, shape[0])
+    max_d2 = None if max_distance_km is None else max_distance_km ** 2
+
+    for start in range(0, len(points_y), CHUNK_SIZE):
+        stop = start + CHUNK_SIZE
+        dy = points_y[start:stop, None] - station_y[None, :]
+        dx = points_x[start:stop, None] - station_x[None, :]
+        d2 = dy * dy + dx * dx
+
+        # Grid points sitting on a station take its value exactly
+        np.maximum(d2, 1e-12, out=d2)
+        weights = 1.0 / d2 if power == 2 else np.power(d2, -power / 2)
+        chunk = (weights @ values) / weights.sum(axis=1)
+        if max_d2 is not None:
+            chunk[d2.min(axis=1) > max_d2] = np.nan
+        result[start:stop] = chunk
+
+    return result.reshape(shape)
+
+
+class HeatmapLayer:
+    """
+    A rendered temperature surface ready to be drawn as a map trace
+    """
+
+    __slots__ = ('version', 'resolution', 'grid', 'lats', 'lons', 'temps', 'colors')
+
+    def __init__(self, version: str, resolution: float, grid, lats: List[float],
+                 lons: List[float], temps: List[float], colors: List[str]):
+        self.version = version
+        self.resolution = resolution
+        self.grid = grid
+        self.lats = lats
+        self.lons = lons
+        self.temps = temps
+        self.colors = colors
+
+    def __len__(self) -> int:
+        return len(self.temps)
+
+    def trace_kwargs(self) -> Dict:
+        """
+        Keyword arguments for a plotly Scattergeo trace drawing the surface
+        """
+        return dict(
+            lat=self.lats,
+            lon=self.lons,
+            mode='markers',
+            marker=dict(
+                symbol='square',
+                size=max(2.0, self.resolution * 160),
+                color=self.colors,
+                opacity=0.45,
+                line=dict(width=0),
+            ),
+            customdata=self.temps,
+            hovertemplate='%{customdata:.1f}°C<extra></extra>',
+            name='溫度分布面',
+            showlegend=False,
+        )
+
+
+def build_heatmap_layer(weather_snapshot, resolution: float) -> HeatmapLayer:
+    """
+    Interpolate the snapshot's station temperatures over the Taiwan grid
+
+    Args:
+        weather_snapshot: snapshot.WeatherSnapshot
+        resolution: Grid spacing in degrees
+
+    Returns:
+        HeatmapLayer with one entry per non-empty grid cell
+    """
+    import numpy as np
+
+    current = np.frombuffer(weather_snapshot.current_temp, dtype=np.float32)
+    mean = (np.frombuffer(weather_snapshot.min_temp, dtype=np.float32)
+            + np.frombuffer(weather_snapshot.max_temp, dtype=np.float32)) / 2
+    temps = np.where(np.isnan(current), mean, current)
+
+    coordinates = geo.get_coordinates_map()
+    rows, lats, lons = [], [], []
+    for i, location in enumerate(weather_snapshot.locations):
+        coords = coordinates.get(location)
+        if coords is not None and not np.isnan(temps[i]):
+            rows.append(i)
+            lats.append(coords[0])
+            lons.append(coords[1])
+
+    min_lat, min_lon, max_lat, max_lon = geo.TAIWAN_BBOX
+    grid_lats = np.arange(min_lat, max_lat + resolution / 2, resolution)
+    grid_lons = np.arange(min_lon, max_lon + resolution / 2, resolution)
+    grid = interpolate_idw(lats, lons, temps[rows], grid_lats, grid_lons)
+
+    # Colour all cells in one pass with the same bins as temperature_color()
+    filled = ~np.isnan(grid)
+    bins = np.searchsorted(TEMPERATURE_BIN_EDGES, grid[filled], side='right')
+    cell_lats, cell_lons = np.meshgrid(grid_lats, grid_lons, indexing='ij')
+    return HeatmapLayer(
+        weather_snapshot.version,
+        resolution,
+        grid,
+        np.round(cell_lats[filled], 4).tolist(),
+        np.round(cell_lons[filled], 4).tolist(),
+        np.round(grid[filled].astype(np.float64), 1).tolist(),
+        [TEMPERATURE_BIN_COLORS[b] for b in bins.tolist()],
+    )
+
+
+_layers: "OrderedDict[Tuple[str, float, tuple], HeatmapLayer]" = OrderedDict()
+_layers_lock = threading.Lock()
+
+
+def get_heatmap_layer(weather_snapshot, resolution: float = 0.05) -> HeatmapLayer:
+    """
+    Get the surface for a snapshot, computing it once per data version and resolution
+
+    Station coordinates can change without new facts (upsert_locations),
+    so the locations version is part of the key too.
+
+    Returns:
+        Shared HeatmapLayer (read-only)
+    """
+    key = (weather_snapshot.version, resolution, geo.get_locations_version())
+    with _layers_lock:
+        layer = _layers.get(key)
+        if layer is not None:
+            _layers.move_to_end(key)
+            return layer
+
+        layer = build_heatmap_layer(weather_snapshot, resolution)
+        _layers[key] = layer
+        if len(_layers) > CACHE_SIZE:
+            _layers.popitem(last=False)
+        return layer
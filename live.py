@@ -0,0 +1,165 @@
+"""
+Live Update Module
+Process-wide watcher that notices ingests and pre-warms shared caches
+
+One background thread per process checks a cheap change token (file
+metadata, no query). Only when that changes does it read the data
+version, rebuild the shared snapshot and default render payloads, and
+bump a generation counter. Dashboard sessions poll the counter from a
+small status fragment, so an idle viewer costs no query and no page rerun.
+"""
+
+import threading
+import time
+from typing import Dict, List, Optional
+
+import database
+
+
+# Seconds between change-token checks in the watcher thread
+POLL_INTERVAL = 1.0
+# Seconds between generation checks in each live dashboard session
+SESSION_POLL_INTERVAL = 2.0
+# Render payloads warmed for every new data version
+WARM_RESOLUTION = 0.05
+
+
+class LiveWatcher:
+    """
+    Background thread publishing a generation number that changes after each ingest
+    """
+
+    def __init__(self, poll_interval: float = POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self.generation = 0
+        self.version: Optional[str] = None
+        self.updated_at: Optional[float] = None
+        self._token = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """
+        Start the watcher thread if it is not running yet
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self.check()
+            self._thread = threading.Thread(target=self._run, name='live-watcher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                self.check()
+            except Exception as e:
+                print(f"[ERROR] Error checking for new data: {e}")
+
+    def check(self) -> bool:
+        """
+        Check for new data once; publish a new generation if the data changed
+
+        Returns:
+            True if a new generation was published
+        """
+        token = database.get_change_token()
+        if token == self._token:
+            return False
+
+        version = database.get_data_version()
+        if version == self.version:
+            self._token = token
+            return False
+
+        warm_caches()
+        # Consumed only once the caches are warm, so a failed check is retried
+        self._token = token
+        self.version = version
+        self.updated_at = time.time()
+        self.generation += 1
+        return True
+
+
+def warm_caches():
+    """
+    Build the shared per-version caches once, before sessions ask for them
+    """
+    import heatmap
+    import render
+    import snapshot
+    import verification
+
+    weather_snapshot = snapshot.get_snapshot()
+    if weather_snapshot:
+        surface = heatmap.get_heatmap_layer(weather_snapshot, WARM_RESOLUTION)
+        render.get_region_payload(weather_snapshot, render.ALL_REGIONS, surface)
+        get_recent_alerts(weather_snapshot.version)
+    verification.get_accuracy_report()
+
+
+_watcher = LiveWatcher()
+
+
+def start():
+    """
+    Start the process-wide watcher (idempotent)
+    """
+    _watcher.start()
+
+
+def generation() -> int:
+    """
+    Current data generation; changes after each ingest once the watcher runs
+    """
+    return _watcher.generation
+
+
+def last_update() -> Optional[float]:
+    """
+    Time the watcher last saw new data (Unix timestamp)
+    """
+    return _watcher.updated_at
+
+
+_stats: Optional[Dict] = None
+_stats_version: Optional[str] = None
+_stats_lock = threading.Lock()
+
+
+def get_database_stats(version: str) -> Dict:
+    """
+    database.get_database_stats(), computed once per data version
+    """
+    global _stats, _stats_version
+
+    with _stats_lock:
+        if _stats_version != version:
+            _stats = database.get_database_stats()
+            _stats_version = version
+        return _stats
+
+
+# Alerts shown on the dashboard
+ALERT_LIMIT = 100
+
+_alerts: List[Dict] = []
+_alerts_version: Optional[str] = None
+_alerts_lock = threading.Lock()
+
+
+def get_recent_alerts(version: str) -> List[Dict]:
+    """
+    database.get_recent_alerts(), read once per data version
+
+    Alerts are written in the same transaction as the facts that raise
+    them, so the data version also versions the alerts table.
+    """
+    global _alerts, _alerts_version
+
+    with _alerts_lock:
+        if _alerts_version != version:
+            _alerts = database.get_recent_alerts(ALERT_LIMIT)
+            _alerts_version = version
+        return _alerts
@@ -5,6 +5,8 @@ Orchestrates the complete weather data pipeline: fetch → parse → store
 
 import fetch_weather
 import database
+import replica
+import snapshot
 
 
 def main():
@@ -45,6 +47,12 @@ def main():
         print(f"  - Records stored: {success_count}")
         print(f"{'='*60}")
         
+        # Publish the latest snapshot for dashboard processes to map
+        snapshot.publish_snapshot()
+        
+        # Distribute a read-only copy to dashboard replicas, if configured
+        replica.publish_configured()
+        
         # Display statistics
         print("\nDatabase Statistics:")
         stats = database.get_database_stats()
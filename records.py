@@ -0,0 +1,110 @@
+"""
+Weather Record Model
+Compact typed record passed through the pipeline: parse → store → query
+"""
+
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Union
+
+
+class WeatherRecord(NamedTuple):
+    """
+    One weather observation for one location
+
+    Field order matches the columns of the weather view, so database rows
+    map onto records positionally. id and created_at are None until the
+    record has been stored.
+    """
+
+    id: Optional[int] = None
+    location: Optional[str] = None
+    region: Optional[str] = None
+    min_temp: Optional[float] = None
+    max_temp: Optional[float] = None
+    current_temp: Optional[float] = None
+    description: Optional[str] = None
+    forecast_time: Optional[str] = None
+    created_at: Optional[str] = None
+
+
+FIELDS = WeatherRecord._fields
+
+# Column list for SELECTs that are mapped onto WeatherRecord
+SELECT_COLUMNS = ', '.join(FIELDS)
+
+_make = WeatherRecord._make
+
+
+def as_record(record: Union[WeatherRecord, Dict]) -> WeatherRecord:
+    """
+    Accept a WeatherRecord or a legacy record dictionary
+    """
+    if isinstance(record, WeatherRecord):
+        return record
+    return WeatherRecord(**{field: record.get(field) for field in FIELDS})
+
+
+def from_rows(rows: Iterable[Sequence]) -> List[WeatherRecord]:
+    """
+    Map rows selected with SELECT_COLUMNS onto records
+    """
+    return list(map(_make, rows))
+
+
+def to_dicts(records: Iterable[WeatherRecord]) -> List[Dict]:
+    """
+    Convert records to dictionaries, e.g. for JSON serialization
+    """
+    return [dict(zip(FIELDS, record)) for record in records]
+
+
+def to_columns(records: Sequence[WeatherRecord]) -> Dict[str, tuple]:
+    """
+    Transpose records into one tuple per field
+
+    Returns:
+        Dictionary of field name -> column values
+    """
+    if not records:
+        return {field: () for field in FIELDS}
+    return dict(zip(FIELDS, zip(*records)))
+
+
+def from_columns(columns: Dict[str, Sequence]) -> List[WeatherRecord]:
+    """
+    Build records from per-field columns; missing fields are None
+
+    Args:
+        columns: Dictionary of field name -> equal-length sequences
+    """
+    length = max((len(values) for values in columns.values()), default=0)
+    missing = (None,) * length
+    return list(map(_make, zip(*(columns.get(field, missing) for field in FIELDS))))
+
+
+def to_frame(records: Sequence[WeatherRecord]):
+    """
+    Build a pandas DataFrame with one column per field
+
+    Temperatures become float64 columns with NaN for missing values.
+    """
+    import pandas as pd
+
+    return pd.DataFrame.from_records(records, columns=FIELDS)
+
+
+def from_frame(df) -> List[WeatherRecord]:
+    """
+    Convert a DataFrame with (a subset of) the record fields back to records
+
+    NaN values are converted back to None.
+    """
+    columns = {}
+    for field in FIELDS:
+        if field not in df.columns:
+            continue
+        column = df[field]
+        missing = column.isna()
+        if missing.any():
+            column = column.astype(object).where(~missing, None)
+        columns[field] = column.tolist()
+    return from_columns(columns)
@@ -0,0 +1,213 @@
+"""
+Dashboard Render Payloads
+Finished table and map payloads per data version and region, shared by all sessions
+"""
+
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+import geo
+import heatmap
+import snapshot
+
+
+ALL_REGIONS = '全部'
+REGIONS = [ALL_REGIONS, '北部', '中部', '南部', '東部', '離島']
+TEMPERATURE_COLUMNS = ['最低溫 (°C)', '最高溫 (°C)', '當前溫度 (°C)']
+CACHE_SIZE = 32
+
+
+def temperature_cell_style(value) -> str:
+    """
+    CSS for one temperature cell of the weather table
+    """
+    if value is None or value != value:
+        return ''
+    return f'background-color: {heatmap.temperature_color(float(value))}; color: white; font-weight: bold;'
+
+
+class RegionPayload:
+    """
+    Everything the dashboard draws for one region at one data version
+
+    The table styles are precomputed cell by cell and the map is kept as a
+    finished Plotly figure, so a rerun only looks them up. The figure object
+    (not its dictionary) is kept because st.plotly_chart re-validates a
+    dictionary into a new figure on every call.
+    """
+
+    __slots__ = ('version', 'region', 'table', 'table_styles', 'figure')
+
+    def __init__(self, version: str, region: str, table, table_styles, figure):
+        self.version = version
+        self.region = region
+        self.table = table
+        self.table_styles = table_styles
+        self.figure = figure
+
+    def styled_table(self):
+        """
+        Styler for the table using the precomputed cell styles
+        """
+        styles = self.table_styles
+        return self.table.style.apply(lambda _: styles, axis=None)
+
+
+def _map_points(df) -> List[Tuple]:
+    """
+    Marker data (location, lat, lon, temp, region, description) for located rows
+    """
+    import numpy as np
+
+    current = df['當前溫度 (°C)'].to_numpy(dtype=np.float64)
+    mean = (df['最低溫 (°C)'].to_numpy(dtype=np.float64) + df['最高溫 (°C)'].to_numpy(dtype=np.float64)) / 2
+    temps = np.where(np.isnan(current), mean, current).tolist()
+
+    coordinates = geo.get_coordinates_map()
+    points = []
+    for location, temp, region, description in zip(
+        df['地點'].tolist(), temps, df['地區'].astype(object).tolist(), df['天氣描述'].astype(object).tolist()
+    ):
+        coords = coordinates.get(location)
+        if coords is not None and temp == temp:
+            points.append((location, coords[0], coords[1], temp, region, description))
+    return points
+
+
+def build_map_figure(df, surface: Optional[heatmap.HeatmapLayer] = None,
+                     title: str = "台灣各地溫度分布"):
+    """
+    Build the temperature map as a Plotly figure
+
+    Args:
+        df: Display DataFrame
+        surface: Optional interpolated temperature layer drawn under the markers
+        title: Figure title
+
+    Returns:
+        plotly.graph_objects.Figure, or None if no location has coordinates
+    """
+    import plotly.graph_objects as go
+
+    points = _map_points(df)
+    if not points:
+        return None
+
+    locations, lats, lons, temps, regions, descriptions = zip(*points)
+
+    fig = go.Figure()
+
+    # Add interpolated temperature surface (precomputed per data version)
+    if surface is not None and len(surface):
+        fig.add_trace(go.Scattergeo(**surface.trace_kwargs()))
+
+    # All temperature markers in one trace
+    fig.add_trace(go.Scattergeo(
+        lon=lons,
+        lat=lats,
+        text=[f"{location}<br>{temp:.1f}°C" for location, temp in zip(locations, temps)],
+        mode='markers+text',
+        marker=dict(
+            size=20,
+            color=[heatmap.temperature_color(temp) for temp in temps],
+            line=dict(width=2, color='white')
+        ),
+        textfont=dict(
+            size=10,
+            color='black',
+            family='Arial Black'
+        ),
+        textposition='top center',
+        customdata=list(zip(locations, regions, temps, descriptions)),
+        showlegend=False,
+        hovertemplate="<b>%{customdata[0]}</b><br>" +
+                      "地區: %{customdata[1]}<br>" +
+                      "溫度: %{customdata[2]:.1f}°C<br>" +
+                      "天氣: %{customdata[3]}<extra></extra>"
+    ))
+
+    # Update map layout to focus on Taiwan
+    fig.update_geos(
+        center=dict(lon=120.9, lat=23.7),  # Center on Taiwan
+        projection_scale=25,  # Zoom level
+        visible=True,
+        resolution=50,
+        showcountries=True,
+        countrycolor="lightgray",
+        showcoastlines=True,
+        coastlinecolor="gray",
+        showland=True,
+        landcolor="rgb(243, 243, 243)",
+        showocean=True,
+        oceancolor="rgb(204, 229, 255)",
+        showlakes=False,
+        showrivers=False
+    )
+
+    fig.update_layout(
+        title={
+            'text': title,
+            'x': 0.5,
+            'xanchor': 'center'
+        },
+        height=700,
+        margin=dict(l=0, r=0, t=50, b=0)
+    )
+
+    return fig
+
+
+def build_region_payload(weather_snapshot: snapshot.WeatherSnapshot, region: str,
+                         surface: Optional[heatmap.HeatmapLayer] = None) -> RegionPayload:
+    """
+    Build the table and map payload for one region
+
+    A single region is a row subset of the shared snapshot, so every
+    payload cached under the snapshot's version shows exactly that version.
+    """
+    import pandas as pd
+
+    table = weather_snapshot.to_display_frame()
+    if region == ALL_REGIONS:
+        title = "台灣各地溫度分布"
+    else:
+        table = table[table[snapshot.DISPLAY_COLUMNS['region']] == region].reset_index(drop=True)
+        title = f"台灣各地溫度分布 - {region}"
+
+    table_styles = pd.DataFrame('', index=table.index, columns=table.columns)
+    for column in TEMPERATURE_COLUMNS:
+        table_styles[column] = [temperature_cell_style(value) for value in table[column].tolist()]
+
+    figure = build_map_figure(table, surface, title) if len(table) else None
+    return RegionPayload(weather_snapshot.version, region, table, table_styles, figure)
+
+
+_payloads: "OrderedDict[Tuple[str, str, Optional[float], tuple], RegionPayload]" = OrderedDict()
+_payloads_lock = threading.Lock()
+
+
+def get_region_payload(weather_snapshot: snapshot.WeatherSnapshot, region: str,
+                       surface: Optional[heatmap.HeatmapLayer] = None) -> RegionPayload:
+    """
+    Get the payload for a region, building it once per data version, region and surface
+
+    Map markers are placed from the locations dimension, so the key also
+    carries its version, as in heatmap.get_heatmap_layer().
+
+    Returns:
+        Shared RegionPayload (read-only)
+    """
+    key = (weather_snapshot.version, region, surface.resolution if surface is not None else None,
+           geo.get_locations_version())
+    with _payloads_lock:
+        payload = _payloads.get(key)
+        if payload is not None:
+            _payloads.move_to_end(key)
+            return payload
+
+        payload = build_region_payload(weather_snapshot, region, surface)
+        _payloads[key] = payload
+        if len(_payloads) > CACHE_SIZE:
+            _payloads.popitem(last=False)
+        return payload
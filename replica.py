@@ -0,0 +1,255 @@
+"""
+Read Replica Distribution
+Publishes consistent read-only copies of the database for dashboard replicas
+
+After each ingest the writer makes one compact, self-contained copy with
+VACUUM INTO (a consistent snapshot taken in a read transaction), stamps
+it with its data version and copies it into every replica directory.
+Replica files are immutable and named by version; a small manifest names
+the current one and is switched with an atomic rename, so readers never
+see a partial file and can open replicas with SQLite's immutable flag
+(no locking, no WAL) even on shared storage.
+
+Layout of a replica directory:
+    CURRENT.json             manifest: current file, version, publish time
+    weather-<max>-<del>.db   immutable replica files (newest few are kept)
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from urllib.request import pathname2url
+
+import database
+import fileutil
+
+
+# Directories replicas are published to by main.py (os.pathsep-separated)
+REPLICA_DIRS = [path for path in os.environ.get('WEATHER_REPLICA_DIRS', '').split(os.pathsep) if path]
+MANIFEST_NAME = 'CURRENT.json'
+# Replica files kept per directory, so readers that just read the manifest can still open theirs
+KEEP_VERSIONS = 3
+
+
+def manifest_path(replica_dir: str) -> str:
+    """
+    Path of the manifest naming the current replica in a directory
+    """
+    return os.path.join(replica_dir, MANIFEST_NAME)
+
+
+def create_replica(path: str) -> Dict:
+    """
+    Write a consistent, compact, read-only copy of the database
+
+    Args:
+        path: Output file (must not exist)
+
+    Returns:
+        Version metadata stored in the copy
+    """
+    conn = database.get_db_connection()
+    conn.execute('VACUUM INTO ?', (path,))
+    conn.close()
+
+    # The version is read from the copy itself, so it matches its contents exactly
+    replica = sqlite3.connect(path)
+    state = replica.execute('''
+        SELECT COALESCE(MAX(id), 0), (SELECT value FROM meta WHERE key = 'deleted_facts')
+        FROM weather_facts
+    ''').fetchone()
+    metadata = {
+        'version': database.format_data_version(state),
+        'max_id': state[0],
+        'deleted': state[1],
+        'row_count': replica.execute('SELECT COUNT(*) FROM weather_facts').fetchone()[0],
+        'published_at': datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S'),
+        'source': os.path.abspath(database.DB_NAME),
+    }
+    replica.execute('CREATE TABLE replica_info (key TEXT PRIMARY KEY, value TEXT)')
+    replica.executemany('INSERT INTO replica_info VALUES (?, ?)', [(k, str(v)) for k, v in metadata.items()])
+    replica.commit()
+    # Readers open the file immutable, which requires a self-contained rollback-journal file
+    replica.execute('PRAGMA journal_mode = DELETE')
+    replica.close()
+    return metadata
+
+
+def read_manifest(replica_dir: str) -> Optional[Dict]:
+    """
+    Read the manifest of a replica directory
+
+    Returns:
+        Manifest dictionary, or None if nothing has been published there
+    """
+    try:
+        with open(manifest_path(replica_dir), 'rb') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _prune(replica_dir: str, current: str):
+    """
+    Delete all but the newest KEEP_VERSIONS replica files (never the current one)
+    """
+    names = [name for name in os.listdir(replica_dir) if name.startswith('weather-') and name.endswith('.db')]
+    for name, e in fileutil.prune_versions(replica_dir, names, current, KEEP_VERSIONS):
+        print(f"[ERROR] Error removing old replica {name}: {e}")
+
+
+def publish_replicas(replica_dirs: List[str]) -> Optional[Dict]:
+    """
+    Publish the current database contents to every replica directory
+
+    The copy is made once and distributed; directories that already hold
+    this version are left alone. A failing directory is reported and
+    skipped so the others still get the update.
+
+    Args:
+        replica_dirs: Target directories (created if missing)
+
+    Returns:
+        Metadata of the published version, or None if publishing failed
+    """
+    fd, staging = tempfile.mkstemp(suffix='.db', prefix='replica_',
+                                   dir=os.path.dirname(os.path.abspath(database.DB_NAME)))
+    os.close(fd)
+    os.remove(staging)
+    try:
+        metadata = create_replica(staging)
+    except sqlite3.Error as e:
+        print(f"[ERROR] Error creating replica: {e}")
+        if os.path.exists(staging):
+            os.remove(staging)
+        return None
+
+    name = f"weather-{metadata['max_id']}-{metadata['deleted']}.db"
+    manifest = dict(metadata, file=name, size=os.path.getsize(staging))
+    published = 0
+    try:
+        for replica_dir in replica_dirs:
+            try:
+                os.makedirs(replica_dir, exist_ok=True)
+                current = read_manifest(replica_dir)
+                if current is not None and current.get('version') == metadata['version']:
+                    continue
+
+                with open(staging, 'rb') as source:
+                    fileutil.write_atomic(os.path.join(replica_dir, name),
+                                          lambda f: shutil.copyfileobj(source, f, 1024 * 1024))
+                fileutil.write_atomic(manifest_path(replica_dir),
+                                      lambda f: f.write(json.dumps(manifest, ensure_ascii=False).encode('utf-8')))
+                _prune(replica_dir, name)
+                published += 1
+            except OSError as e:
+                print(f"[ERROR] Error publishing replica to {replica_dir}: {e}")
+    finally:
+        os.remove(staging)
+
+    print(f"[OK] Published replica {metadata['version']} to {published}/{len(replica_dirs)} directories")
+    return metadata
+
+
+def publish_configured() -> Optional[Dict]:
+    """
+    Publish to REPLICA_DIRS, if configured; called after every write
+
+    Returns:
+        Metadata of the published version, or None if nothing was published
+    """
+    if not REPLICA_DIRS:
+        return None
+    return publish_replicas(REPLICA_DIRS)
+
+
+class ReplicaReader:
+    """
+    Tracks the newest replica in one directory
+
+    The manifest is only re-read when its file metadata changes, so asking
+    for the current replica on every query costs one stat().
+    """
+
+    def __init__(self, replica_dir: str):
+        self.replica_dir = replica_dir
+        self._stat = None
+        self._manifest: Optional[Dict] = None
+        self._lock = threading.Lock()
+
+    def manifest(self) -> Optional[Dict]:
+        """
+        Manifest of the newest published replica, or None if there is none
+        """
+        try:
+            stat = os.stat(manifest_path(self.replica_dir))
+            key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            if key != self._stat:
+                self._manifest = read_manifest(self.replica_dir)
+                self._stat = key
+            return self._manifest
+
+    def connect(self) -> Optional[sqlite3.Connection]:
+        """
+        Open the newest replica read-only, or None if nothing is published yet
+        """
+        manifest = self.manifest()
+        if manifest is None:
+            return None
+        path = os.path.abspath(os.path.join(self.replica_dir, manifest['file']))
+        uri = f"file:{pathname2url(path)}?mode=ro&immutable=1"
+        return sqlite3.connect(uri, uri=True, timeout=database.BUSY_TIMEOUT)
+
+
+_readers: Dict[str, ReplicaReader] = {}
+_readers_lock = threading.Lock()
+
+
+def get_reader(replica_dir: str) -> ReplicaReader:
+    """
+    Get the shared reader for a replica directory
+    """
+    with _readers_lock:
+        reader = _readers.get(replica_dir)
+        if reader is None:
+            reader = _readers[replica_dir] = ReplicaReader(replica_dir)
+        return reader
+
+
+def main():
+    """
+    Publish replicas or show the current replica from the command line
+    """
+    parser = argparse.ArgumentParser(description='Read replica distribution')
+    parser.add_argument('dirs', nargs='*', default=REPLICA_DIRS,
+                        help='replica directories (default: $WEATHER_REPLICA_DIRS)')
+    parser.add_argument('--db', default=database.DB_NAME, help='SQLite database file')
+    parser.add_argument('--status', action='store_true', help='only show the current replica per directory')
+    args = parser.parse_args()
+    if not args.dirs:
+        parser.error('give replica directories or set WEATHER_REPLICA_DIRS')
+
+    database.DB_NAME = args.db
+    if not args.status:
+        publish_replicas(args.dirs)
+
+    for replica_dir in args.dirs:
+        manifest = read_manifest(replica_dir)
+        if manifest is None:
+            print(f"  {replica_dir}: nothing published")
+        else:
+            print(f"  {replica_dir}: {manifest['file']} (version {manifest['version']}, "
+                  f"published {manifest['published_at']}, {manifest['size'] / 1024:.0f} KiB)")
+
+
+if __name__ == "__main__":
+    main()
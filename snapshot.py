@@ -0,0 +1,462 @@
+"""
+Weather Snapshot Module
+Compact, read-only snapshot of the latest weather data shared by all sessions
+"""
+
+import sys
+import json
+import math
+import mmap
+import os
+import threading
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+import database
+import fileutil
+from records import WeatherRecord
+
+
+# Display column names used by the dashboard
+DISPLAY_COLUMNS = {
+    'location': '地點',
+    'region': '地區',
+    'min_temp': '最低溫 (°C)',
+    'max_temp': '最高溫 (°C)',
+    'current_temp': '當前溫度 (°C)',
+    'description': '天氣描述',
+}
+
+_NAN = float('nan')
+
+# Above this many new rows a full rebuild is cheaper than applying changes
+MAX_INCREMENTAL_CHANGES = 10000
+
+# Published snapshot file layout: magic, uint32 header length, JSON header,
+# then one aligned block per column
+SNAPSHOT_FILE_MAGIC = b'WXSNAP2\0'
+SNAPSHOT_FILE_ALIGN = 64
+# Snapshot data files kept, so readers that just read the pointer can still open theirs
+KEEP_VERSIONS = 3
+
+
+class WeatherSnapshot:
+    """
+    Columnar snapshot of the latest record per location
+
+    Strings are interned once (locations) or dictionary-encoded (regions,
+    descriptions) and temperatures are stored as float32 arrays with NaN for
+    missing values. Instances are treated as immutable once built.
+    """
+
+    __slots__ = (
+        'version', 'cursor', 'deleted', 'latest_update', 'locations', 'created_at',
+        'regions', 'region_codes', 'descriptions', 'description_codes',
+        'min_temp', 'max_temp', 'current_temp', '_frame',
+    )
+
+    def __init__(self, state: Tuple[int, int], records: List[WeatherRecord]):
+        self.version = database.format_data_version(state)
+        self.cursor, self.deleted = state
+        self.latest_update = None
+
+        locations = []
+        created = []
+        regions: Dict[str, int] = {}
+        descriptions: Dict[str, int] = {}
+        region_codes = array('h')
+        description_codes = array('h')
+        min_temp = array('f')
+        max_temp = array('f')
+        current_temp = array('f')
+
+        for record in records:
+            locations.append(sys.intern(record.location))
+            region_codes.append(regions.setdefault(record.region or '', len(regions)))
+            description_codes.append(
+                descriptions.setdefault(record.description or '', len(descriptions))
+            )
+            min_temp.append(_to_float(record.min_temp))
+            max_temp.append(_to_float(record.max_temp))
+            current_temp.append(_to_float(record.current_temp))
+
+            created_at = record.created_at
+            created.append(sys.intern(created_at) if created_at else None)
+            if created_at and (self.latest_update is None or created_at > self.latest_update):
+                self.latest_update = created_at
+
+        self.locations = tuple(locations)
+        self.created_at = tuple(created)
+        self.regions = tuple(sys.intern(r) for r in regions)
+        self.region_codes = region_codes
+        self.descriptions = tuple(sys.intern(d) for d in descriptions)
+        self.description_codes = description_codes
+        self.min_temp = min_temp
+        self.max_temp = max_temp
+        self.current_temp = current_temp
+        self._frame = None
+
+    def __len__(self) -> int:
+        return len(self.locations)
+
+    def nbytes(self) -> int:
+        """
+        Approximate memory held by the column buffers (excluding shared strings)
+        """
+        buffers = (self.region_codes, self.description_codes,
+                   self.min_temp, self.max_temp, self.current_temp)
+        return (sum(buf.itemsize * len(buf) for buf in buffers)
+                + sys.getsizeof(self.locations) + sys.getsizeof(self.created_at))
+
+    def to_display_frame(self):
+        """
+        Get the dashboard display DataFrame
+
+        Temperature columns are NumPy views over the snapshot buffers and the
+        string columns are categoricals over the dictionary codes, so no
+        per-row Python objects are created. The frame is built on first use
+        and then shared by every session, so it must not be mutated.
+
+        Returns:
+            pandas DataFrame with display column names
+        """
+        if self._frame is not None:
+            return self._frame
+
+        import numpy as np
+        import pandas as pd
+
+        regions = pd.Categorical.from_codes(
+            np.frombuffer(self.region_codes, dtype=np.int16),
+            categories=pd.Index(self.regions),
+        ) if self.regions else pd.Categorical([])
+        descriptions = pd.Categorical.from_codes(
+            np.frombuffer(self.description_codes, dtype=np.int16),
+            categories=pd.Index(self.descriptions),
+        ) if self.descriptions else pd.Categorical([])
+
+        self._frame = pd.DataFrame({
+            DISPLAY_COLUMNS['location']: pd.Series(self.locations, dtype=object),
+            DISPLAY_COLUMNS['region']: regions,
+            DISPLAY_COLUMNS['min_temp']: np.frombuffer(self.min_temp, dtype=np.float32),
+            DISPLAY_COLUMNS['max_temp']: np.frombuffer(self.max_temp, dtype=np.float32),
+            DISPLAY_COLUMNS['current_temp']: np.frombuffer(self.current_temp, dtype=np.float32),
+            DISPLAY_COLUMNS['description']: descriptions,
+        }, copy=False)
+        return self._frame
+
+    def records(self) -> List[WeatherRecord]:
+        """
+        Convert the snapshot back to records (None for missing temperatures)
+
+        Returns:
+            List of WeatherRecord without id and forecast_time
+        """
+        return [
+            WeatherRecord(
+                location=self.locations[i],
+                region=self.regions[self.region_codes[i]],
+                min_temp=_to_optional(self.min_temp[i]),
+                max_temp=_to_optional(self.max_temp[i]),
+                current_temp=_to_optional(self.current_temp[i]),
+                description=self.descriptions[self.description_codes[i]],
+                created_at=self.created_at[i],
+            )
+            for i in range(len(self.locations))
+        ]
+
+    def with_changes(self, state: Tuple[int, int], changes: List[WeatherRecord]) -> 'WeatherSnapshot':
+        """
+        Build the next snapshot by applying newly ingested records
+
+        Args:
+            state: Table state (max_id, deleted) the changes bring us to
+            changes: Records from database.changes_since(), oldest first
+
+        Returns:
+            New WeatherSnapshot; this one is left untouched
+        """
+        merged = {record.location: record for record in self.records()}
+        for record in changes:
+            # Backfilled history can arrive with new ids but old timestamps
+            existing = merged.get(record.location)
+            if existing is None or (record.created_at or '') >= (existing.created_at or ''):
+                merged[record.location] = record
+
+        # Same order as get_latest_weather_records(): region, then location
+        ordered = sorted(merged.values(), key=lambda r: (r.region or '', r.location))
+        return WeatherSnapshot(state, ordered)
+
+
+def snapshot_file_path() -> str:
+    """
+    Path of the snapshot pointer file next to the database
+
+    The pointer names the current data file; data files are immutable and
+    named by version (``<pointer>-<max_id>-<deleted>``), like replicas.
+    Readers keep a data file mapped, and Windows cannot replace or delete
+    a mapped file, so a new version always goes to a new name.
+    """
+    return database.DB_NAME + '.snapshot'
+
+
+def _data_file_path(path: str, weather_snapshot: WeatherSnapshot) -> str:
+    return f"{path}-{weather_snapshot.cursor}-{weather_snapshot.deleted}"
+
+
+def read_pointer(path: Optional[str] = None) -> Optional[Dict]:
+    """
+    Read the snapshot pointer file
+
+    Returns:
+        Dictionary with 'file' (data file name) and 'version', or None if
+        nothing usable has been published
+    """
+    path = path or snapshot_file_path()
+    try:
+        with open(path, 'rb') as f:
+            pointer = json.loads(f.read())
+    except (FileNotFoundError, ValueError):
+        return None
+    return pointer if isinstance(pointer, dict) and 'file' in pointer else None
+
+
+def _prune(path: str, current: str):
+    """
+    Delete all but the newest KEEP_VERSIONS data files (never the current one)
+
+    A file still mapped by a reader cannot be deleted on Windows; it is
+    left for a later publish to remove.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    prefix = os.path.basename(path) + '-'
+    names = [name for name in os.listdir(directory) if name.startswith(prefix)]
+    fileutil.prune_versions(directory, names, current, KEEP_VERSIONS)
+
+
+def _string_block(values) -> Tuple[bytes, int]:
+    values = list(values)
+    return '\0'.join(values).encode('utf-8'), len(values)
+
+
+def write_snapshot_file(weather_snapshot: WeatherSnapshot, path: Optional[str] = None) -> str:
+    """
+    Write a snapshot as a fixed-layout columnar file and point the pointer file at it
+
+    Numeric columns are stored as raw native-endian arrays and string
+    columns as NUL-separated UTF-8, each block aligned so readers can map
+    it without copying.
+
+    Args:
+        weather_snapshot: Snapshot to publish
+        path: Pointer file (default: snapshot_file_path())
+
+    Returns:
+        Path of the data file
+    """
+    path = path or snapshot_file_path()
+    s = weather_snapshot
+    data_path = _data_file_path(path, s)
+
+    blocks = [
+        ('locations', 'utf8') + _string_block(s.locations),
+        ('created_at', 'utf8') + _string_block(c or '' for c in s.created_at),
+        ('regions', 'utf8') + _string_block(s.regions),
+        ('descriptions', 'utf8') + _string_block(s.descriptions),
+    ]
+    for name in ('region_codes', 'description_codes', 'min_temp', 'max_temp', 'current_temp'):
+        buffer = memoryview(getattr(s, name))
+        blocks.append((name, buffer.format, buffer.tobytes(), len(buffer)))
+
+    columns = []
+    offset = 0
+    for name, fmt, data, count in blocks:
+        columns.append({'name': name, 'format': fmt, 'offset': offset, 'size': len(data), 'count': count})
+        offset += -(-len(data) // SNAPSHOT_FILE_ALIGN) * SNAPSHOT_FILE_ALIGN
+
+    header = json.dumps({
+        'version': s.version,
+        'cursor': s.cursor,
+        'deleted': s.deleted,
+        'latest_update': s.latest_update,
+        'byteorder': sys.byteorder,
+        'columns': columns,
+    }).encode('utf-8')
+    # Column offsets are relative to the first aligned byte after the header
+    data_start = -(-(len(SNAPSHOT_FILE_MAGIC) + 4 + len(header)) // SNAPSHOT_FILE_ALIGN) * SNAPSHOT_FILE_ALIGN
+
+    # A data file for this version has the same contents and may be mapped already
+    if not os.path.exists(data_path):
+        def write_data(f):
+            f.write(SNAPSHOT_FILE_MAGIC)
+            f.write(len(header).to_bytes(4, 'little'))
+            f.write(header)
+            for column, (_, _, data, _) in zip(columns, blocks):
+                f.seek(data_start + column['offset'])
+                f.write(data)
+            f.truncate(data_start + offset)
+
+        fileutil.write_atomic(data_path, write_data)
+
+    # Readers that still map an older file keep it until they let go
+    pointer = json.dumps({'file': os.path.basename(data_path), 'version': s.version}).encode('utf-8')
+    fileutil.write_atomic(path, lambda f: f.write(pointer))
+    _prune(path, os.path.basename(data_path))
+    return data_path
+
+
+def read_snapshot_file(path: Optional[str] = None, version: Optional[str] = None) -> Optional[WeatherSnapshot]:
+    """
+    Map a published snapshot file
+
+    Temperatures and dictionary codes stay in the shared page cache; only
+    the string columns are decoded into this process.
+
+    Args:
+        path: Pointer file (default: snapshot_file_path())
+        version: Only accept a file with this data version
+
+    Returns:
+        WeatherSnapshot backed by the mapped file, or None if there is no
+        usable file (missing, truncated or corrupt, other version or other
+        byte order)
+    """
+    path = path or snapshot_file_path()
+    pointer = read_pointer(path)
+    if pointer is None or (version is not None and pointer.get('version') != version):
+        return None
+    try:
+        with open(os.path.join(os.path.dirname(path), pointer['file']), 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, TypeError, ValueError):
+        return None
+
+    try:
+        return _map_snapshot(memoryview(mapped), version)
+    except (KeyError, TypeError, ValueError):
+        # Truncated or corrupt file: rebuild from the database instead
+        return None
+
+
+def _map_snapshot(view: memoryview, version: Optional[str]) -> Optional[WeatherSnapshot]:
+    """
+    Build a snapshot over a mapped file; raises ValueError if a block is out of bounds
+    """
+    if view[:len(SNAPSHOT_FILE_MAGIC)] != SNAPSHOT_FILE_MAGIC:
+        return None
+    header_start = len(SNAPSHOT_FILE_MAGIC) + 4
+    header_length = int.from_bytes(view[len(SNAPSHOT_FILE_MAGIC):header_start], 'little')
+    if header_start + header_length > len(view):
+        raise ValueError("snapshot header is truncated")
+    header = json.loads(view[header_start:header_start + header_length].tobytes())
+    if header['byteorder'] != sys.byteorder or (version is not None and header['version'] != version):
+        return None
+    data_start = -(-(header_start + header_length) // SNAPSHOT_FILE_ALIGN) * SNAPSHOT_FILE_ALIGN
+
+    columns = {}
+    for column in header['columns']:
+        start = data_start + column['offset']
+        if start < data_start or start + column['size'] > len(view):
+            raise ValueError(f"snapshot column {column['name']} is truncated")
+        block = view[start:start + column['size']]
+        if column['format'] == 'utf8':
+            values = block.tobytes().decode('utf-8').split('\0') if column['count'] else []
+            columns[column['name']] = tuple(sys.intern(value) for value in values)
+        else:
+            columns[column['name']] = block.cast(column['format'])
+        if len(columns[column['name']]) != column['count']:
+            raise ValueError(f"snapshot column {column['name']} has the wrong length")
+
+    snapshot = WeatherSnapshot.__new__(WeatherSnapshot)
+    snapshot.version = header['version']
+    snapshot.cursor = header['cursor']
+    snapshot.deleted = header['deleted']
+    snapshot.latest_update = header['latest_update']
+    snapshot.locations = columns['locations']
+    snapshot.created_at = tuple(value or None for value in columns['created_at'])
+    snapshot.regions = columns['regions']
+    snapshot.descriptions = columns['descriptions']
+    for name in ('region_codes', 'description_codes', 'min_temp', 'max_temp', 'current_temp'):
+        setattr(snapshot, name, columns[name])
+    snapshot._frame = None
+    return snapshot
+
+
+def _to_float(value) -> float:
+    return _NAN if value is None else float(value)
+
+
+def _to_optional(value: float) -> Optional[float]:
+    return None if math.isnan(value) else value
+
+
+_snapshot: Optional[WeatherSnapshot] = None
+_snapshot_lock = threading.Lock()
+
+
+def _next_snapshot(current: Optional[WeatherSnapshot], state: Tuple[int, int]) -> WeatherSnapshot:
+    """
+    Advance the snapshot to a table state, incrementally when only inserts happened
+    """
+    published = read_snapshot_file(version=database.format_data_version(state))
+    if published is not None:
+        return published
+
+    new_rows = state[0] - (current.cursor if current else 0)
+    # Any delete since the last snapshot shows up in the delete counter
+    if current is not None and current.deleted == state[1] and 0 < new_rows <= MAX_INCREMENTAL_CHANGES:
+        changes, _ = database.changes_since(current.cursor, new_rows)
+        changes = [record for record in changes if record.id <= state[0]]
+        return current.with_changes(state, changes)
+
+    return WeatherSnapshot(state, database.get_latest_weather_records())
+
+
+def get_snapshot() -> WeatherSnapshot:
+    """
+    Get the process-wide snapshot, refreshing it only when the data changes
+
+    A published snapshot file for the current version is mapped zero-copy.
+    Otherwise an append-only ingest is applied from the change feed and
+    anything else (deletes, large backfills) triggers a full rebuild.
+
+    Returns:
+        Shared WeatherSnapshot (read-only)
+    """
+    global _snapshot
+
+    state = database.get_table_state()
+    version = database.format_data_version(state)
+    current = _snapshot
+    if current is not None and current.version == version:
+        return current
+
+    with _snapshot_lock:
+        if _snapshot is None or _snapshot.version != version:
+            _snapshot = _next_snapshot(_snapshot, state)
+        return _snapshot
+
+
+def publish_snapshot(path: Optional[str] = None) -> Optional[str]:
+    """
+    Write the current snapshot to the snapshot file for other processes
+
+    Returns:
+        Path of the written file, or None if publishing failed
+    """
+    try:
+        path = write_snapshot_file(get_snapshot(), path)
+    except OSError as e:
+        print(f"[ERROR] Error publishing snapshot: {e}")
+        return None
+    print(f"[OK] Published snapshot: {path}")
+    return path
+
+
+def invalidate_snapshot():
+    """
+    Drop the shared snapshot so the next access rebuilds it
+    """
+    global _snapshot
+    with _snapshot_lock:
+        _snapshot = None
@@ -0,0 +1,48 @@
+"""
+Shared fixtures: every test gets its own database file
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+import snapshot  # noqa: E402
+import verification  # noqa: E402
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """
+    Point the database module at an empty database in a temporary directory
+    """
+    monkeypatch.setattr(database, 'DB_NAME', str(tmp_path / 'weather.db'))
+    monkeypatch.setattr(database, 'READ_REPLICA_DIR', None)
+    monkeypatch.setattr(database, '_initialized_db', None)
+    monkeypatch.setattr(database, '_analytics_copy', None)
+    monkeypatch.setattr(database, '_analytics_copy_thread', None)
+    monkeypatch.setattr(verification, '_state', None)
+    monkeypatch.setattr(verification, '_report', None)
+    snapshot.invalidate_snapshot()
+    yield database.DB_NAME
+    snapshot.invalidate_snapshot()
+
+
+def make_record(location: str, region: str = '北部', temp: float = 20.0, **fields) -> dict:
+    """
+    Record dictionary as produced by fetch_weather
+    """
+    record = {
+        'location': location,
+        'region': region,
+        'min_temp': temp - 2,
+        'max_temp': temp + 2,
+        'current_temp': temp,
+        'description': '晴',
+        'forecast_time': '2026-10-19T06:00:00+08:00',
+    }
+    record.update(fields)
+    return record
@@ -0,0 +1,97 @@
+"""
+Tests for alert statistics and the alerts raised on ingest
+"""
+
+import numpy as np
+
+import alerts
+import database
+from conftest import make_record
+
+
+def reference(history):
+    window = np.asarray(history[-alerts.ALERT_WINDOW:], dtype=np.float64)
+    std = window.std(ddof=1) if len(window) > 1 else 0.0
+    return len(window), window.mean(), std
+
+
+def test_rolling_stats_match_numpy():
+    rng = np.random.default_rng(42)
+    values = rng.normal(20, 5, size=(3, alerts.ALERT_WINDOW * 3))
+    stats = alerts.RollingStats(3)
+    index = np.arange(3)
+
+    for step in range(values.shape[1]):
+        stats.update(index, values[:, step])
+        for row in range(3):
+            count, mean, std = reference(values[row, :step + 1])
+            assert stats.count[row] == count
+            assert np.isclose(stats.mean[row], mean)
+            assert np.isclose(stats.std(np.array([row]))[0], std)
+
+
+def test_stats_from_history_matches_sequential_updates():
+    rng = np.random.default_rng(7)
+    location_ids = np.repeat([3, 8], [5, alerts.ALERT_WINDOW])
+    values = rng.normal(15, 3, size=len(location_ids))
+
+    locations, built = alerts.stats_from_history(location_ids, values)
+
+    sequential = alerts.RollingStats(2)
+    for location, value in zip(location_ids, values):
+        sequential.update(np.array([int(location == 8)]), np.array([value]))
+    assert locations.tolist() == [3, 8]
+    assert np.array_equal(built.count, sequential.count)
+    assert np.allclose(built.mean, sequential.mean)
+    assert np.allclose(built.m2, sequential.m2)
+    assert np.array_equal(built.position, sequential.position)
+    assert np.allclose(built.window, sequential.window)
+
+
+def test_run_batch_processes_repeats_in_order():
+    stats = alerts.RollingStats(1)
+    values = np.array([20.0] * alerts.MIN_HISTORY + [20.0 - alerts.SUDDEN_CHANGE - 1])
+
+    fired = alerts.run_batch(stats, np.zeros(len(values), dtype=np.int64), values)
+
+    names = {alerts.RULE_NAMES[rule]: rows.tolist() for rule, rows, _ in fired}
+    assert names['sudden_drop'] == [len(values) - 1]
+    assert stats.count[0] == len(values)
+
+
+def forecast(hour: int, temp: float) -> dict:
+    return make_record('臺北市', temp=temp, forecast_time=f'2026-10-19T{hour:02d}:00:00+08:00')
+
+
+def test_a_value_raises_one_alert(db):
+    database.init_database()
+    database.insert_weather_records([forecast(hour, 22) for hour in range(alerts.MIN_HISTORY)])
+
+    # Extreme cold, a sudden drop and an anomaly at once
+    database.insert_weather_record(forecast(12, 2))
+
+    assert [alert['rule'] for alert in database.get_recent_alerts()] == ['extreme_cold']
+
+
+def test_a_forecast_period_is_alerted_once(db):
+    database.init_database()
+    database.insert_weather_records([forecast(hour, 22) for hour in range(alerts.MIN_HISTORY)])
+
+    database.insert_weather_record(forecast(12, 2))
+    # The same forecast downloaded again, in one batch and in the next ingest
+    database.insert_weather_records([forecast(12, 1), forecast(12, 1)])
+    database.insert_weather_record(forecast(12, 3))
+    assert len(database.get_recent_alerts()) == 1
+
+    database.insert_weather_record(forecast(13, 2))
+    assert len(database.get_recent_alerts()) == 2
+
+
+def test_unreadable_values_are_stored_without_alerts(db):
+    database.init_database()
+
+    inserted = database.insert_weather_records([forecast(1, 2), forecast(2, 20) | {'current_temp': 'n/a'}])
+
+    assert inserted == 2
+    assert len(database.get_all_weather_records()) == 2
+    assert database.get_recent_alerts() == []
@@ -0,0 +1,106 @@
+"""
+Tests for the analytics API: SQLite and DuckDB must agree
+"""
+
+import os
+import random
+import subprocess
+import sys
+
+import pytest
+
+import database
+from conftest import make_record
+
+duckdb = pytest.importorskip('duckdb')
+
+PERCENTILES = tuple(i / 100 for i in range(101)) + (1 / 3, 2 / 3, 0.125, 0.999)
+
+
+def fill(counts):
+    rng = random.Random(3)
+    records = []
+    for region, count in counts.items():
+        records.extend(
+            make_record(f'{region}{i}', region=region, temp=round(rng.uniform(5, 35), 1))
+            for i in range(count)
+        )
+    database.init_database()
+    database.insert_weather_records(records)
+
+
+def test_percentiles_match_between_engines(db):
+    # Group sizes where floor/ceil rounding of p * n differs between formulas
+    fill({'北部': 1, '中部': 2, '南部': 25, '東部': 100, '離島': 137})
+
+    sqlite_rows = database.get_temperature_percentiles('current_temp', PERCENTILES, engine='sqlite')
+    duckdb_rows = database.get_temperature_percentiles('current_temp', PERCENTILES, engine='duckdb')
+
+    assert sqlite_rows == duckdb_rows
+    assert [row['count'] for row in sqlite_rows] == [2, 1, 25, 100, 137]
+
+
+def test_percentiles_are_percentile_disc(db):
+    fill({'北部': 4})
+    values = sorted(record.current_temp for record in database.get_all_weather_records())
+
+    row, = database.get_temperature_percentiles('current_temp', (0, 0.25, 0.26, 0.5, 1), engine='sqlite')
+
+    assert [row['p0'], row['p25'], row['p26'], row['p50'], row['p100']] == [
+        values[0], values[0], values[1], values[1], values[3]
+    ]
+
+
+def test_stats_do_not_build_the_duckdb_copy(db, monkeypatch):
+    monkeypatch.setattr(database, 'ANALYTICS_MIN_ROWS', 1)
+    fill({'北部': 3})
+
+    stats = database.get_database_stats()
+
+    assert database._analytics_copy is None and database._analytics_copy_thread is None
+    assert stats == database.get_database_stats(engine='duckdb')
+
+
+def test_importing_database_does_not_import_duckdb():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    script = "import sys, database; print('duckdb' in sys.modules)"
+    result = subprocess.run([sys.executable, '-c', script], cwd=root, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == 'False'
+
+
+def copy_count(copy):
+    return copy.conn.execute('SELECT COUNT(*) FROM weather_facts').fetchone()[0]
+
+
+def test_copy_ignores_an_older_state(db, monkeypatch):
+    fill({'北部': 3})
+    copy = database._build_analytics_copy()
+    database.insert_weather_record(make_record('新站'))
+    copy.sync()
+    assert (copy.cursor, copy_count(copy)) == (4, 4)
+
+    # A thread that read the state before the last sync must not reload
+    database.insert_weather_record(make_record('新站'))
+    monkeypatch.setattr(database, 'get_table_state', lambda: (3, 0))
+    copy.sync()
+
+    assert (copy.cursor, copy_count(copy)) == (4, 4)
+
+
+def test_failed_reload_keeps_the_previous_copy(db):
+    fill({'北部': 3})
+    database.insert_weather_record(make_record('舊站', created_at='2000-01-01 00:00:00'))
+    copy = database._build_analytics_copy()
+    database.clear_old_records(7)
+
+    def fail(after_id, up_to_id):
+        raise RuntimeError('read failed')
+
+    copy._load_facts = fail
+    with pytest.raises(RuntimeError):
+        copy.sync()
+    assert (copy.deleted, copy_count(copy)) == (0, 4)
+
+    del copy._load_facts
+    copy.sync()
+    assert (copy.deleted, copy_count(copy)) == (1, 3)
@@ -0,0 +1,47 @@
+"""
+Tests for the query service routes
+"""
+
+import asyncio
+import json
+
+import api_server
+import database
+from conftest import make_record
+
+
+def get(server, target):
+    response = asyncio.run(server.route('GET', target))
+    return response.status, json.loads(response.body)
+
+
+def test_latest_filters_by_region(db):
+    database.init_database()
+    database.insert_weather_records([
+        make_record('臺北市'),
+        make_record('新北市'),
+        make_record('高雄市', region='南部'),
+    ])
+    server = api_server.WeatherAPIServer()
+    server.cache.rebuild(database.get_data_version())
+
+    status, records = get(server, '/latest?region=%E5%8D%97%E9%83%A8')
+    assert status == 200
+    assert [record['location'] for record in records] == ['高雄市']
+
+    assert len(get(server, '/latest')[1]) == 3
+    assert get(server, '/latest?region=東部') == (200, [])
+
+
+def test_region_responses_are_cached_per_version(db):
+    database.init_database()
+    database.insert_weather_record(make_record('臺北市'))
+    server = api_server.WeatherAPIServer()
+    server.cache.rebuild(database.get_data_version())
+    first = server.cache.get_region('北部')
+    assert server.cache.get_region('北部') is first
+
+    database.insert_weather_record(make_record('新北市'))
+    server.cache.rebuild(database.get_data_version())
+
+    assert len(json.loads(server.cache.get_region('北部').body)) == 2
@@ -0,0 +1,36 @@
+"""
+Tests for the dashboard page
+"""
+
+import os
+
+from streamlit.testing.v1 import AppTest
+
+import database
+import replica
+from conftest import make_record
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app.py')
+
+
+def test_replica_dashboard_cannot_write(db, tmp_path, monkeypatch):
+    database.init_database()
+    database.insert_weather_record(make_record('臺北市'))
+    replica_dir = str(tmp_path / 'replicas')
+    replica.publish_replicas([replica_dir])
+    monkeypatch.setattr(database, 'READ_REPLICA_DIR', replica_dir)
+
+    app = AppTest.from_file(APP, default_timeout=60).run()
+
+    assert not app.exception
+    assert all(button.disabled for button in app.button)
+    assert app.metric[0].value == '1'
+
+
+def test_local_dashboard_can_write(db):
+    database.init_database()
+
+    app = AppTest.from_file(APP, default_timeout=60).run()
+
+    assert not app.exception
+    assert not any(button.disabled for button in app.button)
@@ -0,0 +1,67 @@
+"""
+Tests for the raw payload archive: deduplication, repair and eviction
+"""
+
+import glob
+import os
+import time
+
+import archive
+
+PAYLOAD = '{"cwaopendata": {"dataset": "臺北市"}}'.encode('utf-8')
+
+
+def blob_files(archive_dir):
+    return glob.glob(os.path.join(archive_dir, 'objects', '*', '*'))
+
+
+def test_identical_payloads_share_one_blob(tmp_path):
+    archive_dir = str(tmp_path / 'archive')
+
+    first = archive.store_payload(PAYLOAD, fetched_at=1000, archive_dir=archive_dir)
+    second = archive.store_payload(PAYLOAD, fetched_at=2000, archive_dir=archive_dir)
+
+    assert first == second
+    assert len(blob_files(archive_dir)) == 1
+    assert [fetch['fetched_ts'] for fetch in archive.list_fetches(archive_dir=archive_dir)] == [1000, 2000]
+    assert archive.load_payload(first, archive_dir=archive_dir) == PAYLOAD
+    stats = archive.get_archive_stats(archive_dir)
+    assert (stats['fetches'], stats['unique_payloads']) == (2, 1)
+
+
+def test_missing_blob_is_written_again(tmp_path):
+    archive_dir = str(tmp_path / 'archive')
+    digest = archive.store_payload(PAYLOAD, archive_dir=archive_dir)
+    os.remove(blob_files(archive_dir)[0])
+
+    assert archive.store_payload(PAYLOAD, archive_dir=archive_dir) == digest
+
+    assert len(blob_files(archive_dir)) == 1
+    assert archive.load_payload(digest, archive_dir=archive_dir) == PAYLOAD
+
+
+def test_evict_removes_unreferenced_blobs(tmp_path):
+    archive_dir = str(tmp_path / 'archive')
+    old = time.time() - 10 * 86400
+    kept = archive.store_payload(b'{"new": 1}', archive_dir=archive_dir)
+    archive.store_payload(PAYLOAD, fetched_at=old, archive_dir=archive_dir)
+    archive.store_payload(PAYLOAD, fetched_at=old + 60, archive_dir=archive_dir)
+    assert len(blob_files(archive_dir)) == 2
+
+    assert archive.evict(retention_days=7, archive_dir=archive_dir) == 1
+
+    assert len(blob_files(archive_dir)) == 1
+    assert [fetch['digest'] for fetch in archive.list_fetches(archive_dir=archive_dir)] == [kept]
+    assert archive.load_payload(kept, archive_dir=archive_dir) == b'{"new": 1}'
+    assert archive.evict(retention_days=7, archive_dir=archive_dir) == 0
+
+
+def test_a_blob_shared_with_a_recent_fetch_is_kept(tmp_path):
+    archive_dir = str(tmp_path / 'archive')
+    digest = archive.store_payload(PAYLOAD, fetched_at=time.time() - 10 * 86400, archive_dir=archive_dir)
+    archive.store_payload(PAYLOAD, archive_dir=archive_dir)
+
+    assert archive.evict(retention_days=7, archive_dir=archive_dir) == 0
+
+    assert archive.load_payload(digest, archive_dir=archive_dir) == PAYLOAD
+    assert len(archive.list_fetches(archive_dir=archive_dir)) == 1
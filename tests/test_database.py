@@ -0,0 +1,183 @@
+"""
+Tests for storage: legacy migration, the write queue and the change feed
+"""
+
+import sqlite3
+import threading
+
+import database
+from conftest import make_record
+
+LEGACY_SCHEMA = '''
+    CREATE TABLE weather (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        location TEXT NOT NULL,
+        region TEXT,
+        min_temp REAL,
+        max_temp REAL,
+        current_temp REAL,
+        description TEXT,
+        forecast_time TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+
+def create_legacy_database(path, forecast_times):
+    conn = sqlite3.connect(path)
+    conn.execute(LEGACY_SCHEMA)
+    conn.executemany(
+        "INSERT INTO weather (location, region, min_temp, max_temp, description, forecast_time) "
+        "VALUES (?, '北部', 18, 24, '晴', ?)",
+        [(f'站{i}', forecast_time) for i, forecast_time in enumerate(forecast_times)]
+    )
+    conn.commit()
+    return conn
+
+
+def sequence(path):
+    conn = sqlite3.connect(path)
+    rows = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'weather_facts'").fetchall()
+    conn.close()
+    return rows
+
+
+def test_legacy_migration_keeps_ids_and_values(db):
+    conn = create_legacy_database(db, ['2026-10-19T06:00:00+08:00'] * 3)
+    conn.execute('DELETE FROM weather WHERE id = 2')
+    conn.commit()
+    conn.close()
+
+    database.init_database()
+
+    records = database.get_all_weather_records()
+    assert sorted(record.id for record in records) == [1, 3]
+    assert {record.forecast_time for record in records} == {'2026-10-19T06:00:00+08:00'}
+    assert records[0].min_temp == 18
+
+
+def test_legacy_migration_continues_the_id_sequence(db):
+    conn = create_legacy_database(db, ['2026-10-19T06:00:00+08:00'] * 5)
+    conn.execute('DELETE FROM weather WHERE id > 3')
+    conn.commit()
+    conn.close()
+
+    database.init_database()
+    database.insert_weather_record(make_record('新站'))
+
+    assert max(record.id for record in database.get_all_weather_records()) == 6
+    assert sequence(db) == [(6,)]
+
+
+def test_legacy_migration_of_an_empty_table_continues_the_id_sequence(db):
+    conn = create_legacy_database(db, ['2026-10-19T06:00:00+08:00'] * 4)
+    conn.execute('DELETE FROM weather')
+    conn.commit()
+    conn.close()
+
+    database.init_database()
+    database.insert_weather_record(make_record('新站'))
+
+    assert [record.id for record in database.get_all_weather_records()] == [5]
+
+
+def test_legacy_migration_keeps_unparsable_rows(db):
+    create_legacy_database(db, ['2026-10-19T06:00:00+08:00', 'not a time']).close()
+
+    database.init_database()
+
+    conn = sqlite3.connect(db)
+    assert conn.execute('SELECT id, forecast_time FROM weather_legacy').fetchall() == [(2, 'not a time')]
+    conn.close()
+    assert [record.id for record in database.get_all_weather_records()] == [1]
+
+
+def test_to_epoch():
+    assert database.to_epoch('2026-10-19T06:00:00+08:00') == 1792360800
+    assert database.to_epoch('2026-10-18 22:00:00', assume_utc=True) == 1792360800
+    assert database.to_epoch(None) is None
+    assert database.to_epoch('yesterday') is None
+
+
+def test_invalid_timestamp_is_rejected(db):
+    database.init_database()
+
+    inserted = database.insert_weather_records([
+        make_record('臺北市'),
+        make_record('臺中市', forecast_time='yesterday'),
+    ])
+
+    assert inserted == 1
+    assert [record.location for record in database.get_all_weather_records()] == ['臺北市']
+
+
+def test_failed_batch_is_retried_record_by_record(db):
+    database.init_database()
+
+    inserted = database.insert_weather_records([
+        make_record('臺北市'),
+        make_record('臺中市', min_temp=object()),
+        make_record('高雄市'),
+    ])
+
+    assert inserted == 2
+    assert sorted(record.location for record in database.get_all_weather_records()) == ['臺北市', '高雄市']
+
+
+def test_concurrent_writers_all_commit(db):
+    database.init_database()
+    results = []
+
+    def write(n):
+        results.append(database.insert_weather_records(
+            [make_record(f'站{n}-{i}') for i in range(20)]
+        ))
+
+    threads = [threading.Thread(target=write, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [20] * 8
+    ids = [record.id for record in database.get_all_weather_records()]
+    assert sorted(ids) == list(range(1, 161))
+
+
+def test_changes_since_pages_through_new_records(db):
+    database.init_database()
+    database.insert_weather_records([make_record(f'站{i}') for i in range(5)])
+
+    records, cursor = database.changes_since(0, limit=3)
+    assert [record.id for record in records] == [1, 2, 3]
+    records, cursor = database.changes_since(cursor, limit=3)
+    assert [record.id for record in records] == [4, 5]
+    assert database.changes_since(cursor) == ([], cursor)
+
+    database.insert_weather_record(make_record('站5'))
+    records, _ = database.changes_since(cursor)
+    assert [record.location for record in records] == ['站5']
+
+
+def test_data_version_changes_on_delete(db):
+    database.init_database()
+    database.insert_weather_records([
+        make_record('舊站', created_at='2000-01-01 00:00:00'),
+        make_record('新站'),
+    ])
+    before = database.get_data_version()
+
+    database.clear_old_records(7)
+
+    assert database.get_table_state() == (2, 1)
+    assert database.get_data_version() != before
+
+
+def test_legacy_migration_seeds_alert_statistics(db):
+    create_legacy_database(db, ['2026-10-19T06:00:00+08:00'] * 3).close()
+
+    database.init_database()
+
+    conn = sqlite3.connect(db)
+    assert conn.execute('SELECT COUNT(*), SUM(count) FROM alert_stats').fetchone() == (3, 3)
+    conn.close()
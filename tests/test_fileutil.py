@@ -0,0 +1,36 @@
+"""
+Tests for atomic file publishing
+"""
+
+import os
+
+import pytest
+
+import fileutil
+
+
+def test_failed_write_keeps_the_old_file(tmp_path):
+    path = str(tmp_path / 'pointer')
+    fileutil.write_atomic(path, lambda f: f.write(b'old'))
+
+    def fail(f):
+        f.write(b'partial')
+        raise RuntimeError('disk full')
+
+    with pytest.raises(RuntimeError):
+        fileutil.write_atomic(path, fail)
+
+    with open(path, 'rb') as f:
+        assert f.read() == b'old'
+    assert os.listdir(tmp_path) == ['pointer']
+
+
+def test_prune_keeps_the_newest_and_the_current(tmp_path):
+    names = [f'v{i}' for i in range(5)]
+    for i, name in enumerate(names):
+        (tmp_path / name).write_bytes(b'')
+        os.utime(tmp_path / name, (1000 + i, 1000 + i))
+
+    assert fileutil.prune_versions(str(tmp_path), names, 'v0', 3) == []
+
+    assert sorted(os.listdir(tmp_path)) == ['v0', 'v3', 'v4']
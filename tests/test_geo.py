@@ -0,0 +1,35 @@
+"""
+Tests for location lookup and coordinate-derived caches
+"""
+
+import database
+import geo
+import heatmap
+import snapshot
+from conftest import make_record
+
+
+def test_lookup_exact_and_short_names():
+    assert geo.lookup_coordinates('臺北市') == geo.CITY_COORDINATES['臺北市']
+    assert geo.lookup_coordinates('臺北') is not None
+
+
+def test_lookup_rejects_bare_suffixes():
+    assert geo.lookup_coordinates('') is None
+    assert geo.lookup_coordinates('市') is None
+    assert geo.lookup_coordinates('縣') is None
+    assert geo.lookup_coordinates('縣市') is None
+
+
+def test_heatmap_layer_is_rebuilt_when_locations_move(db, monkeypatch):
+    monkeypatch.setattr(geo, 'VERSION_CHECK_INTERVAL', 0)
+    geo.invalidate_spatial_index()
+    database.init_database()
+    database.insert_weather_records([make_record('臺北市', temp=20), make_record('高雄市', temp=30)])
+    current = snapshot.get_snapshot()
+    first = heatmap.get_heatmap_layer(current, 0.1)
+
+    database.upsert_locations([{'name': '高雄市', 'region': '南部', 'latitude': 24.0, 'longitude': 121.0}])
+
+    assert heatmap.get_heatmap_layer(current, 0.1) is not first
+    geo.invalidate_spatial_index()
@@ -0,0 +1,31 @@
+"""
+Tests for the live watcher
+"""
+
+import pytest
+
+import database
+import live
+from conftest import make_record
+
+
+def test_failed_warm_up_is_retried(db, monkeypatch):
+    database.init_database()
+    watcher = live.LiveWatcher()
+    watcher.check()
+    generation = watcher.generation
+    database.insert_weather_record(make_record('臺北市'))
+
+    def fail():
+        raise RuntimeError('database is locked')
+
+    monkeypatch.setattr(live, 'warm_caches', fail)
+    with pytest.raises(RuntimeError):
+        watcher.check()
+    assert watcher.generation == generation
+
+    monkeypatch.setattr(live, 'warm_caches', lambda: None)
+    assert watcher.check()
+    assert watcher.generation == generation + 1
+    assert watcher.version == database.get_data_version()
+    assert not watcher.check()
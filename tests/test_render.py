@@ -0,0 +1,37 @@
+"""
+Tests for the per-region dashboard payloads
+"""
+
+import database
+import render
+import snapshot
+from conftest import make_record
+
+
+def test_region_payload_is_a_subset_of_the_snapshot(db):
+    database.init_database()
+    database.insert_weather_records([
+        make_record('臺北市', region='北部', temp=20),
+        make_record('高雄市', region='南部', temp=30),
+        make_record('屏東縣', region='南部', temp=31),
+    ])
+    current = snapshot.get_snapshot()
+
+    # Newer data arrives after the snapshot was taken
+    database.insert_weather_record(make_record('臺南市', region='南部', temp=29))
+    payload = render.build_region_payload(current, '南部')
+
+    assert payload.version == current.version
+    assert payload.table['地點'].tolist() == ['屏東縣', '高雄市']
+    assert payload.table['當前溫度 (°C)'].tolist() == [31, 30]
+    assert payload.table_styles.shape == payload.table.shape
+
+
+def test_unknown_region_is_empty(db):
+    database.init_database()
+    database.insert_weather_record(make_record('臺北市'))
+
+    payload = render.build_region_payload(snapshot.get_snapshot(), '離島')
+
+    assert payload.table.empty
+    assert payload.figure is None
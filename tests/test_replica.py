@@ -0,0 +1,42 @@
+"""
+Tests for reading from published replicas
+"""
+
+import database
+import replica
+from conftest import make_record
+
+
+def test_reads_are_empty_until_a_replica_is_published(db, tmp_path, monkeypatch):
+    database.init_database()
+    database.insert_weather_records([make_record('臺北市'), make_record('高雄市', region='南部')])
+    replica_dir = str(tmp_path / 'replicas')
+    monkeypatch.setattr(database, 'READ_REPLICA_DIR', replica_dir)
+
+    assert database.get_latest_weather_records() == []
+    assert database.get_database_stats()['total_records'] == 0
+    assert database.get_data_version() == database.format_data_version((0, 0))
+
+    replica.publish_replicas([replica_dir])
+
+    assert len(database.get_latest_weather_records()) == 2
+    assert database.get_data_version() == database.format_data_version((2, 0))
+
+
+def test_publish_configured_follows_deletes(db, tmp_path, monkeypatch):
+    replica_dir = str(tmp_path / 'replicas')
+    monkeypatch.setattr(replica, 'REPLICA_DIRS', [])
+    assert replica.publish_configured() is None
+
+    monkeypatch.setattr(replica, 'REPLICA_DIRS', [replica_dir])
+    database.init_database()
+    database.insert_weather_records([
+        make_record('舊站', created_at='2000-01-01 00:00:00'),
+        make_record('新站'),
+    ])
+    replica.publish_configured()
+    database.clear_old_records(7)
+    metadata = replica.publish_configured()
+
+    assert metadata['version'] == database.get_data_version()
+    assert replica.read_manifest(replica_dir)['row_count'] == 1
@@ -0,0 +1,128 @@
+"""
+Tests for the shared snapshot: incremental updates and the published file
+"""
+
+import os
+
+import database
+import snapshot
+from conftest import make_record
+
+
+def full_rebuild():
+    return snapshot.WeatherSnapshot(database.get_table_state(), database.get_latest_weather_records())
+
+
+def test_incremental_snapshot_matches_full_rebuild(db):
+    database.init_database()
+    database.insert_weather_records([make_record(f'站{i}', temp=10 + i) for i in range(4)])
+    first = snapshot.get_snapshot()
+
+    database.insert_weather_records([
+        make_record('站1', temp=30),
+        make_record('站9', region='南部', temp=25),
+    ])
+    second = snapshot.get_snapshot()
+
+    assert second is not first
+    assert second.version == database.get_data_version()
+    assert second.records() == full_rebuild().records()
+    assert len(first) == 4 and len(second) == 5
+
+
+def test_snapshot_is_rebuilt_after_delete(db):
+    database.init_database()
+    database.insert_weather_records([
+        make_record('舊站', created_at='2000-01-01 00:00:00'),
+        make_record('新站'),
+    ])
+    assert len(snapshot.get_snapshot()) == 2
+
+    database.clear_old_records(7)
+    current = snapshot.get_snapshot()
+
+    assert current.deleted == 1
+    assert [record.location for record in current.records()] == ['新站']
+
+
+def test_snapshot_file_round_trip(db):
+    database.init_database()
+    database.insert_weather_records([
+        make_record('臺北市', temp=21.5),
+        make_record('高雄市', region='南部', current_temp=None),
+    ])
+    current = snapshot.get_snapshot()
+
+    snapshot.write_snapshot_file(current)
+    mapped = snapshot.read_snapshot_file(version=current.version)
+
+    assert mapped is not None
+    assert mapped.version == current.version
+    assert mapped.records() == current.records()
+    assert snapshot.read_snapshot_file(version='0:0') is None
+
+
+def test_publishing_writes_a_new_file_per_version(db):
+    database.init_database()
+    database.insert_weather_record(make_record('臺北市', temp=20))
+    first_path = snapshot.write_snapshot_file(snapshot.get_snapshot())
+    mapped = snapshot.read_snapshot_file()
+
+    database.insert_weather_record(make_record('臺北市', temp=25))
+    second_path = snapshot.write_snapshot_file(snapshot.get_snapshot())
+
+    assert second_path != first_path
+    assert snapshot.read_pointer()['file'] == os.path.basename(second_path)
+    # The file an older reader mapped is left in place
+    assert mapped.current_temp[0] == 20
+    assert snapshot.read_snapshot_file().current_temp[0] == 25
+
+
+def test_old_snapshot_files_are_pruned(db):
+    database.init_database()
+    paths = []
+    for temp in range(snapshot.KEEP_VERSIONS + 2):
+        database.insert_weather_record(make_record('臺北市', temp=temp))
+        paths.append(snapshot.write_snapshot_file(snapshot.get_snapshot()))
+
+    assert [os.path.exists(path) for path in paths] == [False, False, True, True, True]
+    # Publishing the same version again keeps the file
+    assert snapshot.write_snapshot_file(snapshot.get_snapshot()) == paths[-1]
+
+
+def publish_one(db):
+    database.init_database()
+    database.insert_weather_records([make_record('臺北市'), make_record('高雄市', region='南部')])
+    current = snapshot.get_snapshot()
+    return current, snapshot.write_snapshot_file(current)
+
+
+def test_truncated_snapshot_file_is_ignored(db):
+    current, data_path = publish_one(db)
+    with open(data_path, 'rb') as f:
+        contents = f.read()
+
+    for length in (0, 6, 20, len(contents) // 2, len(contents) - snapshot.SNAPSHOT_FILE_ALIGN):
+        with open(data_path, 'wb') as f:
+            f.write(contents[:length])
+        assert snapshot.read_snapshot_file(version=current.version) is None
+
+    # The dashboard falls back to the database
+    snapshot.invalidate_snapshot()
+    assert snapshot.get_snapshot().records() == current.records()
+
+
+def test_corrupt_pointer_is_ignored(db):
+    current, _ = publish_one(db)
+
+    for contents in (b'{"file": ', b'{"file": 3}', b'[]', b'\xff'):
+        with open(snapshot.snapshot_file_path(), 'wb') as f:
+            f.write(contents)
+        assert snapshot.read_snapshot_file() is None
+
+
+def test_publishing_leaves_no_temporary_files(db):
+    publish_one(db)
+    directory = os.path.dirname(snapshot.snapshot_file_path())
+
+    assert not [name for name in os.listdir(directory) if name.endswith('.tmp')]
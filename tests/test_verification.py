@@ -0,0 +1,83 @@
+"""
+Tests for forecast verification: incremental re-scoring against a full rebuild
+"""
+
+import numpy as np
+
+import database
+import verification
+from conftest import make_record
+
+HOUR = 3600
+START = 1792360800
+
+
+def synthetic_ingests(count=30, locations=5, seed=11):
+    """
+    Hourly ingests of overlapping forecasts, as rows from get_forecast_facts()
+    """
+    rng = np.random.default_rng(seed)
+    ingests = []
+    next_id = 1
+    for hour in range(count):
+        created = START + hour * HOUR
+        rows = []
+        for location in range(1, locations + 1):
+            # Forecasts every 3 hours up to a day ahead, so later ingests revisit groups
+            for valid in range(hour - hour % 3, hour + 25, 3):
+                low = float(rng.normal(18, 4))
+                rows.append((next_id, location, START + valid * HOUR, created,
+                             None if rng.random() < 0.05 else low, low + float(rng.uniform(2, 8))))
+                next_id += 1
+        # A repeated download within the same ingest and a forecast without a valid time
+        rows.append((next_id, 1, START + (hour + 3) * HOUR, created, 20.0, 25.0))
+        rows.append((next_id + 1, 2, None, created, 19.0, 24.0))
+        next_id += 2
+        ingests.append(rows)
+    return ingests
+
+
+def assert_same_state(incremental, rebuilt):
+    assert np.array_equal(incremental.ids, rebuilt.ids)
+    assert np.array_equal(incremental.min_error, rebuilt.min_error, equal_nan=True)
+    assert np.array_equal(incremental.max_error, rebuilt.max_error, equal_nan=True)
+    assert np.allclose(incremental.sums, rebuilt.sums)
+
+
+def test_incremental_scoring_matches_full_rebuild():
+    ingests = synthetic_ingests()
+    incremental = verification.VerificationState()
+    seen = []
+
+    for rows in ingests:
+        incremental.append(rows)
+        seen.extend(rows)
+        rebuilt = verification.VerificationState()
+        rebuilt.append(seen)
+        assert_same_state(incremental, rebuilt)
+
+    assert incremental.cursor == seen[-1][0]
+    assert np.count_nonzero(~np.isnan(incremental.max_error)) > 0
+
+
+def test_incremental_report_matches_full_rebuild(db):
+    database.init_database()
+    for hour in range(6):
+        database.insert_weather_records([
+            make_record(f'站{i}', temp=20 + hour + i, created_at=f'2026-10-18 {hour:02d}:00:00',
+                        forecast_time=f'2026-10-19T{valid:02d}:00:00+08:00')
+            for i in range(3) for valid in (6, 12, 18)
+        ])
+        incremental = verification.get_accuracy_report()
+
+        table_state = database.get_table_state()
+        rebuilt = verification._advance(None, table_state)
+        rebuilt.version = database.format_data_version(table_state)
+        expected = rebuilt.report(database.get_locations())
+
+        assert incremental.version == expected.version
+        assert incremental.pairs == expected.pairs
+        assert incremental.by_location == expected.by_location
+        assert incremental.by_region == expected.by_region
+        assert incremental.by_lead == expected.by_lead
+    assert incremental.pairs == 5 * 3 * 3
@@ -0,0 +1,312 @@
+"""
+Forecast Verification Module
+Measures how accurate stored forecasts were against later ingests
+
+The CWA feed only carries forecasts, so each forecast is verified against
+the newest forecast ingested for the same location and valid time (the
+shortest-lead issue). Earlier issues for that valid time are scored by
+their min/max temperature error, grouped by location, region and lead time.
+"""
+
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import database
+
+
+# Lead times are reported in buckets of this many hours
+LEAD_BUCKET_HOURS = 6
+# Leads beyond this go into the last bucket
+MAX_LEAD_HOURS = 72
+LEAD_BUCKETS = MAX_LEAD_HOURS // LEAD_BUCKET_HOURS + 1
+LEAD_LABELS = [
+    f"{b * LEAD_BUCKET_HOURS}-{(b + 1) * LEAD_BUCKET_HOURS}h" for b in range(LEAD_BUCKETS - 1)
+] + [f">={MAX_LEAD_HOURS}h"]
+# Above this many new rows a full rebuild is cheaper than an incremental update
+MAX_INCREMENTAL_CHANGES = 100000
+
+_KEY_SHIFT = 32
+
+
+class VerificationState:
+    """
+    Per-fact forecast errors and running error sums, kept up to date incrementally
+
+    Facts are stored as parallel NumPy columns plus a key-sorted index of
+    (location, valid time) groups. After an ingest only the groups touched
+    by new facts are re-scored, and their old contributions are swapped
+    out of running sums per (location, lead bucket) cell, so reports cost
+    O(locations x buckets) instead of O(facts).
+    """
+
+    def __init__(self):
+        import numpy as np
+
+        self.version: Optional[str] = None
+        self.cursor = 0
+        self.deleted = 0
+        self.ids = np.empty(0, dtype=np.int64)
+        self.keys = np.empty(0, dtype=np.int64)
+        self.cells = np.empty(0, dtype=np.int64)
+        self.created_ts = np.empty(0, dtype=np.int64)
+        self.min_temp = np.empty(0, dtype=np.float64)
+        self.max_temp = np.empty(0, dtype=np.float64)
+        self.min_error = np.empty(0, dtype=np.float64)
+        self.max_error = np.empty(0, dtype=np.float64)
+        # Positions sorted by group key
+        self.sorted_keys = np.empty(0, dtype=np.int64)
+        self.sorted_positions = np.empty(0, dtype=np.int64)
+        # Rows: min count/sum/abs sum, max count/sum/abs sum; columns: cells
+        self.sums = np.zeros((6, 0), dtype=np.float64)
+
+    def append(self, rows: List[tuple]):
+        """
+        Add facts from database.get_forecast_facts() and re-score affected groups
+        """
+        import numpy as np
+
+        if not rows:
+            return
+
+        ids, location_ids, forecast_ts, created_ts, min_temp, max_temp = (
+            np.array(column, dtype=np.float64) for column in zip(*rows)
+        )
+        location_ids = location_ids.astype(np.int64)
+        # Facts without a valid time cannot be matched; they get their own key
+        no_time = np.isnan(forecast_ts)
+        forecast_ts = np.where(no_time, 0, forecast_ts)
+        keys = (location_ids << _KEY_SHIFT) | forecast_ts.astype(np.int64)
+        keys[no_time] = -ids[no_time].astype(np.int64)
+        lead = np.clip((forecast_ts - created_ts) / 3600.0, 0, MAX_LEAD_HOURS)
+        cells = location_ids * LEAD_BUCKETS + (lead // LEAD_BUCKET_HOURS).astype(np.int64)
+
+        start = len(self.ids)
+        self.ids = np.concatenate([self.ids, ids.astype(np.int64)])
+        self.keys = np.concatenate([self.keys, keys])
+        self.cells = np.concatenate([self.cells, cells])
+        self.created_ts = np.concatenate([self.created_ts, created_ts.astype(np.int64)])
+        self.min_temp = np.concatenate([self.min_temp, min_temp])
+        self.max_temp = np.concatenate([self.max_temp, max_temp])
+        self.min_error = np.concatenate([self.min_error, np.full(len(ids), np.nan)])
+        self.max_error = np.concatenate([self.max_error, np.full(len(ids), np.nan)])
+
+        cell_count = (int(location_ids.max()) + 1) * LEAD_BUCKETS
+        if cell_count > self.sums.shape[1]:
+            self.sums = np.pad(self.sums, ((0, 0), (0, cell_count - self.sums.shape[1])))
+
+        order = np.argsort(keys, kind='stable')
+        insert_at = np.searchsorted(self.sorted_keys, keys[order], side='right')
+        self.sorted_keys = np.insert(self.sorted_keys, insert_at, keys[order])
+        self.sorted_positions = np.insert(self.sorted_positions, insert_at, start + order)
+
+        self.cursor = int(self.ids[-1])
+
+        if start == 0:
+            self._score(np.arange(len(self.ids)))
+            return
+
+        touched = np.unique(keys)
+        lo = np.searchsorted(self.sorted_keys, touched, side='left')
+        hi = np.searchsorted(self.sorted_keys, touched, side='right')
+        # Expand the [lo, hi) ranges without a Python loop
+        lengths = hi - lo
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        self._score(self.sorted_positions[np.repeat(lo, lengths) + offsets])
+
+    def _score(self, index):
+        """
+        Recompute errors for all facts in the given positions (whole groups)
+        """
+        import numpy as np
+
+        if len(index) == 0:
+            return
+
+        # Sort by group, then issue time; the last entry of a group is its reference
+        order = np.lexsort((self.ids[index], self.created_ts[index], self.keys[index]))
+        index = index[order]
+        keys = self.keys[index]
+        starts = np.r_[True, keys[1:] != keys[:-1]]
+        ends = np.flatnonzero(np.r_[keys[1:] != keys[:-1], True])
+        reference = index[ends][np.cumsum(starts) - 1]
+
+        self._accumulate(index, -1.0)
+        # Only strictly earlier issues are forecasts of the reference
+        earlier = self.created_ts[index] < self.created_ts[reference]
+        self.min_error[index] = np.where(earlier, self.min_temp[index] - self.min_temp[reference], np.nan)
+        self.max_error[index] = np.where(earlier, self.max_temp[index] - self.max_temp[reference], np.nan)
+        self._accumulate(index, 1.0)
+
+    def _accumulate(self, index, sign: float):
+        """
+        Add (sign=1) or remove (sign=-1) the errors at positions from the running sums
+        """
+        import numpy as np
+
+        size = self.sums.shape[1]
+        for row, errors in ((0, self.min_error[index]), (3, self.max_error[index])):
+            present = ~np.isnan(errors)
+            cells = self.cells[index][present]
+            errors = errors[present]
+            self.sums[row] += sign * np.bincount(cells, minlength=size)
+            self.sums[row + 1] += sign * np.bincount(cells, weights=errors, minlength=size)
+            self.sums[row + 2] += sign * np.bincount(cells, weights=np.abs(errors), minlength=size)
+
+    def report(self, locations: List[Dict]) -> 'AccuracyReport':
+        """
+        Aggregate the running sums per location, region and lead time
+        """
+        import numpy as np
+
+        locations = [loc for loc in locations if loc['id'] * LEAD_BUCKETS < self.sums.shape[1]]
+        sums = self.sums.reshape(6, -1, LEAD_BUCKETS)
+        location_rows = np.array([loc['id'] for loc in locations], dtype=np.int64)
+        per_location = sums[:, location_rows, :].sum(axis=2)
+
+        region_names = sorted({loc['region'] or '其他' for loc in locations})
+        region_codes = np.array(
+            [region_names.index(loc['region'] or '其他') for loc in locations], dtype=np.int64
+        )
+        per_region = np.stack([
+            np.bincount(region_codes, weights=row, minlength=len(region_names)) for row in per_location
+        ]) if len(locations) else np.zeros((6, 0))
+
+        per_lead = sums[:, location_rows, :].sum(axis=1)
+
+        return AccuracyReport(
+            self.version,
+            int(max(per_lead[0].sum(), per_lead[3].sum())),
+            _rows([loc['name'] for loc in locations], per_location),
+            _rows(region_names, per_region),
+            _rows(LEAD_LABELS, per_lead),
+        )
+
+
+def _rows(labels: List[str], sums) -> List[Dict]:
+    """
+    MAE and bias of min/max temperature errors from per-group running sums
+    """
+    import numpy as np
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        min_mae, min_bias = sums[2] / sums[0], sums[1] / sums[0]
+        max_mae, max_bias = sums[5] / sums[3], sums[4] / sums[3]
+
+    result = []
+    for i, label in enumerate(labels):
+        pairs = int(round(max(sums[0][i], sums[3][i])))
+        if pairs == 0:
+            continue
+        result.append({
+            'name': label,
+            'pairs': pairs,
+            'min_mae': _round(min_mae[i]),
+            'min_bias': _round(min_bias[i]),
+            'max_mae': _round(max_mae[i]),
+            'max_bias': _round(max_bias[i]),
+        })
+    return result
+
+
+def _round(value: float) -> Optional[float]:
+    return None if value != value else round(float(value), 2)
+
+
+class AccuracyReport:
+    """
+    Forecast error metrics for one data version
+    """
+
+    __slots__ = ('version', 'pairs', 'by_location', 'by_region', 'by_lead', '_frames')
+
+    def __init__(self, version: Optional[str], pairs: int, by_location: List[Dict],
+                 by_region: List[Dict], by_lead: List[Dict]):
+        self.version = version
+        self.pairs = pairs
+        self.by_location = by_location
+        self.by_region = by_region
+        self.by_lead = by_lead
+        self._frames = {}
+
+    def __bool__(self) -> bool:
+        return self.pairs > 0
+
+    def to_frame(self, group: str):
+        """
+        Get one breakdown ('location', 'region' or 'lead') as a shared DataFrame
+
+        The frame is built once per report; treat it as read-only.
+        """
+        frame = self._frames.get(group)
+        if frame is None:
+            import pandas as pd
+
+            frame = pd.DataFrame(
+                getattr(self, f'by_{group}'),
+                columns=['name', 'pairs', 'min_mae', 'min_bias', 'max_mae', 'max_bias'],
+            )
+            self._frames[group] = frame
+        return frame
+
+
+_state: Optional[VerificationState] = None
+_report: Optional[AccuracyReport] = None
+_lock = threading.Lock()
+
+
+def _advance(state: Optional[VerificationState], table_state: Tuple[int, int]) -> VerificationState:
+    """
+    Bring the verification state up to a table state, incrementally when only inserts happened
+    """
+    max_id, deleted = table_state
+    # Any delete since the last update shows up in the delete counter
+    if state is not None and state.deleted == deleted and 0 <= max_id - state.cursor <= MAX_INCREMENTAL_CHANGES:
+        state.append(database.get_forecast_facts(state.cursor, max_id))
+        return state
+
+    state = VerificationState()
+    state.deleted = deleted
+    state.append(database.get_forecast_facts(0, max_id))
+    return state
+
+
+def get_accuracy_report() -> AccuracyReport:
+    """
+    Get forecast accuracy metrics for the current data, recomputed only after ingest
+
+    Returns:
+        Shared AccuracyReport (read-only)
+    """
+    global _state, _report
+
+    table_state = database.get_table_state()
+    version = database.format_data_version(table_state)
+    report = _report
+    if report is not None and report.version == version:
+        return report
+
+    with _lock:
+        if _report is None or _report.version != version:
+            _state = _advance(_state, table_state)
+            _state.version = version
+            _report = _state.report(database.get_locations())
+        return _report
+
+
+def main():
+    """
+    Print the forecast accuracy report
+    """
+    database.ensure_database()
+    report = get_accuracy_report()
+    print(f"Verified forecast pairs: {report.pairs}")
+    for group in ('region', 'lead'):
+        print(f"\nBy {group}:")
+        for row in getattr(report, f'by_{group}'):
+            print(f"  {row['name']:10s} n={row['pairs']:7d}  "
+                  f"min MAE {row['min_mae']} bias {row['min_bias']}  "
+                  f"max MAE {row['max_mae']} bias {row['max_bias']}")
+
+
+if __name__ == "__main__":
+    main()